@@ -0,0 +1,13 @@
+"""规则评估的合成基准测试
+
+在 server 目录下运行：
+
+    python -m benchmarks --elements 10000,100000 --output baseline.json
+    python -m benchmarks --elements 10000,100000 --baseline baseline.json
+
+进程内HTTP压测（按场景占比回放请求，统计各路由吞吐与延迟分位数）：
+
+    python -m benchmarks.load_test --concurrency 1,8,32 --duration 30 --slo-ms 200
+
+数据由固定随机种子生成，存放在内存版 MongoDB 中，不需要数据库服务。
+"""
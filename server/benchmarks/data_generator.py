@@ -0,0 +1,149 @@
+from typing import Dict, Any, List
+import random
+
+# 要素类型，超出部分按 类型N 命名
+ELEMENT_TYPES = ["景点", "美食", "住宿", "交通", "购物", "娱乐"]
+
+# 数值属性及其取值范围
+NUMERIC_ATTRIBUTES = {
+    "价格": (0, 2000),
+    "距离地铁": (50, 6000),
+    "人均消费": (10, 500),
+    "容量": (1, 5000),
+    "时长": (0.5, 8.0),
+}
+
+# 列表属性及其候选值
+LIST_ATTRIBUTES = {
+    "季节": ["春", "夏", "秋", "冬"],
+    "标签": ["本地特色", "辣", "面食", "小吃", "海鲜", "亲子", "夜景", "网红", "老字号", "室内"],
+}
+
+REGIONS = ["东城", "西城", "朝阳", "海淀", "丰台", "石景山", "通州", "昌平"]
+
+def element_types(count: int) -> List[str]:
+    """返回指定数量的要素类型名称"""
+    return [ELEMENT_TYPES[i] if i < len(ELEMENT_TYPES) else f"类型{i}" for i in range(count)]
+
+def generate_elements(count: int, type_count: int = 6, seed: int = 42) -> List[Dict[str, Any]]:
+    """生成要素，结构与数据库中的要素一致：{"id", "type", "attributes"}"""
+    rng = random.Random(seed)
+    types = element_types(type_count)
+    numeric_keys = list(NUMERIC_ATTRIBUTES)
+    list_keys = list(LIST_ATTRIBUTES)
+
+    # 每种类型固定一组属性，模拟不同类型的要素结构不同
+    type_keys = {
+        element_type: (rng.sample(numeric_keys, rng.randint(2, 4)), rng.sample(list_keys, rng.randint(1, 2)))
+        for element_type in types
+    }
+
+    elements = []
+    for index in range(count):
+        element_type = types[index % type_count]
+        numeric, lists = type_keys[element_type]
+        attributes = {
+            "name": f"{element_type}{index}",
+            "评分": round(rng.uniform(3.0, 5.0), 1),
+            "区域": rng.choice(REGIONS),
+        }
+        for key in numeric:
+            low, high = NUMERIC_ATTRIBUTES[key]
+            value = rng.uniform(low, high)
+            attributes[key] = round(value, 1) if isinstance(low, float) else int(value)
+        for key in lists:
+            choices = LIST_ATTRIBUTES[key]
+            attributes[key] = rng.sample(choices, rng.randint(1, min(3, len(choices))))
+        elements.append({"id": f"E{index:07d}", "type": element_type, "attributes": attributes})
+    return elements
+
+def _numeric_rule(rng: random.Random) -> Dict[str, Any]:
+    key = rng.choice(list(NUMERIC_ATTRIBUTES))
+    low, high = NUMERIC_ATTRIBUTES[key]
+    threshold = round(rng.uniform(low, high), 1)
+    if rng.random() < 0.5:
+        code = f"return 1.0 if attrs.get('{key}', float('inf')) < params.get('threshold', {threshold}) else 0.0"
+        name = f"{key}低于阈值"
+    else:
+        code = f"return 1.0 if attrs.get('{key}', 0) >= params.get('threshold', {threshold}) else 0.0"
+        name = f"{key}不低于阈值"
+    return {"name": name, "code": code, "parameters": {"threshold": threshold}, "keys": [key]}
+
+def _membership_rule(rng: random.Random) -> Dict[str, Any]:
+    key = rng.choice(list(LIST_ATTRIBUTES))
+    value = rng.choice(LIST_ATTRIBUTES[key])
+    code = f"return 1.0 if params.get('value', '{value}') in attrs.get('{key}', []) else 0.0"
+    return {"name": f"{key}包含指定值", "code": code, "parameters": {"value": value}, "keys": [key]}
+
+def _scored_rule(rng: random.Random) -> Dict[str, Any]:
+    key = rng.choice(list(NUMERIC_ATTRIBUTES))
+    high = NUMERIC_ATTRIBUTES[key][1]
+    code = (
+        f"value = attrs.get('{key}')\n"
+        "if value is None:\n"
+        "    return 0.0\n"
+        f"return max(0.0, 1.0 - value / params.get('max', {high}))"
+    )
+    return {"name": f"{key}越低越好", "code": code, "parameters": {"max": high}, "keys": [key]}
+
+def _combined_rule(rng: random.Random) -> Dict[str, Any]:
+    key = rng.choice(list(NUMERIC_ATTRIBUTES))
+    low, high = NUMERIC_ATTRIBUTES[key]
+    limit = round(rng.uniform(low, high), 1)
+    code = (
+        f"if attrs.get('评分', 0) < params.get('min_rating', 4.0):\n"
+        "    return 0.0\n"
+        f"if attrs.get('{key}', float('inf')) > params.get('limit', {limit}):\n"
+        "    return 0.0\n"
+        "return attrs['评分'] / 5.0"
+    )
+    return {"name": f"高评分且{key}适中", "code": code, "parameters": {"min_rating": 4.0, "limit": limit},
+            "keys": ["评分", key]}
+
+RULE_TEMPLATES = [_numeric_rule, _membership_rule, _scored_rule, _combined_rule]
+
+def generate_rules(count: int, type_count: int = 6, seed: int = 42) -> List[Dict[str, Any]]:
+    """生成规则，结构与数据库中的规则一致"""
+    rng = random.Random(seed + 1)
+    types = element_types(type_count)
+    rules = []
+    for index in range(count):
+        template = RULE_TEMPLATES[index % len(RULE_TEMPLATES)](rng)
+        # 约三分之一的规则只作用于部分类型
+        affected_types = rng.sample(types, rng.randint(1, max(1, type_count // 2))) if rng.random() < 0.33 else []
+        rules.append({
+            "id": f"rule_{index:04d}",
+            "name": f"{template['name']}{index}",
+            "weight": round(rng.uniform(0.5, 2.0), 2),
+            "affected_element_keys": template["keys"],
+            "affected_element_types": affected_types,
+            "description": "",
+            "code": template["code"],
+            "parameters": template["parameters"],
+        })
+    return rules
+
+def generate_schemes(count: int, rules: List[Dict[str, Any]], seed: int = 42) -> List[Dict[str, Any]]:
+    """生成方案，每个方案引用 3~8 个规则，部分规则覆盖默认参数"""
+    rng = random.Random(seed + 2)
+    schemes = []
+    for index in range(count):
+        chosen = rng.sample(rules, min(len(rules), rng.randint(3, 8)))
+        rule_weights = {}
+        for rule in chosen:
+            weight = round(rng.uniform(0.5, 2.0), 2)
+            if rng.random() < 0.3 and rule["parameters"]:
+                parameters = dict(rule["parameters"])
+                key = rng.choice(list(parameters))
+                if isinstance(parameters[key], (int, float)):
+                    parameters[key] = round(parameters[key] * rng.uniform(0.5, 1.5), 1)
+                rule_weights[rule["id"]] = {"weight": weight, "parameters": parameters}
+            else:
+                rule_weights[rule["id"]] = weight
+        schemes.append({
+            "id": f"scheme_{index:04d}",
+            "name": f"方案{index}",
+            "description": "",
+            "rule_weights": rule_weights,
+        })
+    return schemes
@@ -0,0 +1,216 @@
+from typing import Dict, Any, List, Optional, Tuple
+from contextlib import redirect_stdout
+from datetime import datetime
+from benchmarks import data_generator, mongo_stub
+from services.evaluation_cache import evaluation_cache
+from services.rule_profiler import percentile
+from services.schema_inference import schema_registry
+import argparse
+import asyncio
+import io
+import json
+import platform
+import random
+import sys
+import time
+import httpx
+
+API_PREFIX = "/api/hypergraph"
+
+# 场景名 -> 默认权重，权重按比例决定各场景的请求占比
+DEFAULT_MIX = {
+    "list_elements": 40,
+    "open_scheme": 25,
+    "edit_element": 30,
+    "recompute_hyperedges": 5,
+}
+
+def parse_mix(value: str) -> Dict[str, float]:
+    """解析 name=weight,name=weight 形式的请求占比"""
+    mix = {}
+    for item in value.split(","):
+        if not item.strip():
+            continue
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"未知的场景 {name}，可选: {', '.join(DEFAULT_MIX)}")
+        mix[name] = float(weight or 1)
+    if not mix or sum(mix.values()) <= 0:
+        raise argparse.ArgumentTypeError("请求占比不能为空")
+    return mix
+
+class LoadTest:
+    """在进程内通过 ASGI 传输驱动 FastAPI 应用，按场景占比回放请求并记录延迟"""
+    def __init__(self, client: httpx.AsyncClient, element_ids: List[str], scheme_ids: List[str],
+                 mix: Dict[str, float], seed: int = 42):
+        self.client = client
+        self.element_ids = element_ids
+        self.scheme_ids = scheme_ids
+        self.scenarios = list(mix)
+        self.weights = [mix[name] for name in self.scenarios]
+        self.rng = random.Random(seed)
+
+    def _request(self, scenario: str) -> Tuple[str, str, Dict[str, Any]]:
+        """返回 (方法, 路径, 请求参数)"""
+        if scenario == "list_elements":
+            return "GET", f"{API_PREFIX}/elements", {}
+        if scenario == "open_scheme":
+            return "GET", f"{API_PREFIX}/schemes/{self.rng.choice(self.scheme_ids)}", {}
+        if scenario == "edit_element":
+            body = {"attributes": {"评分": round(self.rng.uniform(3.0, 5.0), 1)}}
+            return "PUT", f"{API_PREFIX}/elements/{self.rng.choice(self.element_ids)}", {"json": body}
+        if scenario == "recompute_hyperedges":
+            return "GET", f"{API_PREFIX}/rule-element-hyperedges", {}
+        raise ValueError(f"未知的场景: {scenario}")
+
+    async def _worker(self, deadline: float, samples: List[Tuple[str, float, int]]) -> None:
+        while time.perf_counter() < deadline:
+            scenario = self.rng.choices(self.scenarios, self.weights)[0]
+            method, path, kwargs = self._request(scenario)
+            started = time.perf_counter()
+            try:
+                response = await self.client.request(method, path, **kwargs)
+                status = response.status_code
+            except Exception:
+                status = 0
+            samples.append((scenario, time.perf_counter() - started, status))
+
+    async def run(self, concurrency: int, duration: float) -> Dict[str, Any]:
+        """以给定并发数运行 duration 秒，返回整体与各场景的吞吐和延迟分位数"""
+        samples: List[Tuple[str, float, int]] = []
+        started = time.perf_counter()
+        deadline = started + duration
+        await asyncio.gather(*(self._worker(deadline, samples) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+        routes = {}
+        for scenario in self.scenarios:
+            latencies = sorted(latency for name, latency, _ in samples if name == scenario)
+            errors = sum(1 for name, _, status in samples if name == scenario and not 200 <= status < 300)
+            routes[scenario] = _latency_summary(latencies, errors, elapsed)
+
+        latencies = sorted(latency for _, latency, _ in samples)
+        errors = sum(1 for _, _, status in samples if not 200 <= status < 300)
+        return {"concurrency": concurrency, "duration_s": elapsed, **_latency_summary(latencies, errors, elapsed),
+                "routes": routes}
+
+def _latency_summary(latencies: List[float], errors: int, elapsed: float) -> Dict[str, Any]:
+    def ms(value):
+        return None if value is None else value * 1e3
+
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "mean_ms": ms(sum(latencies) / len(latencies)) if latencies else None,
+        "p50_ms": ms(percentile(latencies, 0.5)),
+        "p95_ms": ms(percentile(latencies, 0.95)),
+        "p99_ms": ms(percentile(latencies, 0.99)),
+    }
+
+async def prepare_data(element_count: int, rule_count: int, scheme_count: int, type_count: int,
+                       seed: int) -> Tuple[List[str], List[str]]:
+    """生成数据并写入内存数据库，返回要素ID和方案ID"""
+    memory_db = mongo_stub.install()
+    # 新的内存数据库版本号从0开始，清空按版本号判断有效性的缓存
+    evaluation_cache.invalidate()
+    schema_registry.clear()
+    elements = data_generator.generate_elements(element_count, type_count, seed)
+    rules = data_generator.generate_rules(rule_count, type_count, seed)
+    schemes = data_generator.generate_schemes(scheme_count, rules, seed)
+    await memory_db.elements.create_index("id", unique=True)
+    await memory_db.rules.create_index("id", unique=True)
+    await memory_db.schemes.create_index("id", unique=True)
+    await memory_db.elements.insert_many(elements)
+    await memory_db.rules.insert_many(rules)
+    await memory_db.schemes.insert_many(schemes)
+    return [element["id"] for element in elements], [scheme["id"] for scheme in schemes]
+
+def _format_ms(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value:.1f}"
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(f"\n并发 {report['concurrency']}: {report['requests']} 个请求, {report['errors']} 个错误, "
+          f"{report['rps']:.1f} 请求/秒")
+    print(f"{'场景':<22}{'请求数':>8}{'错误':>6}{'请求/秒':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, route in report["routes"].items():
+        print(f"{name:<24}{route['requests']:>8}{route['errors']:>6}{route['rps']:>12.1f}"
+              f"{_format_ms(route['p50_ms']):>10}{_format_ms(route['p95_ms']):>10}{_format_ms(route['p99_ms']):>10}")
+
+def max_sustainable(reports: List[Dict[str, Any]], slo_ms: Optional[float]) -> Optional[Dict[str, Any]]:
+    """没有错误且 p99 不超过 SLO 的并发档位中吞吐最高的一档"""
+    candidates = [
+        report for report in reports
+        if report["requests"] and not report["errors"] and (slo_ms is None or report["p99_ms"] <= slo_ms)
+    ]
+    return max(candidates, key=lambda report: report["rps"]) if candidates else None
+
+async def run_load_test(args: argparse.Namespace) -> Dict[str, Any]:
+    with redirect_stdout(io.StringIO()):
+        # 导入应用时会创建服务实例并打印初始化信息
+        from main import app
+        element_ids, scheme_ids = await prepare_data(args.elements, args.rules, args.schemes, args.types, args.seed)
+
+    reports = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=None) as client:
+        for concurrency in args.concurrency:
+            load_test = LoadTest(client, element_ids, scheme_ids, args.mix, args.seed)
+            with redirect_stdout(io.StringIO()):
+                if args.warmup:
+                    await load_test.run(concurrency, args.warmup)
+                report = await load_test.run(concurrency, args.duration)
+            print_report(report)
+            reports.append(report)
+
+    best = max_sustainable(reports, args.slo_ms)
+    if best is None:
+        print("\n没有满足条件的并发档位")
+    else:
+        print(f"\n最大可持续吞吐: {best['rps']:.1f} 请求/秒 (并发 {best['concurrency']}, p99 {best['p99_ms']:.1f} ms)")
+
+    return {
+        "meta": {
+            "created_at": datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "elements": args.elements,
+            "rules": args.rules,
+            "schemes": args.schemes,
+            "types": args.types,
+            "seed": args.seed,
+            "mix": args.mix,
+            "duration_s": args.duration,
+            "slo_ms": args.slo_ms,
+        },
+        "max_sustainable": None if best is None else {"concurrency": best["concurrency"], "rps": best["rps"]},
+        "results": reports,
+    }
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.load_test", description="进程内HTTP压测")
+    parser.add_argument("--elements", type=int, default=2000, help="要素数量")
+    parser.add_argument("--rules", type=int, default=20, help="规则数量")
+    parser.add_argument("--schemes", type=int, default=10, help="方案数量")
+    parser.add_argument("--types", type=int, default=6, help="要素类型数量")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子")
+    parser.add_argument("--concurrency", type=lambda value: [int(item) for item in value.split(",") if item],
+                        default=[1, 4, 16], help="并发数，逗号分隔，依次运行")
+    parser.add_argument("--duration", type=float, default=10.0, help="每个并发档位的运行秒数")
+    parser.add_argument("--warmup", type=float, default=1.0, help="每个并发档位的预热秒数")
+    parser.add_argument("--mix", type=parse_mix, default=dict(DEFAULT_MIX),
+                        help="请求占比，如 list_elements=40,open_scheme=25,edit_element=30,recompute_hyperedges=5")
+    parser.add_argument("--slo-ms", type=float, help="p99 延迟上限，用于判定最大可持续吞吐")
+    parser.add_argument("--output", help="将结果写入 JSON 文件")
+    args = parser.parse_args(argv)
+
+    result = asyncio.run(run_load_test(args))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"结果已写入 {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,441 @@
+from typing import Any, Dict
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from pymongo.results import BulkWriteResult, DeleteResult, InsertManyResult, InsertOneResult, UpdateResult
+import database
+import itertools
+import re
+
+# 内存版 MongoDB 替身：实现服务端用到的 Motor 异步接口子集，用于基准测试与压测。
+# 读取时返回文档副本，唯一索引冲突时抛出 DuplicateKeyError/BulkWriteError，与驱动行为一致。
+
+_MISSING = object()
+_object_ids = itertools.count(1)
+
+def _clone(value):
+    """复制文档，模拟驱动每次返回新对象的行为"""
+    if isinstance(value, dict):
+        return {k: _clone(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_clone(v) for v in value]
+    return value
+
+def _get_path(doc, path):
+    """按点号路径取值，不存在时返回 _MISSING"""
+    current = doc
+    for part in path.split("."):
+        if isinstance(current, dict) and part in current:
+            current = current[part]
+        else:
+            return _MISSING
+    return current
+
+def _set_path(doc, path, value):
+    parts = path.split(".")
+    current = doc
+    for part in parts[:-1]:
+        current = current.setdefault(part, {})
+    current[parts[-1]] = value
+
+def _unset_path(doc, path):
+    parts = path.split(".")
+    current = doc
+    for part in parts[:-1]:
+        current = current.get(part)
+        if not isinstance(current, dict):
+            return
+    current.pop(parts[-1], None)
+
+def _compare(value, op, operand):
+    """比较单个字段值与操作数"""
+    if op == "$eq":
+        # 与 MongoDB 一致：null 同时匹配值为 null 和不存在的字段
+        if operand is None and value is _MISSING:
+            return True
+        if isinstance(value, list) and not isinstance(operand, list):
+            return operand in value
+        return value == operand
+    if op == "$ne":
+        return not _compare(value, "$eq", operand)
+    if op == "$in":
+        return any(_compare(value, "$eq", item) for item in operand)
+    if op == "$nin":
+        return not _compare(value, "$in", operand)
+    if op == "$exists":
+        return (value is not _MISSING) == bool(operand)
+    if op == "$regex":
+        return isinstance(value, str) and re.search(operand, value) is not None
+    if value is _MISSING or value is None:
+        return False
+    try:
+        if op == "$gt":
+            return value > operand
+        if op == "$gte":
+            return value >= operand
+        if op == "$lt":
+            return value < operand
+        if op == "$lte":
+            return value <= operand
+    except TypeError:
+        return False
+    raise NotImplementedError(f"不支持的查询操作符 {op}")
+
+def _matches(doc, flt):
+    """判断文档是否满足查询条件（支持等值、比较、$in/$nin/$exists/$regex、$or/$and）"""
+    for key, condition in (flt or {}).items():
+        if key == "$or":
+            if not any(_matches(doc, sub) for sub in condition):
+                return False
+            continue
+        if key == "$and":
+            if not all(_matches(doc, sub) for sub in condition):
+                return False
+            continue
+        value = _get_path(doc, key)
+        if isinstance(condition, dict) and condition and all(k.startswith("$") for k in condition):
+            if not all(_compare(value, op, operand) for op, operand in condition.items()):
+                return False
+        elif not _compare(value, "$eq", condition):
+            return False
+    return True
+
+def _project(doc, projection):
+    """按投影返回文档副本"""
+    if not projection:
+        return _clone(doc)
+    if isinstance(projection, (list, tuple)):
+        projection = {field: 1 for field in projection}
+    include = [k for k, v in projection.items() if v and k != "_id"]
+    if include:
+        result = {}
+        for field in include:
+            value = _get_path(doc, field)
+            if value is not _MISSING:
+                _set_path(result, field, _clone(value))
+        if projection.get("_id", 1) and "_id" in doc:
+            result["_id"] = doc["_id"]
+        return result
+    result = _clone(doc)
+    for field, flag in projection.items():
+        if not flag:
+            _unset_path(result, field)
+    return result
+
+def _apply_update(doc, update, inserting=False):
+    """执行更新操作符（$set/$setOnInsert/$unset/$inc/$push）"""
+    for op, fields in update.items():
+        if op == "$set":
+            for path, value in fields.items():
+                _set_path(doc, path, _clone(value))
+        elif op == "$setOnInsert":
+            if inserting:
+                for path, value in fields.items():
+                    _set_path(doc, path, _clone(value))
+        elif op == "$unset":
+            for path in fields:
+                _unset_path(doc, path)
+        elif op == "$inc":
+            for path, amount in fields.items():
+                current = _get_path(doc, path)
+                _set_path(doc, path, (0 if current is _MISSING else current) + amount)
+        elif op == "$push":
+            for path, value in fields.items():
+                current = _get_path(doc, path)
+                if current is _MISSING:
+                    current = []
+                    _set_path(doc, path, current)
+                current.append(_clone(value))
+        else:
+            raise NotImplementedError(f"不支持的更新操作符 {op}")
+
+class MemoryCursor:
+    """查询游标，支持 sort/skip/limit/to_list 与异步迭代"""
+    def __init__(self, docs, projection=None):
+        self._docs = docs
+        self._projection = projection
+        self._sort = None
+        self._skip = 0
+        self._limit = 0
+
+    def sort(self, key, direction=1):
+        if isinstance(key, list):
+            key, direction = key[0]
+        self._sort = (key, direction)
+        return self
+
+    def skip(self, count):
+        self._skip = count
+        return self
+
+    def limit(self, count):
+        self._limit = count
+        return self
+
+    def _results(self):
+        docs = list(self._docs)
+        if self._sort:
+            key, direction = self._sort
+            present = [doc for doc in docs if _get_path(doc, key) is not _MISSING]
+            missing = [doc for doc in docs if _get_path(doc, key) is _MISSING]
+            present.sort(key=lambda doc: _get_path(doc, key), reverse=direction < 0)
+            docs = missing + present if direction > 0 else present + missing
+        docs = docs[self._skip:]
+        if self._limit:
+            docs = docs[:self._limit]
+        return [_project(doc, self._projection) for doc in docs]
+
+    async def to_list(self, length=None):
+        results = self._results()
+        return results if length is None else results[:length]
+
+    def __aiter__(self):
+        self._iterator = iter(self._results())
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._iterator)
+        except StopIteration:
+            raise StopAsyncIteration
+
+class MemoryCollection:
+    """内存集合，只实现服务端代码用到的 Motor 方法
+
+    文档按 _id 存放在有序字典中；唯一索引维护为 值 -> _id 的字典，
+    以唯一索引字段做等值查询时直接命中，其余查询全表扫描。
+    """
+    def __init__(self, name):
+        self.name = name
+        self.documents: Dict[Any, Dict[str, Any]] = {}
+        self._unique: Dict[str, Dict[Any, Any]] = {}
+
+    async def create_index(self, keys, unique=False, **kwargs):
+        field = keys if isinstance(keys, str) else keys[0][0]
+        # 只对单字段索引检查唯一性，复合索引只记录名称
+        if unique and field not in self._unique and (isinstance(keys, str) or len(keys) == 1):
+            self._unique[field] = {
+                _get_path(doc, field): object_id
+                for object_id, doc in self.documents.items()
+                if _get_path(doc, field) is not _MISSING
+            }
+        return f"{field}_1"
+
+    def _index_add(self, doc):
+        for field, index in self._unique.items():
+            value = _get_path(doc, field)
+            if value is _MISSING:
+                continue
+            existing = index.get(value)
+            if existing is not None and existing != doc["_id"]:
+                raise DuplicateKeyError(
+                    f"E11000 duplicate key error collection: {self.name} index: {field}_1 dup key: {value!r}"
+                )
+        for field, index in self._unique.items():
+            value = _get_path(doc, field)
+            if value is not _MISSING:
+                index[value] = doc["_id"]
+
+    def _index_remove(self, doc):
+        for field, index in self._unique.items():
+            value = _get_path(doc, field)
+            if value is not _MISSING and index.get(value) == doc["_id"]:
+                del index[value]
+
+    def _candidates(self, flt):
+        """用唯一索引缩小候选范围"""
+        for field, index in self._unique.items():
+            condition = (flt or {}).get(field, _MISSING)
+            if condition is _MISSING:
+                continue
+            if isinstance(condition, dict) and set(condition) == {"$in"}:
+                object_ids = [index.get(value) for value in condition["$in"]]
+                return [self.documents[object_id] for object_id in dict.fromkeys(object_ids) if object_id is not None]
+            if not isinstance(condition, (dict, list)):
+                object_id = index.get(condition)
+                return [self.documents[object_id]] if object_id is not None else []
+        return list(self.documents.values())
+
+    def _find(self, flt):
+        return [doc for doc in self._candidates(flt) if _matches(doc, flt)]
+
+    def _first(self, flt):
+        for doc in self._candidates(flt):
+            if _matches(doc, flt):
+                return doc
+        return None
+
+    def _update_doc(self, doc, update):
+        self._index_remove(doc)
+        _apply_update(doc, update)
+        self._index_add(doc)
+
+    def _upsert_doc(self, flt, update):
+        doc = {k: _clone(v) for k, v in (flt or {}).items() if not k.startswith("$") and not isinstance(v, dict)}
+        doc["_id"] = next(_object_ids)
+        _apply_update(doc, update, inserting=True)
+        self._index_add(doc)
+        self.documents[doc["_id"]] = doc
+        return doc
+
+    def find(self, flt=None, projection=None, **kwargs):
+        return MemoryCursor(self._find(flt), projection)
+
+    async def find_one(self, flt=None, projection=None, **kwargs):
+        doc = self._first(flt)
+        return _project(doc, projection) if doc is not None else None
+
+    async def count_documents(self, flt, **kwargs):
+        if not flt:
+            return len(self.documents)
+        return len(self._find(flt))
+
+    async def insert_one(self, document, **kwargs):
+        document.setdefault("_id", next(_object_ids))
+        doc = _clone(document)
+        self._index_add(doc)
+        self.documents[doc["_id"]] = doc
+        return InsertOneResult(document["_id"], True)
+
+    async def insert_many(self, documents, ordered=True, **kwargs):
+        inserted, errors = [], []
+        for index, document in enumerate(documents):
+            document.setdefault("_id", next(_object_ids))
+            doc = _clone(document)
+            try:
+                self._index_add(doc)
+            except DuplicateKeyError as e:
+                errors.append({"index": index, "code": 11000, "errmsg": str(e)})
+                if ordered:
+                    break
+                continue
+            self.documents[doc["_id"]] = doc
+            inserted.append(doc["_id"])
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "nInserted": len(inserted)})
+        return InsertManyResult(inserted, True)
+
+    async def update_one(self, flt, update, upsert=False, **kwargs):
+        doc = self._first(flt)
+        if doc is not None:
+            self._update_doc(doc, update)
+            return UpdateResult({"n": 1, "nModified": 1}, True)
+        if upsert:
+            doc = self._upsert_doc(flt, update)
+            return UpdateResult({"n": 1, "nModified": 0, "upserted": doc["_id"]}, True)
+        return UpdateResult({"n": 0, "nModified": 0}, True)
+
+    async def update_many(self, flt, update, upsert=False, **kwargs):
+        docs = self._find(flt)
+        for doc in docs:
+            self._update_doc(doc, update)
+        return UpdateResult({"n": len(docs), "nModified": len(docs)}, True)
+
+    async def replace_one(self, flt, replacement, upsert=False, **kwargs):
+        doc = self._first(flt)
+        new_doc = _clone(replacement)
+        if doc is not None:
+            self._index_remove(doc)
+            new_doc["_id"] = doc["_id"]
+            self._index_add(new_doc)
+            self.documents[doc["_id"]] = new_doc
+            return UpdateResult({"n": 1, "nModified": 1}, True)
+        if upsert:
+            new_doc.setdefault("_id", next(_object_ids))
+            self._index_add(new_doc)
+            self.documents[new_doc["_id"]] = new_doc
+            return UpdateResult({"n": 1, "nModified": 0, "upserted": new_doc["_id"]}, True)
+        return UpdateResult({"n": 0, "nModified": 0}, True)
+
+    async def find_one_and_update(self, flt, update, projection=None, return_document=ReturnDocument.BEFORE,
+                                  upsert=False, **kwargs):
+        doc = self._first(flt)
+        if doc is not None:
+            before = _project(doc, projection)
+            self._update_doc(doc, update)
+            return _project(doc, projection) if return_document == ReturnDocument.AFTER else before
+        if upsert:
+            doc = self._upsert_doc(flt, update)
+            return _project(doc, projection) if return_document == ReturnDocument.AFTER else None
+        return None
+
+    async def find_one_and_delete(self, flt, projection=None, **kwargs):
+        doc = self._first(flt)
+        if doc is None:
+            return None
+        self._index_remove(doc)
+        del self.documents[doc["_id"]]
+        return _project(doc, projection)
+
+    async def delete_one(self, flt, **kwargs):
+        doc = self._first(flt)
+        if doc is None:
+            return DeleteResult({"n": 0}, True)
+        self._index_remove(doc)
+        del self.documents[doc["_id"]]
+        return DeleteResult({"n": 1}, True)
+
+    async def delete_many(self, flt, **kwargs):
+        docs = self._find(flt)
+        for doc in docs:
+            self._index_remove(doc)
+            del self.documents[doc["_id"]]
+        return DeleteResult({"n": len(docs)}, True)
+
+    async def bulk_write(self, requests, ordered=True, **kwargs):
+        counts = {"nInserted": 0, "nUpserted": 0, "nMatched": 0, "nModified": 0, "nRemoved": 0, "upserted": []}
+        errors = []
+        for index, request in enumerate(requests):
+            kind = type(request).__name__
+            try:
+                if kind == "InsertOne":
+                    await self.insert_one(request._doc)
+                    counts["nInserted"] += 1
+                elif kind in ("UpdateOne", "UpdateMany"):
+                    method = self.update_one if kind == "UpdateOne" else self.update_many
+                    result = await method(request._filter, request._doc, upsert=request._upsert)
+                    if result.upserted_id is not None:
+                        counts["nUpserted"] += 1
+                        counts["upserted"].append({"index": index, "_id": result.upserted_id})
+                    else:
+                        counts["nMatched"] += result.matched_count
+                        counts["nModified"] += result.modified_count
+                elif kind == "ReplaceOne":
+                    result = await self.replace_one(request._filter, request._doc, upsert=request._upsert)
+                    counts["nMatched"] += result.matched_count
+                elif kind in ("DeleteOne", "DeleteMany"):
+                    method = self.delete_one if kind == "DeleteOne" else self.delete_many
+                    result = await method(request._filter)
+                    counts["nRemoved"] += result.deleted_count
+                else:
+                    raise NotImplementedError(f"不支持的批量操作 {kind}")
+            except DuplicateKeyError as e:
+                errors.append({"index": index, "code": 11000, "errmsg": str(e)})
+                if ordered:
+                    break
+        if errors:
+            raise BulkWriteError({**counts, "writeErrors": errors})
+        return BulkWriteResult(counts, True)
+
+class MemoryDatabase:
+    """内存数据库，按属性或下标访问集合"""
+    def __init__(self):
+        self._collections: Dict[str, MemoryCollection] = {}
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    def __getitem__(self, name):
+        if name not in self._collections:
+            self._collections[name] = MemoryCollection(name)
+        return self._collections[name]
+
+    async def command(self, *args, **kwargs):
+        return {"ok": 1}
+
+def install() -> MemoryDatabase:
+    """创建内存数据库并替换全局数据库连接，返回该数据库"""
+    memory_db = MemoryDatabase()
+    database.db = memory_db
+    return memory_db
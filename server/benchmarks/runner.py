@@ -0,0 +1,209 @@
+from typing import Dict, Any, List, Callable, Optional
+from contextlib import redirect_stdout
+from datetime import datetime
+from benchmarks import data_generator, mongo_stub
+from models.hypergraph import Hypergraph, Scheme
+from services.hypergraph_service import HypergraphService
+from services.evaluation_cache import evaluation_cache
+from services.schema_inference import schema_registry
+import argparse
+import asyncio
+import io
+import json
+import platform
+import statistics
+import sys
+import time
+
+# 基准用例名称，与 HypergraphService / Hypergraph 中被测的方法一一对应
+CASES = ["rule_element_hyperedges", "scheme_details", "scheme_evaluation", "evaluate_all_schemes"]
+
+def _make_scheme(scheme_data: Dict[str, Any]) -> Scheme:
+    scheme = Scheme(scheme_data["name"], scheme_data["description"], scheme_data["rule_weights"])
+    scheme.id = scheme_data["id"]
+    return scheme
+
+class BenchmarkContext:
+    """一组规模下的基准数据：内存数据库、服务实例和内存超图"""
+    def __init__(self, element_count: int, rule_count: int, scheme_count: int, type_count: int, seed: int):
+        self.element_count = element_count
+        self.elements = data_generator.generate_elements(element_count, type_count, seed)
+        self.rules = data_generator.generate_rules(rule_count, type_count, seed)
+        self.schemes = [_make_scheme(item) for item in data_generator.generate_schemes(scheme_count, self.rules, seed)]
+        with redirect_stdout(io.StringIO()):
+            self.service = HypergraphService()
+        self.service.standalone_schemes = {scheme.id: scheme for scheme in self.schemes}
+        self.hypergraph: Optional[Hypergraph] = None
+
+    async def load(self) -> None:
+        """写入内存数据库，并构建内存超图"""
+        memory_db = mongo_stub.install()
+        await memory_db.elements.create_index("id", unique=True)
+        await memory_db.rules.create_index("id", unique=True)
+        await memory_db.elements.insert_many(self.elements)
+        await memory_db.rules.insert_many(self.rules)
+        self.service._invalidate_rules_cache()
+        # 新的内存数据库版本号从0开始，清空按版本号判断有效性的缓存
+        self.clear_caches()
+
+        self.hypergraph = Hypergraph("benchmark")
+        for element in self.elements:
+            self.hypergraph.add_element(element["id"], element["type"], element["attributes"])
+        for rule_data in self.rules:
+            rule = self.service._build_rule(rule_data["id"], rule_data)
+            if rule is not None:
+                self.hypergraph.add_rule(rule)
+        for scheme in self.schemes:
+            self.hypergraph.add_scheme(scheme)
+
+    def clear_caches(self) -> None:
+        """清空评估缓存，使下一次调用重新应用全部规则"""
+        evaluation_cache.invalidate()
+        schema_registry.clear()
+        self.service._evaluation_elements_cache = None
+
+    def case(self, name: str) -> Callable[[], Any]:
+        """返回被测调用，异步方法返回协程"""
+        scheme = self.schemes[0]
+        if name == "rule_element_hyperedges":
+            return self.service.calculate_rule_element_hyperedges
+        if name == "scheme_details":
+            return lambda: self.service.generate_scheme_details(scheme)
+        if name == "scheme_evaluation":
+            return lambda: self.service.evaluate_scheme_standalone(scheme.id)
+        if name == "evaluate_all_schemes":
+            return self.hypergraph.evaluate_all_schemes
+        raise ValueError(f"未知的基准用例: {name}")
+
+async def _time_call(call: Callable[[], Any]) -> float:
+    started = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        result = call()
+        if asyncio.iscoroutine(result):
+            await result
+    return time.perf_counter() - started
+
+async def run_case(context: BenchmarkContext, name: str, repeat: int, warmup: int = 1, cold: bool = False) -> Dict[str, Any]:
+    """运行单个用例：先预热，再重复计时；cold 为真时每次调用前清空评估缓存"""
+    case = context.case(name)
+
+    def call():
+        if cold:
+            context.clear_caches()
+        return case()
+
+    for _ in range(warmup):
+        await _time_call(call)
+    samples = [await _time_call(call) for _ in range(repeat)]
+    median = statistics.median(samples)
+    return {
+        "case": name,
+        "elements": context.element_count,
+        "cold": cold,
+        "repeat": repeat,
+        "min_s": min(samples),
+        "median_s": median,
+        "mean_s": statistics.mean(samples),
+        "max_s": max(samples),
+        "elements_per_s": context.element_count / median if median else None,
+    }
+
+async def run_benchmarks(sizes: List[int], rule_count: int, scheme_count: int, type_count: int,
+                         seed: int, repeat: int, cases: List[str], cold: bool = False) -> Dict[str, Any]:
+    """按规模依次运行所有用例"""
+    results = []
+    for size in sizes:
+        context = BenchmarkContext(size, rule_count, scheme_count, type_count, seed)
+        await context.load()
+        for name in cases:
+            result = await run_case(context, name, repeat, cold=cold)
+            results.append(result)
+            print(f"{name:<26} {size:>9} 要素  中位数 {result['median_s'] * 1e3:10.1f} ms  "
+                  f"{result['elements_per_s']:12.0f} 要素/秒")
+    return {
+        "meta": {
+            "created_at": datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "rules": rule_count,
+            "schemes": scheme_count,
+            "types": type_count,
+            "seed": seed,
+            "repeat": repeat,
+            "cold": cold,
+        },
+        "results": results,
+    }
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    """与基线对比中位数耗时，返回每个用例的对比结果，比值超过 1 + threshold 视为退化"""
+    def key(item):
+        return item["case"], item["elements"], item.get("cold", False)
+
+    baseline_results = {key(item): item for item in baseline.get("results", [])}
+    comparisons = []
+    for item in current["results"]:
+        base = baseline_results.get(key(item))
+        if base is None or not base["median_s"]:
+            continue
+        ratio = item["median_s"] / base["median_s"]
+        comparisons.append({
+            "case": item["case"],
+            "elements": item["elements"],
+            "baseline_s": base["median_s"],
+            "current_s": item["median_s"],
+            "ratio": ratio,
+            "regression": ratio > 1 + threshold,
+        })
+    return comparisons
+
+def _parse_sizes(value: str) -> List[int]:
+    return [int(float(size)) for size in value.split(",") if size.strip()]
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="规则评估合成基准测试")
+    parser.add_argument("--elements", type=_parse_sizes, default=[10000], help="要素数量，逗号分隔，如 10000,100000,1e6")
+    parser.add_argument("--rules", type=int, default=20, help="规则数量")
+    parser.add_argument("--schemes", type=int, default=10, help="方案数量")
+    parser.add_argument("--types", type=int, default=6, help="要素类型数量")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子")
+    parser.add_argument("--repeat", type=int, default=3, help="每个用例的计时次数")
+    parser.add_argument("--cases", default=",".join(CASES), help="要运行的用例，逗号分隔")
+    parser.add_argument("--cold", action="store_true", help="每次调用前清空评估缓存，测量完整计算的耗时")
+    parser.add_argument("--output", help="将结果写入 JSON 文件，可作为基线")
+    parser.add_argument("--baseline", help="与基线 JSON 文件对比")
+    parser.add_argument("--threshold", type=float, default=0.2, help="判定退化的相对阈值，默认 0.2 即慢 20%%")
+    args = parser.parse_args(argv)
+
+    cases = [name for name in args.cases.split(",") if name]
+    unknown = [name for name in cases if name not in CASES]
+    if unknown:
+        parser.error(f"未知的基准用例: {', '.join(unknown)}")
+
+    current = asyncio.run(run_benchmarks(args.elements, args.rules, args.schemes, args.types,
+                                         args.seed, args.repeat, cases, args.cold))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(current, f, ensure_ascii=False, indent=2)
+        print(f"结果已写入 {args.output}")
+
+    if not args.baseline:
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    comparisons = compare(current, baseline, args.threshold)
+    print()
+    for item in comparisons:
+        flag = "退化" if item["regression"] else "正常"
+        print(f"{item['case']:<26} {item['elements']:>9}  基线 {item['baseline_s'] * 1e3:10.1f} ms  "
+              f"当前 {item['current_s'] * 1e3:10.1f} ms  x{item['ratio']:.2f}  {flag}")
+    regressions = [item for item in comparisons if item["regression"]]
+    if regressions:
+        print(f"\n{len(regressions)} 个用例超过阈值 {args.threshold:.0%}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,6 +4,7 @@ import logging
 from typing import Optional
 import os
 from dotenv import load_dotenv
+from services import mongo_monitor
 
 # 加载环境变量
 load_dotenv()
@@ -16,6 +17,25 @@ logger = logging.getLogger(__name__)
 MONGODB_URL = os.getenv("MONGODB_URL", "mongodb://localhost:27017")
 DATABASE_NAME = os.getenv("DATABASE_NAME", "hypergraph_db")
 
+def _optional_int(name: str) -> Optional[int]:
+    """读取整数类型的环境变量，未设置时返回 None"""
+    value = os.getenv(name)
+    return int(value) if value else None
+
+# 连接池与超时配置（未设置的项使用驱动默认值）
+MONGODB_CLIENT_OPTIONS = {
+    "maxPoolSize": _optional_int("MONGODB_MAX_POOL_SIZE"),
+    "minPoolSize": _optional_int("MONGODB_MIN_POOL_SIZE"),
+    "maxIdleTimeMS": _optional_int("MONGODB_MAX_IDLE_TIME_MS"),
+    "waitQueueTimeoutMS": _optional_int("MONGODB_WAIT_QUEUE_TIMEOUT_MS"),
+    "connectTimeoutMS": _optional_int("MONGODB_CONNECT_TIMEOUT_MS"),
+    "serverSelectionTimeoutMS": _optional_int("MONGODB_SERVER_SELECTION_TIMEOUT_MS"),
+    "socketTimeoutMS": _optional_int("MONGODB_SOCKET_TIMEOUT_MS"),
+}
+
+# 是否注册命令与连接池监听器
+MONGODB_MONITORING = os.getenv("MONGODB_MONITORING", "1") == "1"
+
 # 全局数据库客户端
 client: Optional[AsyncIOMotorClient] = None
 db = None
@@ -24,21 +44,34 @@ async def connect_to_mongodb():
     """连接到MongoDB数据库"""
     global client, db
     try:
-        client = AsyncIOMotorClient(MONGODB_URL)
+        options = {key: value for key, value in MONGODB_CLIENT_OPTIONS.items() if value is not None}
+        if MONGODB_MONITORING:
+            options["event_listeners"] = mongo_monitor.create_listeners()
+        client = AsyncIOMotorClient(MONGODB_URL, **options)
         # 验证连接
         await client.admin.command('ping')
         db = client[DATABASE_NAME]
         logger.info("成功连接到MongoDB")
-        
-        # 创建索引
+    except ConnectionFailure as e:
+        logger.error(f"无法连接到MongoDB: {e}")
+        raise
+
+async def create_indexes():
+    """创建索引，索引已存在时不做任何事"""
+    try:
         await db.elements.create_index("id", unique=True)
         await db.elements.create_index("type")
+        await db.elements.create_index("updated_at")
         await db.rules.create_index("id", unique=True)
         await db.rules.create_index("name")
+        await db.versions.create_index("id", unique=True)
+        await db.scheme_snapshots.create_index("scheme_id", unique=True)
+        await db.hypergraphs.create_index("id", unique=True)
+        await db.hypergraph_layers.create_index([("hypergraph_id", 1), ("id", 1)], unique=True)
         
         logger.info("已创建数据库索引")
     except ConnectionFailure as e:
-        logger.error(f"无法连接到MongoDB: {e}")
+        logger.error(f"创建数据库索引失败: {e}")
         raise
 
 async def close_mongodb_connection():
@@ -1,11 +1,18 @@
 from fastapi import FastAPI, Body, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from routes.hypergraph import router as hypergraph_router
+from routes.hypergraph import router as hypergraph_router, hypergraph_service as shared_hypergraph_service
+from routes.metrics import router as metrics_router
 import uvicorn
 import logging
-from database import connect_to_mongodb, close_mongodb_connection
-from services.hypergraph_service import HypergraphService
-from services.db_service import DatabaseService
+import asyncio
+from routes.health import router as health_router
+from database import close_mongodb_connection
+from services.instrumentation import RequestMetricsMiddleware, monitor_event_loop_lag
+from services.tracing import TracingMiddleware
+from services.evaluation_executor import evaluation_executor
+from services.job_service import job_manager
+from services.shared_element_store import shared_element_store, run_shared_store
+from services.warmup import warm_up, warmup_state
 from typing import Dict, Any
 
 # 配置日志
@@ -24,38 +31,55 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 记录每个路由的请求数与耗时
+app.add_middleware(RequestMetricsMiddleware)
+
+# 记录请求各阶段耗时，附加 Server-Timing 响应头
+app.add_middleware(TracingMiddleware)
+
 # 挂载路由
 app.include_router(hypergraph_router, prefix="/api/hypergraph", tags=["hypergraph"])
+app.include_router(metrics_router, tags=["metrics"])
+app.include_router(health_router, tags=["health"])
 
 # 根路由
 @app.get("/")
 async def root():
     return {"message": "欢迎使用超图分析系统 API"}
 
-# 启动事件
+# 启动事件：只启动后台任务，不等待数据库和缓存，进程立即可以响应存活检查
 @app.on_event("startup")
 async def startup_event():
     logger.info("服务器启动")
     
-    # 连接数据库
-    await connect_to_mongodb()
+    # 启动事件循环延迟监控
+    app.state.loop_lag_monitor = asyncio.create_task(monitor_event_loop_lag())
+    
+    # 启动后台任务队列
+    job_manager.start()
     
-    # 打印所有路由
-    routes = [{"path": route.path, "name": route.name, "methods": route.methods} for route in app.routes]
-    logger.info(f"注册的路由: {routes}")
+    # 多进程共享要素：其中一个工作进程在预热完成后发布要素到共享内存，其余进程只读挂载
+    app.state.shared_store_task = None
+    if shared_element_store.enabled:
+        app.state.shared_store_task = asyncio.create_task(
+            run_shared_store(shared_hypergraph_service.publish_shared_elements, lambda: warmup_state.ready))
     
-    # 迁移现有数据到数据库
-    hypergraph_service = HypergraphService()
-    elements = hypergraph_service.get_all_elements()
-    rules = hypergraph_service.get_all_rules()
+    # 后台预热：连接数据库、迁移数据、加载要素和编译规则，完成后 /readyz 返回成功
+    app.state.warmup_task = asyncio.create_task(warm_up(shared_hypergraph_service))
     
-    await DatabaseService.migrate_elements(elements)
-    await DatabaseService.migrate_rules(rules)
+    logger.debug(f"注册的路由: {[route.path for route in app.routes]}")
 
 # 关闭事件
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("服务器关闭")
+    app.state.loop_lag_monitor.cancel()
+    app.state.warmup_task.cancel()
+    if app.state.shared_store_task is not None:
+        app.state.shared_store_task.cancel()
+        shared_element_store.close()
+    await job_manager.stop()
+    evaluation_executor.shutdown()
     await close_mongodb_connection()
 
 if __name__ == "__main__":
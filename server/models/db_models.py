@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Union
 from datetime import datetime
 
 class ElementDB(BaseModel):
@@ -49,6 +49,15 @@ class ElementUpdate(BaseModel):
     """更新要素的请求模型"""
     attributes: Dict[str, Any]
 
+class ElementPatch(BaseModel):
+    """批量更新中单个要素的补丁"""
+    id: str
+    attributes: Dict[str, Any]
+
+class ElementBatchUpdate(BaseModel):
+    """批量更新要素的请求模型"""
+    patches: List[ElementPatch]
+
 class RuleCreate(BaseModel):
     """创建规则的请求模型"""
     name: str
@@ -79,4 +88,16 @@ class SchemeUpdate(BaseModel):
     """更新方案的请求模型"""
     name: Optional[str] = None
     description: Optional[str] = None
-    rule_weights: Optional[Dict[str, Any]] = None 
\ No newline at end of file
+    rule_weights: Optional[Dict[str, Any]] = None
+
+class RuleQuery(BaseModel):
+    """规则组合查询的请求模型"""
+    expression: Union[str, Dict[str, Any]]  # 如 "季节匹配 AND 高评分 AND NOT 经济型住宿"，或 {"and": [...]} 形式的表达式树
+    parameters: Dict[str, Dict[str, Any]] = {}  # 规则ID -> 覆盖的参数
+    offset: int = Field(0, ge=0)
+    limit: int = Field(100, ge=0, le=10000)
+
+class JobCreate(BaseModel):
+    """提交后台任务的请求模型"""
+    type: str  # scheme_details | scheme_evaluation | rule_element_hyperedges
+    params: Dict[str, Any] = {}
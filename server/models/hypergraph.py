@@ -2,8 +2,15 @@ from pydantic import BaseModel, Field
 from typing import List, Dict, Any, Optional, Callable, Union, Set
 from uuid import uuid4
 from datetime import datetime
+from collections.abc import Mapping, MutableMapping
 import json
+import logging
+import sys
 import textwrap
+import threading
+
+# 配置日志
+logger = logging.getLogger(__name__)
 
 # 基础模型定义
 class Node(BaseModel):
@@ -35,6 +42,7 @@ class LayerCreate(LayerBase):
 
 class Layer(LayerBase):
     id: str = Field(default_factory=lambda: str(uuid4()))
+    version: int = 1  # 每次更新层的内容或属性时加一
     nodes: List[Node] = []
     edges: List[Edge] = []
     hyperedges: List[Hyperedge] = []
@@ -48,6 +56,16 @@ class LayerUpdate(BaseModel):
     edges: Optional[List[Edge]] = None
     hyperedges: Optional[List[Hyperedge]] = None
 
+class LayerPatch(BaseModel):
+    """层的增量修改：按ID删除，或按ID添加/替换节点、边和超边"""
+    base_version: Optional[int] = None  # 不为空时，层的当前版本与其不同则拒绝补丁
+    upsert_nodes: List[Node] = []
+    remove_nodes: List[str] = []
+    upsert_edges: List[Edge] = []
+    remove_edges: List[str] = []
+    upsert_hyperedges: List[Hyperedge] = []
+    remove_hyperedges: List[str] = []
+
 class HypergraphBase(BaseModel):
     name: str
     description: Optional[str] = None
@@ -61,14 +79,139 @@ class HypergraphUpdate(BaseModel):
     layers: Optional[List[Layer]] = None
 
 # 核心类定义 - 按依赖顺序排列
+class ElementSchema:
+    """要素结构：同一类型、同一组属性键的要素共享一个键元组，要素本身只保存对应的值元组"""
+    __slots__ = ("element_type", "keys", "index", "_transitions")
+
+    def __init__(self, element_type: str, keys: tuple):
+        self.element_type = element_type
+        self.keys = keys
+        self.index = {key: position for position, key in enumerate(keys)}
+        self._transitions: Dict[Any, "ElementSchema"] = {}  # 新增的键 -> 新结构
+
+    def with_key(self, key) -> "ElementSchema":
+        """增加一个键后的结构"""
+        schema = self._transitions.get(key)
+        if schema is None:
+            schema = element_schema(self.element_type, self.keys + (key,))
+            self._transitions[key] = schema
+        return schema
+
+    def without_key(self, key) -> "ElementSchema":
+        """去掉一个键后的结构"""
+        return element_schema(self.element_type, tuple(k for k in self.keys if k != key))
+
+# (要素类型, 键元组) -> 共享的要素结构
+_element_schemas: Dict[tuple, ElementSchema] = {}
+_element_schemas_lock = threading.Lock()
+
+def element_schema(element_type: str, keys: tuple) -> ElementSchema:
+    """获取共享的要素结构，键名驻留（intern）后相同结构的要素共用同一个键元组"""
+    schema = _element_schemas.get((element_type, keys))
+    if schema is None:
+        with _element_schemas_lock:
+            schema = _element_schemas.get((element_type, keys))
+            if schema is None:
+                interned = tuple(sys.intern(key) if type(key) is str else key for key in keys)
+                schema = ElementSchema(element_type, interned)
+                _element_schemas[(element_type, keys)] = schema
+    return schema
+
+class ElementAttributes(MutableMapping):
+    """要素属性的字典视图，读写直接作用于要素的值元组，不复制属性"""
+    __slots__ = ("_element",)
+
+    def __init__(self, element: "Element"):
+        self._element = element
+
+    def __getitem__(self, key):
+        element = self._element
+        position = element._schema.index.get(key)
+        if position is None:
+            raise KeyError(key)
+        return element._values[position]
+
+    def get(self, key, default=None):
+        element = self._element
+        position = element._schema.index.get(key)
+        return default if position is None else element._values[position]
+
+    def __contains__(self, key) -> bool:
+        return key in self._element._schema.index
+
+    def __iter__(self):
+        return iter(self._element._schema.keys)
+
+    def __len__(self) -> int:
+        return len(self._element._schema.keys)
+
+    def __setitem__(self, key, value) -> None:
+        element = self._element
+        position = element._schema.index.get(key)
+        if position is None:
+            element._schema = element._schema.with_key(key)
+            element._values = element._values + (value,)
+        else:
+            values = list(element._values)
+            values[position] = value
+            element._values = tuple(values)
+
+    def __delitem__(self, key) -> None:
+        element = self._element
+        position = element._schema.index.get(key)
+        if position is None:
+            raise KeyError(key)
+        element._schema = element._schema.without_key(key)
+        element._values = element._values[:position] + element._values[position + 1:]
+
+    def copy(self) -> Dict[str, Any]:
+        return dict(zip(self._element._schema.keys, self._element._values))
+
+    def __repr__(self) -> str:
+        return repr(self.copy())
+
 class Element:
-    """要素类，表示超图底层的基本要素"""
-    def __init__(self, element_id: str, element_type: str, attributes: Dict[str, Any]):
+    """要素类，表示超图底层的基本要素
+
+    属性按要素结构存储：键元组由同类型要素共享，要素只保存值元组；attributes 返回不复制的字典视图。
+    """
+    __slots__ = ("id", "type", "_schema", "_values", "score", "_rule_scores")
+
+    def __init__(self, element_id: str, element_type: str, attributes: Mapping):
         self.id = element_id
         self.type = element_type
-        self.attributes = attributes
+        if isinstance(attributes, ElementAttributes) and attributes._element.type == element_type:
+            # 来自另一个要素的视图，直接共享结构和值元组
+            self._schema = attributes._element._schema
+            self._values = attributes._element._values
+        else:
+            self._schema = element_schema(element_type, tuple(attributes))
+            self._values = tuple(attributes.values())
         self.score = attributes.get("评分", 0)  # 初始得分
-        self.rule_scores = {}  # 存储各规则对该要素的评分
+        self._rule_scores: Optional[Dict[str, float]] = None  # 各规则对该要素的评分，首次访问时创建
+
+    @property
+    def attributes(self) -> ElementAttributes:
+        return ElementAttributes(self)
+
+    @attributes.setter
+    def attributes(self, attributes: Mapping) -> None:
+        self._schema = element_schema(self.type, tuple(attributes))
+        self._values = tuple(attributes.values())
+
+    @property
+    def rule_scores(self) -> Dict[str, float]:
+        if self._rule_scores is None:
+            self._rule_scores = {}
+        return self._rule_scores
+
+    @rule_scores.setter
+    def rule_scores(self, rule_scores: Dict[str, float]) -> None:
+        self._rule_scores = rule_scores
+
+    def view(self) -> Dict[str, Any]:
+        """规则读取的 {"id", "type", "attributes"} 结构，attributes 为不复制的视图"""
+        return {"id": self.id, "type": self.type, "attributes": ElementAttributes(self)}
 
     def to_dict(self) -> Dict[str, Any]:
         """转换为字典，避免递归嵌套"""
@@ -78,29 +221,28 @@ class Element:
             "type": self.type
         }
         
-        # 将属性直接复制到顶层，而不是嵌套在 attributes 中
-        if self.attributes:
-            for key, value in self.attributes.items():
-                # 避免覆盖基本字段
-                if key not in result:
-                    result[key] = value
+        # 将属性直接复制到顶层，而不是嵌套在 attributes 中，避免覆盖基本字段
+        for key, value in zip(self._schema.keys, self._values):
+            if key not in result:
+                result[key] = value
         
         # 添加 score 和 rule_scores 字段（如果有）
-        if hasattr(self, 'score') and self.score:
+        if self.score:
             result["score"] = self.score
         
-        if hasattr(self, 'rule_scores') and self.rule_scores:
-            result["rule_scores"] = self.rule_scores
+        if self._rule_scores:
+            result["rule_scores"] = self._rule_scores
         
         return result
     
     def __getitem__(self, key):
         """允许使用字典方式访问属性"""
-        return self.attributes.get(key)
+        return self.get(key)
     
     def get(self, key, default=None):
         """与字典的get方法类似"""
-        return self.attributes.get(key, default)
+        position = self._schema.index.get(key)
+        return default if position is None else self._values[position]
 
 class Rule:
     """规则类，表示评估要素的规则"""
@@ -116,6 +258,8 @@ class Rule:
         self.description = description
         self.code = code
         self.parameters = parameters or {}  # 存储规则的默认参数
+        self.error_count = 0  # 规则函数抛出异常的次数
+        self.last_error: Optional[str] = None  # 最近一次异常信息
     
     def apply(self, element: Dict[str, Any], parameter_values: Dict[str, Any] = None) -> float:
         """应用规则到要素，可以传入参数值"""
@@ -138,7 +282,11 @@ class Rule:
         try:
             return self.rule_function(attrs, params)
         except Exception as e:
-            print(f"应用规则 {self.name} 失败: {e}")
+            # 同一规则通常会对大量要素重复失败，只记录第一次，其余只计数
+            if not self.error_count:
+                logger.warning(f"应用规则 {self.name} 失败: {e}")
+            self.error_count += 1
+            self.last_error = f"{type(e).__name__}: {e}"
             return 0.0
     
     def to_dict(self) -> Dict[str, Any]:
@@ -293,6 +441,15 @@ class Hypergraph:
         self.elements_by_type: Dict[str, List[Element]] = {}  # 按类型分组的要素
         self.rules: Dict[str, Rule] = {}  # 规则字典，键为规则ID
         self.schemes: Dict[str, Scheme] = {}  # 方案字典，键为方案ID
+        
+        # 自定义的节点/边/超边层，及各层的邻接索引（层ID -> LayerGraph）
+        self.layers: List[Layer] = []
+        self.layer_graphs: Dict[str, Any] = {}
+        
+        # 数据库中超图文档的版本，每次重写文档时递增
+        self.version = 1
+        self.created_at = datetime.now()
+        self.updated_at = datetime.now()
     
     def add_element(self, element_id: str, element_type: str, attributes: Dict[str, Any]) -> Element:
         """添加要素"""
@@ -322,14 +479,65 @@ class Hypergraph:
     def add_scheme(self, scheme: Scheme) -> None:
         """添加方案"""
         self.schemes[scheme.id] = scheme
-    
+
+    def evaluate_scheme(self, scheme_id: str) -> Dict[str, Any]:
+        """评估特定方案"""
+        scheme = self.schemes.get(scheme_id)
+        if not scheme:
+            return {"error": f"方案 {scheme_id} 不存在"}
+
+        # 规则按 {"id", "type", "attributes"} 结构读取要素
+        elements = [element.view() for element in self.elements.values()]
+
+        # 评估结果
+        selected_elements = []
+        total_score = 0.0
+
+        for element, element_view in zip(self.elements.values(), elements):
+            element_score = 0.0
+            element_rule_scores = {}
+
+            # 对每个规则进行评估，权重可以是数字，也可以是包含权重和参数的对象
+            for rule_id, rule_config in scheme.rule_weights.items():
+                rule = self.rules.get(rule_id)
+                if not rule:
+                    continue
+
+                if isinstance(rule_config, (int, float)):
+                    weight, parameter_values = rule_config, None
+                else:
+                    weight, parameter_values = rule_config.get("weight", 1.0), rule_config.get("parameters")
+
+                rule_score = rule.apply(element_view, parameter_values)
+                if rule_score > 0:
+                    weighted_score = rule_score * weight
+                    element_score += weighted_score
+                    element_rule_scores[rule_id] = weighted_score
+
+            if element_score > 0:
+                # 创建要素的副本，添加得分信息
+                element_copy = element.to_dict()
+                element_copy["score"] = element_score
+                element_copy["rule_scores"] = element_rule_scores
+
+                selected_elements.append(element_copy)
+                total_score += element_score
+
+        return {
+            "scheme_id": scheme.id,
+            "scheme_name": scheme.name,
+            "scheme_description": scheme.description,
+            "scheme_score": total_score,
+            "selected_elements": selected_elements
+        }
+
     def evaluate_all_schemes(self) -> Dict[str, Dict[str, Any]]:
         """评估所有方案"""
         results = {}
         for scheme_id, scheme in self.schemes.items():
             results[scheme_id] = self.evaluate_scheme(scheme_id)
         return results
-    
+
     def to_dict(self) -> Dict[str, Any]:
         """将超图转换为字典"""
         return {
@@ -0,0 +1,281 @@
+from typing import Dict, Any, Set, Iterable
+from models.hypergraph import Layer, LayerPatch, Node, Edge, Hyperedge
+
+class LayerGraph:
+    """层的邻接索引：节点 <-> 超边、节点 <-> 边的双向索引及度数统计
+
+    层中的 nodes / edges / hyperedges 列表仍是数据的来源，索引随层的增删改增量维护；
+    超边或边引用的节点即使不在 nodes 中也会被索引。按补丁修改（apply_patch）时索引先于列表更新，
+    stale 为真表示层的列表已落后，读取层之前由 materialize 按索引中的顺序重建列表。
+    """
+    def __init__(self, layer: Layer):
+        self.nodes: Dict[str, Node] = {}
+        self.edges: Dict[str, Edge] = {}
+        self.hyperedges: Dict[str, Hyperedge] = {}
+        self.hyperedge_nodes: Dict[str, frozenset] = {}  # 超边ID -> 节点ID集合
+        self.node_hyperedges: Dict[str, Set[str]] = {}  # 节点ID -> 超边ID集合
+        self.node_out_edges: Dict[str, Set[str]] = {}  # 节点ID -> 以该节点为起点的边ID集合
+        self.node_in_edges: Dict[str, Set[str]] = {}  # 节点ID -> 以该节点为终点的边ID集合
+        self.incidences = 0  # 超边与节点的关联数
+        self._degree_counts: Dict[int, int] = {}  # 超边度数 -> 节点数
+        self._size_counts: Dict[int, int] = {}  # 超边大小 -> 超边数
+        self.stale = False
+        self.sync(layer)
+
+    # 节点
+
+    def add_node(self, node: Node) -> None:
+        self.nodes[node.id] = node
+
+    def remove_node(self, node_id: str) -> None:
+        """移除节点本身；仍引用它的超边和边保留，由调用方决定是否一并移除"""
+        self.nodes.pop(node_id, None)
+
+    # 边
+
+    def add_edge(self, edge: Edge) -> None:
+        """添加边；同ID的边已存在时替换并保持其原有位置"""
+        current = self.edges.get(edge.id)
+        if current is not None:
+            self._discard(self.node_out_edges, current.source, edge.id)
+            self._discard(self.node_in_edges, current.target, edge.id)
+        self.edges[edge.id] = edge
+        self.node_out_edges.setdefault(edge.source, set()).add(edge.id)
+        self.node_in_edges.setdefault(edge.target, set()).add(edge.id)
+
+    def remove_edge(self, edge_id: str) -> None:
+        edge = self.edges.pop(edge_id, None)
+        if edge is None:
+            return
+        self._discard(self.node_out_edges, edge.source, edge_id)
+        self._discard(self.node_in_edges, edge.target, edge_id)
+
+    # 超边
+
+    def add_hyperedge(self, hyperedge: Hyperedge) -> None:
+        """添加超边；同ID的超边已存在时替换并保持其原有位置"""
+        if hyperedge.id in self.hyperedges:
+            self._unlink_hyperedge(hyperedge.id)
+        members = frozenset(hyperedge.nodes)
+        self.hyperedges[hyperedge.id] = hyperedge
+        self.hyperedge_nodes[hyperedge.id] = members
+        for node_id in members:
+            incident = self.node_hyperedges.get(node_id)
+            if incident is None:
+                incident = self.node_hyperedges[node_id] = set()
+            else:
+                self._count(self._degree_counts, len(incident), -1)
+            incident.add(hyperedge.id)
+            self._count(self._degree_counts, len(incident), 1)
+        self.incidences += len(members)
+        self._count(self._size_counts, len(members), 1)
+
+    def remove_hyperedge(self, hyperedge_id: str) -> None:
+        if self.hyperedges.pop(hyperedge_id, None) is None:
+            return
+        self._unlink_hyperedge(hyperedge_id)
+
+    def _unlink_hyperedge(self, hyperedge_id: str) -> None:
+        """从节点索引和统计中移除超边"""
+        members = self.hyperedge_nodes.pop(hyperedge_id)
+        for node_id in members:
+            incident = self.node_hyperedges[node_id]
+            self._count(self._degree_counts, len(incident), -1)
+            incident.discard(hyperedge_id)
+            if incident:
+                self._count(self._degree_counts, len(incident), 1)
+            else:
+                del self.node_hyperedges[node_id]
+        self.incidences -= len(members)
+        self._count(self._size_counts, len(members), -1)
+
+    def _build_hyperedges(self, hyperedges: Dict[str, Hyperedge]) -> None:
+        """索引为空时批量建立超边索引，最后再统计度数分布"""
+        node_hyperedges = self.node_hyperedges
+        for hyperedge_id, hyperedge in hyperedges.items():
+            members = frozenset(hyperedge.nodes)
+            self.hyperedges[hyperedge_id] = hyperedge
+            self.hyperedge_nodes[hyperedge_id] = members
+            for node_id in members:
+                incident = node_hyperedges.get(node_id)
+                if incident is None:
+                    node_hyperedges[node_id] = {hyperedge_id}
+                else:
+                    incident.add(hyperedge_id)
+            self.incidences += len(members)
+            self._count(self._size_counts, len(members), 1)
+        for incident in node_hyperedges.values():
+            self._count(self._degree_counts, len(incident), 1)
+
+    @staticmethod
+    def _count(counts: Dict[int, int], key: int, delta: int) -> None:
+        value = counts.get(key, 0) + delta
+        if value:
+            counts[key] = value
+        else:
+            counts.pop(key, None)
+
+    @staticmethod
+    def _discard(index: Dict[str, Set[str]], node_id: str, item_id: str) -> None:
+        items = index.get(node_id)
+        if items is not None:
+            items.discard(item_id)
+            if not items:
+                del index[node_id]
+
+    def sync(self, layer: Layer) -> Dict[str, int]:
+        """按层当前的列表增量更新索引：只处理新增、删除和内容变化的节点、边和超边，返回各自的变更数"""
+        changes = {"nodes": 0, "edges": 0, "hyperedges": 0}
+
+        nodes = {node.id: node for node in layer.nodes}
+        for node_id in [node_id for node_id in self.nodes if node_id not in nodes]:
+            self.remove_node(node_id)
+            changes["nodes"] += 1
+        for node_id, node in nodes.items():
+            if self.nodes.get(node_id) is not node:
+                self.add_node(node)
+                changes["nodes"] += 1
+
+        edges = {edge.id: edge for edge in layer.edges}
+        for edge_id in [edge_id for edge_id in self.edges if edge_id not in edges]:
+            self.remove_edge(edge_id)
+            changes["edges"] += 1
+        for edge_id, edge in edges.items():
+            current = self.edges.get(edge_id)
+            if current is None or (current.source, current.target) != (edge.source, edge.target):
+                self.add_edge(edge)
+                changes["edges"] += 1
+            elif current is not edge:
+                self.edges[edge_id] = edge
+
+        # 索引中的顺序与层的列表一致
+        self.nodes, self.edges = nodes, edges
+
+        hyperedges = {hyperedge.id: hyperedge for hyperedge in layer.hyperedges}
+        self.stale = False
+        if not self.hyperedges:
+            self._build_hyperedges(hyperedges)
+            changes["hyperedges"] = len(hyperedges)
+            return changes
+        for hyperedge_id in [hyperedge_id for hyperedge_id in self.hyperedges if hyperedge_id not in hyperedges]:
+            self.remove_hyperedge(hyperedge_id)
+            changes["hyperedges"] += 1
+        for hyperedge_id, hyperedge in hyperedges.items():
+            members = self.hyperedge_nodes.get(hyperedge_id)
+            if members is None or members != frozenset(hyperedge.nodes):
+                self.add_hyperedge(hyperedge)
+                changes["hyperedges"] += 1
+            elif self.hyperedges[hyperedge_id] is not hyperedge:
+                self.hyperedges[hyperedge_id] = hyperedge
+        # 索引中的顺序与层的列表一致
+        self.hyperedges = hyperedges
+        return changes
+
+    def apply_patch(self, patch: LayerPatch) -> Dict[str, int]:
+        """按ID删除、添加或替换节点、边和超边，先删除后添加；返回各自的变更数
+
+        同一对象既删除又写入时以写入为准，按替换处理并保持原有位置，与数据库中的保存顺序一致。
+        耗时只与补丁中的对象数及涉及超边的大小有关，层的列表在 materialize 时才重建。
+        """
+        changes = {"nodes": 0, "edges": 0, "hyperedges": 0}
+        upserted = {node.id for node in patch.upsert_nodes}
+        for node_id in patch.remove_nodes:
+            if node_id in self.nodes and node_id not in upserted:
+                self.remove_node(node_id)
+                changes["nodes"] += 1
+        upserted = {edge.id for edge in patch.upsert_edges}
+        for edge_id in patch.remove_edges:
+            if edge_id in self.edges and edge_id not in upserted:
+                self.remove_edge(edge_id)
+                changes["edges"] += 1
+        upserted = {hyperedge.id for hyperedge in patch.upsert_hyperedges}
+        for hyperedge_id in patch.remove_hyperedges:
+            if hyperedge_id in self.hyperedges and hyperedge_id not in upserted:
+                self.remove_hyperedge(hyperedge_id)
+                changes["hyperedges"] += 1
+        for node in patch.upsert_nodes:
+            self.add_node(node)
+        for edge in patch.upsert_edges:
+            self.add_edge(edge)
+        for hyperedge in patch.upsert_hyperedges:
+            self.add_hyperedge(hyperedge)
+        changes["nodes"] += len(patch.upsert_nodes)
+        changes["edges"] += len(patch.upsert_edges)
+        changes["hyperedges"] += len(patch.upsert_hyperedges)
+        self.stale = True
+        return changes
+
+    def materialize(self, layer: Layer) -> None:
+        """补丁修改后按索引重建层的列表"""
+        if not self.stale:
+            return
+        layer.nodes = list(self.nodes.values())
+        layer.edges = list(self.edges.values())
+        layer.hyperedges = list(self.hyperedges.values())
+        self.stale = False
+
+    # 查询
+
+    def node_ids(self) -> Set[str]:
+        """节点及被超边或边引用的所有节点ID"""
+        return set(self.nodes) | set(self.node_hyperedges) | set(self.node_out_edges) | set(self.node_in_edges)
+
+    def incident_hyperedges(self, node_id: str) -> Set[str]:
+        return self.node_hyperedges.get(node_id, set())
+
+    def degree(self, node_id: str) -> Dict[str, int]:
+        return {
+            "hyperedges": len(self.node_hyperedges.get(node_id, ())),
+            "out_edges": len(self.node_out_edges.get(node_id, ())),
+            "in_edges": len(self.node_in_edges.get(node_id, ()))
+        }
+
+    def neighbors(self, node_id: str, via: Iterable[str] = ("hyperedges", "edges")) -> Set[str]:
+        """与节点共享超边或由边直接相连的节点，耗时与节点的度数及所在超边的大小成正比"""
+        result: Set[str] = set()
+        if "hyperedges" in via:
+            for hyperedge_id in self.node_hyperedges.get(node_id, ()):
+                result.update(self.hyperedge_nodes[hyperedge_id])
+        if "edges" in via:
+            for edge_id in self.node_out_edges.get(node_id, ()):
+                result.add(self.edges[edge_id].target)
+            for edge_id in self.node_in_edges.get(node_id, ()):
+                result.add(self.edges[edge_id].source)
+        result.discard(node_id)
+        return result
+
+    def neighborhood(self, node_id: str) -> Dict[str, Any]:
+        """节点的度数、关联的超边和边以及相邻节点"""
+        return {
+            "node_id": node_id,
+            "node": self.nodes[node_id].dict() if node_id in self.nodes else None,
+            "degree": self.degree(node_id),
+            "hyperedges": sorted(self.node_hyperedges.get(node_id, ())),
+            "out_edges": sorted(self.node_out_edges.get(node_id, ())),
+            "in_edges": sorted(self.node_in_edges.get(node_id, ())),
+            "neighbors": sorted(self.neighbors(node_id))
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        """度数统计，由增量维护的分布计算，耗时只与不同度数的个数有关
+
+        node_degree 统计至少属于一条超边的节点所在的超边数，hyperedge_size 统计超边包含的节点数。
+        """
+        def summary(counts: Dict[int, int], total: int) -> Dict[str, Any]:
+            count = sum(counts.values())
+            return {
+                "min": min(counts) if counts else 0,
+                "max": max(counts) if counts else 0,
+                "mean": total / count if count else 0.0,
+                "distribution": {str(key): counts[key] for key in sorted(counts)}
+            }
+
+        return {
+            "nodes": len(self.nodes),
+            "edges": len(self.edges),
+            "hyperedges": len(self.hyperedges),
+            "incidences": self.incidences,
+            "incident_nodes": len(self.node_hyperedges),
+            "node_degree": summary(self._degree_counts, self.incidences),
+            "hyperedge_size": summary(self._size_counts, self.incidences)
+        }
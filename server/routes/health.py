@@ -0,0 +1,20 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from typing import Dict, Any
+from services.warmup import warmup_state
+
+# 创建路由器
+router = APIRouter()
+
+# 路由：存活检查，进程能处理请求即返回成功
+@router.get("/healthz", response_model=Dict[str, Any])
+async def healthz():
+    return {"status": "ok"}
+
+# 路由：就绪检查，后台预热完成前返回 503
+@router.get("/readyz", response_model=Dict[str, Any])
+async def readyz():
+    state = warmup_state.to_dict()
+    if not warmup_state.ready:
+        return JSONResponse(status_code=503, content=state)
+    return state
@@ -1,23 +1,28 @@
-from fastapi import APIRouter, HTTPException, Body
+from fastapi import APIRouter, HTTPException, Body, Request, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
 from typing import Dict, Any, List, Optional
-from models.hypergraph import Scheme
-from services.hypergraph_service import HypergraphService
-from models.db_models import ElementCreate, ElementUpdate, RuleCreate, RuleUpdate, SchemeCreate, SchemeUpdate
+from models.hypergraph import Scheme, LayerCreate, LayerUpdate, LayerPatch
+from services.hypergraph_service import HypergraphService, HypergraphVersionConflict, HypergraphExists
+from services.element_import import SUPPORTED_FORMATS, SUPPORTED_MODES, detect_format
+from services.rule_profiler import rule_profiler
+from services.tracing import span
+from services.job_service import job_manager, JobQueueFull, STATUS_SUCCEEDED
+from services.hypergraph_analytics import LAYERS, LAYER_RULE, LAYER_SCHEME
+from models.db_models import ElementCreate, ElementUpdate, ElementBatchUpdate, RuleCreate, RuleUpdate, SchemeCreate, SchemeUpdate, JobCreate, RuleQuery
 from pydantic import BaseModel
 
 # 创建路由器
 router = APIRouter()
 
-# 创建服务实例
+# 创建服务实例；演示超图在启动后的后台预热中创建
 hypergraph_service = HypergraphService()
 
-# 创建演示超图
-demo_hypergraph = hypergraph_service.create_demo_hypergraph()
-
 # 请求模型
 class HypergraphCreate(BaseModel):
     name: str
     description: str = ""
+    layers: List[LayerCreate] = []
 
 class ElementCreate(BaseModel):
     id: str
@@ -34,6 +39,7 @@ class RuleCreate(BaseModel):
     affected_element_types: List[str] = []
     description: str = ""
     code: str = ""
+    parameters: Dict[str, Any] = {}
 
 class RuleUpdate(BaseModel):
     name: Optional[str] = None
@@ -42,6 +48,7 @@ class RuleUpdate(BaseModel):
     affected_element_types: Optional[List[str]] = None
     description: Optional[str] = None
     code: Optional[str] = None
+    parameters: Optional[Dict[str, Any]] = None
 
 # 共享要素和规则的路由
 # 这些路由应该在超图特定路由之前定义
@@ -56,15 +63,67 @@ async def get_all_shared_elements():
 async def get_shared_elements_by_type(element_type: str):
     return await hypergraph_service.get_elements_by_type_async(element_type)
 
+# 路由：获取按要素类型推断的属性结构（键集合、取值类别和列存储类型）
+@router.get("/element-schemas", response_model=Dict[str, Any])
+async def get_element_schemas(refresh: bool = False):
+    return await hypergraph_service.get_element_schemas_async(refresh)
+
+# 路由：获取特定要素类型的属性结构
+@router.get("/element-schemas/{element_type}", response_model=Dict[str, Any])
+async def get_element_schema(element_type: str, refresh: bool = False):
+    schemas = await hypergraph_service.get_element_schemas_async(refresh)
+    if element_type not in schemas:
+        raise HTTPException(status_code=404, detail=f"要素类型 {element_type} 不存在")
+    return schemas[element_type]
+
 # 路由：创建新共享要素
 @router.post("/elements", response_model=Dict[str, Any], status_code=201)
 async def create_shared_element(element_data: ElementCreate):
     return await hypergraph_service.create_element_async(element_data.id, element_data.type, element_data.attributes)
 
+# 路由：批量导入共享要素
+# 请求体为 NDJSON（每行一个要素）或 CSV（表头需包含 id 和 type，其余列作为属性）
+@router.post("/elements/bulk", response_model=Dict[str, Any])
+async def import_shared_elements(
+    request: Request,
+    format: Optional[str] = None,
+    mode: str = "upsert",
+    batch_size: int = Query(1000, ge=1, le=10000)
+):
+    fmt = (format or detect_format(request.headers.get("content-type")) or "").lower()
+    if fmt not in SUPPORTED_FORMATS:
+        raise HTTPException(status_code=400, detail=f"不支持的导入格式，可选: {', '.join(SUPPORTED_FORMATS)}")
+    if mode not in SUPPORTED_MODES:
+        raise HTTPException(status_code=400, detail=f"不支持的写入模式，可选: {', '.join(SUPPORTED_MODES)}")
+    
+    try:
+        return await hypergraph_service.import_elements_async(request.stream(), fmt, mode, batch_size)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# 路由：按规则组合表达式筛选要素（如 季节匹配 AND 高评分 AND NOT 经济型住宿），分页返回
+@router.post("/elements/query", response_model=Dict[str, Any])
+async def query_elements(query: RuleQuery):
+    try:
+        return await hypergraph_service.query_elements_async(query.expression, query.parameters, query.offset, query.limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# 路由：批量更新共享要素（只更新补丁中出现的属性）
+@router.patch("/elements", response_model=Dict[str, Any])
+async def update_shared_elements(batch_data: ElementBatchUpdate):
+    try:
+        return await hypergraph_service.update_elements_async([patch.dict() for patch in batch_data.patches])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 # 路由：更新共享要素
 @router.put("/elements/{element_id}", response_model=Dict[str, Any])
 async def update_shared_element(element_id: str, element_data: ElementUpdate):
-    result = await hypergraph_service.update_element_async(element_id, element_data.attributes)
+    try:
+        result = await hypergraph_service.update_element_async(element_id, element_data.attributes)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     if not result:
         raise HTTPException(status_code=404, detail=f"要素 {element_id} 不存在")
     return result
@@ -127,6 +186,74 @@ async def delete_shared_rule(rule_id: str):
         raise HTTPException(status_code=404, detail=f"规则 {rule_id} 不存在")
     return {"message": f"规则 {rule_id} 已删除"}
 
+# 路由：规则性能报告，列出总耗时最高和异常最多的规则
+@router.get("/rule-profiles", response_model=Dict[str, Any])
+async def get_rule_profiles(limit: int = Query(10, ge=1, le=100)):
+    return rule_profiler.report(limit)
+
+# 路由：获取单个规则的性能统计
+@router.get("/rule-profiles/{rule_id}", response_model=Dict[str, Any])
+async def get_rule_profile(rule_id: str):
+    result = rule_profiler.get(rule_id)
+    if not result:
+        raise HTTPException(status_code=404, detail=f"规则 {rule_id} 暂无性能统计")
+    return result
+
+# 路由：清空规则性能统计
+@router.delete("/rule-profiles", response_model=Dict[str, str])
+async def reset_rule_profiles():
+    rule_profiler.reset()
+    return {"message": "规则性能统计已清空"}
+
+# 超图分析：要素层-规则层-方案层的连通性、邻域、最短超路径和影响分析
+def _check_layer(layer: str) -> None:
+    if layer not in LAYERS:
+        raise HTTPException(status_code=400, detail=f"不支持的层 {layer}，可选: {', '.join(LAYERS)}")
+
+# 路由：s-连通分量（共享至少 s 个要素的规则、共享至少 s 条规则的方案）
+@router.get("/analytics/components", response_model=Dict[str, Any])
+async def get_components(s: int = Query(1, ge=1), element_limit: int = Query(100, ge=0, le=10000)):
+    return await hypergraph_service.get_components_async(s, element_limit)
+
+# 路由：规则或方案两两之间共享的要素数（ids 为逗号分隔的节点ID，不指定时比较该层全部节点）
+@router.get("/analytics/overlaps", response_model=Dict[str, Any])
+async def get_overlaps(layer: str = Query(LAYER_RULE), ids: Optional[str] = None):
+    if layer not in (LAYER_RULE, LAYER_SCHEME):
+        raise HTTPException(status_code=400, detail=f"只支持 {LAYER_RULE} 和 {LAYER_SCHEME} 层")
+    node_ids = [node_id for node_id in ids.split(",") if node_id] if ids else None
+    result = await hypergraph_service.get_overlaps_async(layer, node_ids)
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"{layer} 不存在: {ids}")
+    return result
+
+# 路由：节点跨层的 k 跳邻域
+@router.get("/analytics/neighborhood", response_model=Dict[str, Any])
+async def get_neighborhood(layer: str, id: str, k: int = Query(1, ge=1, le=10), limit: int = Query(100, ge=0, le=10000)):
+    _check_layer(layer)
+    result = await hypergraph_service.get_neighborhood_async(layer, id, k, limit)
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"{layer} {id} 不存在")
+    return result
+
+# 路由：两个节点之间的最短超路径
+@router.get("/analytics/path", response_model=Dict[str, Any])
+async def get_hyperpath(source_layer: str, source_id: str, target_layer: str, target_id: str):
+    _check_layer(source_layer)
+    _check_layer(target_layer)
+    result = await hypergraph_service.get_hyperpath_async(source_layer, source_id, target_layer, target_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail="起点或终点不存在")
+    return result
+
+# 路由：影响分析，如某个要素变化时受影响的方案
+@router.get("/analytics/impact", response_model=Dict[str, Any])
+async def get_impact(layer: str, id: str, limit: int = Query(100, ge=0, le=10000)):
+    _check_layer(layer)
+    result = await hypergraph_service.get_impact_async(layer, id, limit)
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"{layer} {id} 不存在")
+    return result
+
 # 路由：获取规则到要素的超边
 # 注意：这个路由应该放在超图特定路由之前，与其他共享资源路由一起
 @router.get("/rule-element-hyperedges", response_model=List[Dict[str, Any]])
@@ -149,27 +276,38 @@ async def get_all_schemes():
 # 路由：获取特定方案
 @router.get("/schemes/{scheme_id}", response_model=Dict[str, Any])
 async def get_scheme(scheme_id: str):
-    """获取特定方案"""
-    scheme_data = await hypergraph_service.get_scheme_by_id_async(scheme_id)
-    print("++++++++++++++++",scheme_data)
-    scheme = Scheme(scheme_data['name'], scheme_data['description'], scheme_data['rule_weights'])
-
-    scheme_detail = await hypergraph_service.generate_scheme_details(
-        scheme
-    )
-    return scheme_detail
+    """获取特定方案，优先返回未过期的结果快照"""
+    snapshot = await hypergraph_service.get_scheme_snapshot_async(scheme_id)
+    if not snapshot:
+        raise HTTPException(status_code=404, detail=f"方案 {scheme_id} 不存在")
+    with span("response.serialize"):
+        # 序列化结果随快照缓存在内存中，快照未过期时不再重复序列化
+        body = snapshot.get("body")
+        if body is None:
+            body = snapshot["body"] = JSONResponse(jsonable_encoder(snapshot["result"])).body
+        return Response(body, media_type="application/json")
 
 # 路由：创建新方案
 @router.post("/schemes", response_model=Dict[str, Any])
 async def create_scheme(scheme_data: SchemeCreate):
     """创建新方案"""
-    scheme = await hypergraph_service.generate_scheme_details(
+    scheme = await hypergraph_service.create_scheme_standalone(
         scheme_data.name,
         scheme_data.description,
         scheme_data.rule_weights
     )
     return scheme
 
+# 路由：按给定的规则权重预览方案评估结果，不保存方案
+# 规则得分列已缓存时只做加权求和，适合拖动权重滑块时实时刷新
+# 只返回得分最高的 top 个要素，selected_count 为得分大于0的要素总数
+@router.post("/schemes/preview", response_model=Dict[str, Any])
+async def preview_scheme(scheme_data: SchemeCreate, top: int = Query(100, ge=1, le=10000)):
+    scheme = Scheme(scheme_data.name, scheme_data.description, scheme_data.rule_weights)
+    result = await hypergraph_service.evaluate_scheme_weights(scheme, top=top)
+    with span("response.serialize"):
+        return JSONResponse(jsonable_encoder(result))
+
 # 路由：更新方案
 @router.put("/schemes/{scheme_id}", response_model=Dict[str, Any])
 async def update_scheme(scheme_id: str, scheme_data: SchemeUpdate):
@@ -188,6 +326,71 @@ async def delete_scheme(scheme_id: str):
         raise HTTPException(status_code=404, detail=f"方案 {scheme_id} 不存在")
     return {"message": f"方案 {scheme_id} 已删除"}
 
+# 后台任务：耗时的评估在任务队列中执行，客户端轮询任务状态并在完成后获取结果
+async def _scheme_details_job(params: Dict[str, Any], progress) -> Dict[str, Any]:
+    scheme_data = await hypergraph_service.get_scheme_by_id_async(params.get("scheme_id", ""))
+    if not scheme_data:
+        raise ValueError(f"方案 {params.get('scheme_id')} 不存在")
+    return await hypergraph_service.generate_scheme_details(hypergraph_service.scheme_from_data(scheme_data), progress)
+
+async def _scheme_evaluation_job(params: Dict[str, Any], progress) -> Dict[str, Any]:
+    result = await hypergraph_service.evaluate_scheme_standalone(params.get("scheme_id", ""), progress)
+    if "error" in result:
+        raise ValueError(result["error"])
+    return result
+
+async def _rule_element_hyperedges_job(params: Dict[str, Any], progress) -> List[Dict[str, Any]]:
+    return await hypergraph_service.calculate_rule_element_hyperedges(progress)
+
+job_manager.register("scheme_details", _scheme_details_job)
+job_manager.register("scheme_evaluation", _scheme_evaluation_job)
+job_manager.register("rule_element_hyperedges", _rule_element_hyperedges_job)
+
+# 路由：提交后台任务
+@router.post("/jobs", response_model=Dict[str, Any], status_code=202)
+async def submit_job(job_data: JobCreate):
+    try:
+        job = await job_manager.submit(job_data.type, job_data.params)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except JobQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return job.to_dict()
+
+# 路由：获取所有后台任务
+@router.get("/jobs", response_model=List[Dict[str, Any]])
+async def get_all_jobs():
+    return job_manager.list()
+
+# 路由：获取后台任务状态与进度
+@router.get("/jobs/{job_id}", response_model=Dict[str, Any])
+async def get_job(job_id: str):
+    record = await job_manager.get_record(job_id)
+    if not record:
+        raise HTTPException(status_code=404, detail=f"任务 {job_id} 不存在或已过期")
+    return record
+
+# 路由：获取后台任务结果
+@router.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str):
+    job = job_manager.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"任务 {job_id} 不存在或结果已过期")
+    if job.status != STATUS_SUCCEEDED:
+        raise HTTPException(status_code=409, detail=f"任务 {job_id} 当前状态为 {job.status}，没有结果")
+    with span("response.serialize"):
+        return JSONResponse(jsonable_encoder(job.result))
+
+# 路由：取消或删除后台任务
+@router.delete("/jobs/{job_id}", response_model=Dict[str, str])
+async def cancel_job(job_id: str):
+    job = job_manager.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"任务 {job_id} 不存在")
+    finished = job.finished
+    await job_manager.cancel(job_id)
+    return {"message": f"任务 {job_id} 已{'删除' if finished else '取消'}"}
+
 # 路由：评估方案
 # 超图特定的路由
 # 这些路由应该在共享要素和规则路由之后定义
@@ -195,7 +398,7 @@ async def delete_scheme(scheme_id: str):
 # 路由：获取所有超图
 @router.get("/", response_model=List[Dict[str, Any]])
 async def get_all_hypergraphs():
-    hypergraphs = hypergraph_service.get_all_hypergraphs()
+    hypergraphs = await hypergraph_service.get_all_hypergraphs_async()
     return hypergraphs
 
 # 路由：创建新超图
@@ -204,13 +407,17 @@ async def create_hypergraph(hypergraph_data: HypergraphCreate):
     if not hypergraph_data.name:
         raise HTTPException(status_code=400, detail="超图名称不能为空")
     
-    hypergraph = hypergraph_service.create_hypergraph(hypergraph_data.name, hypergraph_data.description)
-    return hypergraph.to_dict()
+    try:
+        hypergraph = await hypergraph_service.create_hypergraph_async(hypergraph_data)
+    except HypergraphExists as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    # 层ID在创建时生成，随结果返回以便之后读取和修改层
+    return {**hypergraph.to_dict(), "layers": jsonable_encoder(hypergraph_service.layer_summaries(hypergraph))}
 
 # 路由：获取特定超图
 @router.get("/{hypergraph_id}", response_model=Dict[str, Any])
 async def get_hypergraph(hypergraph_id: str):
-    hypergraph = hypergraph_service.get_hypergraph(hypergraph_id)
+    hypergraph = await hypergraph_service.get_hypergraph_async(hypergraph_id)
     if not hypergraph:
         raise HTTPException(status_code=404, detail=f"超图 {hypergraph_id} 不存在")
     
@@ -219,16 +426,103 @@ async def get_hypergraph(hypergraph_id: str):
 # 路由：删除特定超图
 @router.delete("/{hypergraph_id}", response_model=Dict[str, str])
 async def delete_hypergraph(hypergraph_id: str):
-    success = hypergraph_service.delete_hypergraph(hypergraph_id)
+    success = await hypergraph_service.delete_hypergraph_async(hypergraph_id)
     if not success:
         raise HTTPException(status_code=404, detail=f"超图 {hypergraph_id} 不存在")
     
     return {"message": f"超图 {hypergraph_id} 已删除"}
 
+# 路由：列出超图的层（ID、名称、版本及对象数）
+@router.get("/{hypergraph_id}/layers", response_model=List[Dict[str, Any]])
+async def get_layers(hypergraph_id: str):
+    layers = await hypergraph_service.get_hypergraph_layers_async(hypergraph_id)
+    if layers is None:
+        raise HTTPException(status_code=404, detail=f"超图 {hypergraph_id} 不存在")
+    
+    return jsonable_encoder(layers)
+
+# 路由：添加层
+@router.post("/{hypergraph_id}/layers", response_model=Dict[str, Any], status_code=201)
+async def add_layer(hypergraph_id: str, layer_data: LayerCreate):
+    try:
+        hypergraph = await hypergraph_service.add_layer_to_hypergraph_async(hypergraph_id, layer_data)
+    except HypergraphVersionConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if not hypergraph:
+        raise HTTPException(status_code=404, detail=f"超图 {hypergraph_id} 不存在")
+    
+    return jsonable_encoder(hypergraph.layers[-1])
+
+# 路由：获取层
+@router.get("/{hypergraph_id}/layers/{layer_id}", response_model=Dict[str, Any])
+async def get_layer(hypergraph_id: str, layer_id: str):
+    layer = await hypergraph_service.get_hypergraph_layer_async(hypergraph_id, layer_id)
+    if not layer:
+        raise HTTPException(status_code=404, detail=f"超图 {hypergraph_id} 的层 {layer_id} 不存在")
+    
+    return jsonable_encoder(layer)
+
+# 路由：更新层，只重建变化部分的邻接索引
+@router.put("/{hypergraph_id}/layers/{layer_id}", response_model=Dict[str, Any])
+async def update_layer(hypergraph_id: str, layer_id: str, layer_data: LayerUpdate):
+    try:
+        hypergraph = await hypergraph_service.update_hypergraph_layer_async(hypergraph_id, layer_id, layer_data)
+    except HypergraphVersionConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if not hypergraph:
+        raise HTTPException(status_code=404, detail=f"超图 {hypergraph_id} 的层 {layer_id} 不存在")
+    
+    return jsonable_encoder(hypergraph_service.get_hypergraph_layer(hypergraph_id, layer_id))
+
+# 路由：按补丁增量修改层（按ID添加、替换或删除节点、边和超边），返回层的新版本
+@router.patch("/{hypergraph_id}/layers/{layer_id}", response_model=Dict[str, Any])
+async def patch_layer(hypergraph_id: str, layer_id: str, patch: LayerPatch):
+    try:
+        result = await hypergraph_service.patch_hypergraph_layer_async(hypergraph_id, layer_id, patch)
+    except HypergraphVersionConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"超图 {hypergraph_id} 的层 {layer_id} 不存在")
+    
+    return result
+
+# 路由：删除层
+@router.delete("/{hypergraph_id}/layers/{layer_id}", response_model=Dict[str, str])
+async def delete_layer(hypergraph_id: str, layer_id: str):
+    try:
+        hypergraph = await hypergraph_service.delete_hypergraph_layer_async(hypergraph_id, layer_id)
+    except HypergraphVersionConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if not hypergraph:
+        raise HTTPException(status_code=404, detail=f"超图 {hypergraph_id} 的层 {layer_id} 不存在")
+    
+    return {"message": f"层 {layer_id} 已删除"}
+
+# 路由：层的度数统计
+@router.get("/{hypergraph_id}/layers/{layer_id}/stats", response_model=Dict[str, Any])
+async def get_layer_stats(hypergraph_id: str, layer_id: str):
+    graph = await hypergraph_service.get_layer_graph_async(hypergraph_id, layer_id)
+    if graph is None:
+        raise HTTPException(status_code=404, detail=f"超图 {hypergraph_id} 的层 {layer_id} 不存在")
+    
+    return graph.stats()
+
+# 路由：节点的邻域（关联的超边和边、相邻节点）
+@router.get("/{hypergraph_id}/layers/{layer_id}/nodes/{node_id}/neighbors", response_model=Dict[str, Any])
+async def get_layer_node_neighbors(hypergraph_id: str, layer_id: str, node_id: str):
+    graph = await hypergraph_service.get_layer_graph_async(hypergraph_id, layer_id)
+    if graph is None:
+        raise HTTPException(status_code=404, detail=f"超图 {hypergraph_id} 的层 {layer_id} 不存在")
+    if node_id not in graph.nodes and node_id not in graph.node_hyperedges \
+            and node_id not in graph.node_out_edges and node_id not in graph.node_in_edges:
+        raise HTTPException(status_code=404, detail=f"节点 {node_id} 不存在")
+    
+    return graph.neighborhood(node_id)
+
 # 路由：获取超图的所有要素
 @router.get("/{hypergraph_id}/elements", response_model=Dict[str, List[Dict[str, Any]]])
 async def get_all_elements(hypergraph_id: str):
-    hypergraph = hypergraph_service.get_hypergraph(hypergraph_id)
+    hypergraph = await hypergraph_service.get_hypergraph_async(hypergraph_id)
     if not hypergraph:
         raise HTTPException(status_code=404, detail=f"超图 {hypergraph_id} 不存在")
     
@@ -238,7 +532,7 @@ async def get_all_elements(hypergraph_id: str):
 # 路由：获取超图的特定类型要素
 @router.get("/{hypergraph_id}/elements/{element_type}", response_model=List[Dict[str, Any]])
 async def get_elements_by_type(hypergraph_id: str, element_type: str):
-    hypergraph = hypergraph_service.get_hypergraph(hypergraph_id)
+    hypergraph = await hypergraph_service.get_hypergraph_async(hypergraph_id)
     if not hypergraph:
         raise HTTPException(status_code=404, detail=f"超图 {hypergraph_id} 不存在")
     
@@ -248,7 +542,7 @@ async def get_elements_by_type(hypergraph_id: str, element_type: str):
 # 路由：获取超图的所有规则
 @router.get("/{hypergraph_id}/rules", response_model=List[Dict[str, Any]])
 async def get_all_rules(hypergraph_id: str):
-    hypergraph = hypergraph_service.get_hypergraph(hypergraph_id)
+    hypergraph = await hypergraph_service.get_hypergraph_async(hypergraph_id)
     if not hypergraph:
         raise HTTPException(status_code=404, detail=f"超图 {hypergraph_id} 不存在")
     
@@ -0,0 +1,20 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from typing import Dict, Any
+from services import mongo_monitor
+from services.metrics import render_prometheus
+
+# 创建路由器
+router = APIRouter()
+
+# 路由：Prometheus 抓取入口
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """以 Prometheus 文本格式输出所有指标"""
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+# 路由：MongoDB 命令耗时与连接池状态
+@router.get("/metrics/mongo", response_model=Dict[str, Any])
+async def get_mongo_metrics():
+    """按集合和命令汇总的 MongoDB 耗时分布，以及连接池等待时间和连接使用情况"""
+    return mongo_monitor.snapshot()
@@ -0,0 +1,26 @@
+from typing import List, Iterable
+
+def popcount(bits: int) -> int:
+    """位集中置位的个数"""
+    return bin(bits).count("1")
+
+def bit_indices(bits: int) -> List[int]:
+    """位集中置位的下标，按升序；借助二进制字符串查找，避免对大整数逐位移位"""
+    text = bin(bits)[:1:-1]
+    indices = []
+    index = text.find("1")
+    while index != -1:
+        indices.append(index)
+        index = text.find("1", index + 1)
+    return indices
+
+def bits_from_indices(indices: Iterable[int], size: int) -> int:
+    """由下标构造位集"""
+    bitmap = bytearray((size + 7) // 8)
+    for index in indices:
+        bitmap[index >> 3] |= 1 << (index & 7)
+    return int.from_bytes(bitmap, "little")
+
+def lowest_bit(bits: int) -> int:
+    """最低置位的下标，位集为空时返回 -1"""
+    return (bits & -bits).bit_length() - 1
@@ -1,6 +1,9 @@
 from typing import Dict, List, Any, Optional
 from datetime import datetime
 from database import get_database
+from pymongo import UpdateOne, ReturnDocument
+from pymongo.errors import BulkWriteError, DocumentTooLarge, DuplicateKeyError
+from services.rule_resolver import rule_resolver, normalize_rule_identifier
 import logging
 import uuid
 
@@ -30,6 +33,34 @@ class DatabaseService:
         
         return result
     
+    @staticmethod
+    async def get_elements_updated_since(since: Optional[datetime]) -> List[Dict[str, Any]]:
+        """获取 updated_at 不早于 since 的要素；since 为 None 时返回所有带 updated_at 的要素"""
+        db = get_database()
+        condition = {"$exists": True} if since is None else {"$gte": since}
+        cursor = db.elements.find({"updated_at": condition}, {"_id": 0})
+        return await cursor.to_list(length=None)
+    
+    @staticmethod
+    async def get_elements_by_ids(element_ids: List[str]) -> List[Dict[str, Any]]:
+        """按ID批量获取要素"""
+        db = get_database()
+        cursor = db.elements.find({"id": {"$in": element_ids}}, {"_id": 0})
+        return await cursor.to_list(length=None)
+    
+    @staticmethod
+    async def get_element_ids() -> List[str]:
+        """获取所有要素的ID（只返回 id 字段）"""
+        db = get_database()
+        cursor = db.elements.find({}, {"_id": 0, "id": 1})
+        return [element["id"] for element in await cursor.to_list(length=None)]
+    
+    @staticmethod
+    async def count_elements() -> int:
+        """要素总数"""
+        db = get_database()
+        return await db.elements.count_documents({})
+    
     @staticmethod
     async def get_elements_by_type(element_type: str) -> List[Dict[str, Any]]:
         """获取特定类型的所有要素"""
@@ -60,62 +91,172 @@ class DatabaseService:
         db = get_database()
         
         # 准备要素数据，避免递归嵌套
+        element = DatabaseService._prepare_element(element_data)
+        element["created_at"] = datetime.now()
+        element["updated_at"] = datetime.now()
+        
+        # 插入数据库
+        await db.elements.insert_one(element)
+        await DatabaseService.bump_version("elements")
+        
+        # 移除MongoDB的_id字段
+        element.pop("_id", None)
+        
+        return element
+    
+    @staticmethod
+    def _prepare_element(element_data: Dict[str, Any]) -> Dict[str, Any]:
+        """整理要素数据，确保 attributes 不包含递归嵌套"""
         element = {
             "id": element_data["id"],
             "type": element_data["type"],
-            "attributes": element_data.get("attributes", {}),
-            "created_at": datetime.now(),
-            "updated_at": datetime.now()
+            "attributes": element_data.get("attributes", {})
         }
         
-        # 确保 attributes 不包含递归嵌套
         if "attributes" in element_data and "attributes" in element_data["attributes"]:
             # 如果发现嵌套，则展平结构
             nested_attrs = element_data["attributes"]["attributes"]
             if isinstance(nested_attrs, dict):
                 element["attributes"] = nested_attrs
         
-        # 插入数据库
-        await db.elements.insert_one(element)
-        
-        # 移除MongoDB的_id字段
-        element.pop("_id", None)
-        
         return element
     
     @staticmethod
-    async def update_element(element_id: str, attributes: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-        """更新要素"""
+    async def bulk_write_elements(elements: List[Dict[str, Any]], mode: str = "upsert") -> Dict[str, Any]:
+        """批量写入要素
+        
+        mode 为 "upsert" 时按 id 覆盖已有要素（bulk_write + UpdateOne），
+        为 "insert" 时只插入新要素（insert_many），重复 id 记为错误。
+        两种模式均使用 ordered=False，单条失败不会中断整批写入。
+        返回的 errors 中 index 为该条要素在 elements 中的下标。
+        """
         db = get_database()
+        now = datetime.now()
+        documents = [DatabaseService._prepare_element(element) for element in elements]
+        
+        if mode == "insert":
+            for document in documents:
+                document["created_at"] = now
+                document["updated_at"] = now
+            try:
+                result = await db.elements.insert_many(documents, ordered=False)
+                summary = {"inserted": len(result.inserted_ids), "updated": 0, "errors": []}
+            except BulkWriteError as e:
+                summary = {
+                    "inserted": e.details.get("nInserted", 0),
+                    "updated": 0,
+                    "errors": DatabaseService._bulk_write_errors(e)
+                }
+            if summary["inserted"]:
+                await DatabaseService.bump_version("elements")
+            return summary
+        
+        operations = [
+            UpdateOne(
+                {"id": document["id"]},
+                {
+                    "$set": {
+                        "type": document["type"],
+                        "attributes": document["attributes"],
+                        "updated_at": now
+                    },
+                    "$setOnInsert": {"created_at": now}
+                },
+                upsert=True
+            )
+            for document in documents
+        ]
+        try:
+            result = await db.elements.bulk_write(operations, ordered=False)
+            summary = {"inserted": result.upserted_count, "updated": result.matched_count, "errors": []}
+        except BulkWriteError as e:
+            summary = {
+                "inserted": e.details.get("nUpserted", 0),
+                "updated": e.details.get("nMatched", 0),
+                "errors": DatabaseService._bulk_write_errors(e)
+            }
+        if summary["inserted"] or summary["updated"]:
+            await DatabaseService.bump_version("elements")
+        return summary
+    
+    @staticmethod
+    def _bulk_write_errors(error: BulkWriteError) -> List[Dict[str, Any]]:
+        """提取批量写入中每条失败记录的下标和错误信息"""
+        return [
+            {"index": write_error["index"], "error": write_error.get("errmsg", "写入失败")}
+            for write_error in error.details.get("writeErrors", [])
+        ]
+    
+    @staticmethod
+    def _attribute_updates(attributes: Dict[str, Any]) -> Dict[str, Any]:
+        """将属性补丁转换为 attributes.<key> 形式的 $set 字段"""
+        update_fields = {}
+        for key, value in attributes.items():
+            if not key or "." in key or key.startswith("$"):
+                raise ValueError(f"属性名 {key!r} 不合法：不能为空、包含 '.' 或以 '$' 开头")
+            update_fields[f"attributes.{key}"] = value
+        update_fields["updated_at"] = datetime.now()
+        return update_fields
+    
+    @staticmethod
+    async def update_element(element_id: str, attributes: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """更新要素
         
-        # 检查是否存在
-        existing = await db.elements.find_one({"id": element_id})
-        if not existing:
-            return None
+        只 $set 补丁中出现的属性路径，一次 find_one_and_update 完成读改写，
+        并发更新不同属性时不会互相覆盖。
+        """
+        db = get_database()
         
-        # 更新属性和时间戳
-        update_data = {
-            "$set": {
-                "attributes": {**existing["attributes"], **attributes},
-                "updated_at": datetime.now()
-            }
-        }
+        update_fields = DatabaseService._attribute_updates(attributes)
         
-        await db.elements.update_one({"id": element_id}, update_data)
+        element = await db.elements.find_one_and_update(
+            {"id": element_id},
+            {"$set": update_fields},
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER
+        )
+        if element:
+            await DatabaseService.bump_version("elements")
+        return element
+    
+    @staticmethod
+    async def update_elements(patches: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """批量更新要素，patches 为 {"id": ..., "attributes": {...}} 列表
         
-        # 获取更新后的要素
-        updated = await db.elements.find_one({"id": element_id})
-        updated.pop("_id", None)
+        所有补丁通过一次 bulk_write 提交，再用一次 $in 查询取回更新后的要素。
+        """
+        db = get_database()
         
-        return updated
+        operations = [
+            UpdateOne({"id": patch["id"]}, {"$set": DatabaseService._attribute_updates(patch["attributes"])})
+            for patch in patches
+        ]
+        if not operations:
+            return {"updated": [], "not_found": []}
+        
+        result = await db.elements.bulk_write(operations, ordered=False)
+        if result.matched_count:
+            await DatabaseService.bump_version("elements")
+        
+        element_ids = list(dict.fromkeys(patch["id"] for patch in patches))
+        cursor = db.elements.find({"id": {"$in": element_ids}}, {"_id": 0})
+        updated = await cursor.to_list(length=None)
+        
+        found_ids = {element["id"] for element in updated}
+        return {
+            "updated": updated,
+            "not_found": [element_id for element_id in element_ids if element_id not in found_ids]
+        }
     
     @staticmethod
-    async def delete_element(element_id: str) -> bool:
-        """删除要素"""
+    async def delete_element(element_id: str) -> Optional[Dict[str, Any]]:
+        """删除要素，返回被删除的要素；要素不存在时返回 None"""
         db = get_database()
         
-        result = await db.elements.delete_one({"id": element_id})
-        return result.deleted_count > 0
+        element = await db.elements.find_one_and_delete({"id": element_id}, {"_id": 0})
+        if element is not None:
+            await DatabaseService.bump_version("elements")
+        return element
     
     @staticmethod
     async def get_all_rules() -> List[Dict[str, Any]]:
@@ -128,39 +269,49 @@ class DatabaseService:
         for rule in rules:
             rule.pop("_id", None)
         
+        # 已拿到完整规则列表，顺便重建别名索引
+        rule_resolver.rebuild(rules)
+        
         return rules
     
     @staticmethod
     async def get_rule_by_id(rule_id: str) -> Optional[Dict[str, Any]]:
-        """根据ID获取规则"""
+        """根据ID、名称或规范化名称获取规则
+        
+        先通过别名索引解析出规则ID，按ID只查一次；索引未命中时用一次 $or 查询
+        覆盖三种查找方式，并把查到的规则登记到索引中。
+        """
         db = get_database()
         
-        # 尝试直接查找
-        rule = await db.rules.find_one({"id": rule_id})
+        canonical_id = rule_resolver.resolve(rule_id)
+        if canonical_id is not None:
+            rule = await db.rules.find_one({"id": canonical_id}, {"_id": 0})
+            if rule:
+                return rule
+            # 规则已被其他进程删除或改名，索引过期
+            rule_resolver.remove(canonical_id)
+        
+        converted_id = normalize_rule_identifier(rule_id)
+        cursor = db.rules.find(
+            {"$or": [{"id": rule_id}, {"name": rule_id}, {"id": converted_id}]},
+            {"_id": 0}
+        )
+        candidates = await cursor.to_list(length=None)
+        if not candidates:
+            return None
         
-        if not rule:
-            # 尝试查找名称匹配的规则
-            rule = await db.rules.find_one({"name": rule_id})
-            
-            if not rule:
-                # 尝试将规则名称转换为ID格式
-                converted_id = rule_id.lower().replace(" ", "_")
-                rule = await db.rules.find_one({"id": converted_id})
+        for candidate in candidates:
+            rule_resolver.index(candidate)
         
-        if rule:
-            rule.pop("_id", None)
-        
-        return rule
+        # 按索引的优先级选择：ID 精确匹配 > 名称匹配 > 规范化ID匹配
+        canonical_id = rule_resolver.resolve(rule_id)
+        return next((candidate for candidate in candidates if candidate["id"] == canonical_id), candidates[0])
     
     @staticmethod
     async def create_rule(rule_data: Dict[str, Any]) -> Dict[str, Any]:
         """创建新规则"""
-        rule_id = rule_data.get("id", rule_data["name"].lower().replace(" ", "_"))
-        
-        # 确保规则ID唯一
-        if rule_id in DatabaseService.rules:
-            # 如果ID已存在，生成一个新的唯一ID
-            rule_id = f"{rule_id}_{uuid.uuid4().hex[:8]}"
+        db = get_database()
+        rule_id = rule_data.get("id") or normalize_rule_identifier(rule_data["name"])
         
         # 创建规则记录
         rule = {
@@ -171,11 +322,22 @@ class DatabaseService:
             "affected_element_keys": rule_data.get("affected_element_keys", []),
             "description": rule_data.get("description", ""),
             "code": rule_data.get("code", ""),
-            "parameters": rule_data.get("parameters", {})  # 添加参数字段
+            "parameters": rule_data.get("parameters", {}),  # 添加参数字段
+            "created_at": datetime.now(),
+            "updated_at": datetime.now()
         }
         
-        # 存储规则
-        DatabaseService.rules[rule_id] = rule
+        # 存储规则，ID已存在时生成一个新的唯一ID
+        try:
+            await db.rules.insert_one(rule)
+        except DuplicateKeyError:
+            rule.pop("_id", None)
+            rule["id"] = f"{rule_id}_{uuid.uuid4().hex[:8]}"
+            await db.rules.insert_one(rule)
+        
+        rule.pop("_id", None)
+        rule_resolver.index(rule)
+        await DatabaseService.bump_version("rules")
         
         return rule
     
@@ -187,25 +349,32 @@ class DatabaseService:
             return None
         db = get_database()
         # 更新规则字段
-        for key, value in update_data.items():
-            rule[key] = value
-        # 存入db        
-        await db.rules.update_one({"id": rule_id}, {"$set": rule})
+        update_fields = {**update_data, "updated_at": datetime.now()}
+        rule.update(update_fields)
+        # 存入db
+        await db.rules.update_one({"id": rule["id"]}, {"$set": update_fields})
+        await DatabaseService.bump_version("rules")
+        # 名称可能变化，重新登记别名
+        rule_resolver.index(rule)
         return rule
     
     @staticmethod
-    async def delete_rule(rule_id: str) -> bool:
-        """删除规则"""
+    async def delete_rule(rule_id: str) -> Optional[Dict[str, Any]]:
+        """删除规则，rule_id 可以是规则ID、名称或别名；返回被删除的规则，不存在时返回 None"""
         db = get_database()
         
         # 获取规则
         rule = await DatabaseService.get_rule_by_id(rule_id)
         if not rule:
-            return False
+            return None
         
         # 删除规则
         result = await db.rules.delete_one({"id": rule["id"]})
-        return result.deleted_count > 0
+        rule_resolver.remove(rule["id"])
+        if not result.deleted_count:
+            return None
+        await DatabaseService.bump_version("rules")
+        return rule
     
     @staticmethod
     async def migrate_elements(elements: Dict[str, List[Dict[str, Any]]]) -> None:
@@ -235,6 +404,7 @@ class DatabaseService:
         
         if elements_to_insert:
             await db.elements.insert_many(elements_to_insert)
+            await DatabaseService.bump_version("elements")
             logger.info(f"已迁移 {len(elements_to_insert)} 个要素到数据库")
     
     @staticmethod
@@ -268,6 +438,7 @@ class DatabaseService:
         
         if rules_to_insert:
             await db.rules.insert_many(rules_to_insert)
+            await DatabaseService.bump_version("rules")
             logger.info(f"已迁移 {len(rules_to_insert)} 个规则到数据库")
     
     @staticmethod
@@ -305,6 +476,7 @@ class DatabaseService:
             "name": scheme_data["name"],
             "description": scheme_data.get("description", ""),
             "rule_weights": scheme_data.get("rule_weights", {}),  # 存储完整的规则配置
+            "version": 1,  # 每次更新加一，用于判断结果快照是否过期
             "created_at": datetime.now(),
             "updated_at": datetime.now()
         }
@@ -322,11 +494,6 @@ class DatabaseService:
         """更新方案"""
         db = get_database()
         
-        # 获取方案
-        scheme = await DatabaseService.get_scheme_by_id(scheme_id)
-        if not scheme:
-            return None
-        
         # 准备更新数据
         update_fields = {}
         if "name" in update_data:
@@ -339,14 +506,13 @@ class DatabaseService:
         # 添加更新时间
         update_fields["updated_at"] = datetime.now()
         
-        # 更新数据库
-        await db.schemes.update_one(
+        # 更新数据库并递增版本号，返回更新后的方案
+        return await db.schemes.find_one_and_update(
             {"id": scheme_id},
-            {"$set": update_fields}
+            {"$set": update_fields, "$inc": {"version": 1}},
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER
         )
-        
-        # 获取更新后的方案
-        return await DatabaseService.get_scheme_by_id(scheme_id)
     
     @staticmethod
     async def delete_scheme(scheme_id: str) -> bool:
@@ -358,6 +524,190 @@ class DatabaseService:
         if not scheme:
             return False
         
-        # 删除方案
+        # 删除方案及其结果快照
         result = await db.schemes.delete_one({"id": scheme_id})
-        return result.deleted_count > 0 
\ No newline at end of file
+        await db.scheme_snapshots.delete_one({"scheme_id": scheme_id})
+        return result.deleted_count > 0
+    
+    @staticmethod
+    async def bump_version(name: str) -> int:
+        """递增数据版本号（elements / rules），返回新版本号"""
+        db = get_database()
+        record = await db.versions.find_one_and_update(
+            {"id": name},
+            {"$inc": {"version": 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return record["version"]
+    
+    @staticmethod
+    async def get_data_versions() -> Dict[str, int]:
+        """获取要素和规则的当前版本号，从未写入过的为 0"""
+        db = get_database()
+        cursor = db.versions.find({"id": {"$in": ["elements", "rules"]}})
+        records = await cursor.to_list(length=None)
+        versions = {"elements": 0, "rules": 0}
+        for record in records:
+            versions[record["id"]] = record["version"]
+        return versions
+    
+    @staticmethod
+    async def get_scheme_snapshot(scheme_id: str) -> Optional[Dict[str, Any]]:
+        """获取方案的结果快照"""
+        db = get_database()
+        return await db.scheme_snapshots.find_one({"scheme_id": scheme_id}, {"_id": 0})
+    
+    @staticmethod
+    async def save_scheme_snapshot(snapshot: Dict[str, Any]) -> bool:
+        """保存方案的结果快照，结果超过文档大小上限时返回 False"""
+        db = get_database()
+        try:
+            await db.scheme_snapshots.replace_one({"scheme_id": snapshot["scheme_id"]}, snapshot, upsert=True)
+            return True
+        except DocumentTooLarge:
+            logger.warning(f"方案 {snapshot['scheme_id']} 的结果快照超过文档大小上限，只保存在内存中")
+            return False
+    
+    @staticmethod
+    async def get_hypergraph_summaries() -> List[Dict[str, Any]]:
+        """获取所有超图的概要，不读取方案和层的内容"""
+        db = get_database()
+        cursor = db.hypergraphs.find({}, {"_id": 0, "element_ids": 0, "rule_ids": 0, "schemes": 0, "layer_ids": 0})
+        return await cursor.to_list(length=None)
+    
+    @staticmethod
+    async def get_hypergraph_by_id(hypergraph_id: str) -> Optional[Dict[str, Any]]:
+        """根据ID获取超图文档（不含层）"""
+        db = get_database()
+        return await db.hypergraphs.find_one({"id": hypergraph_id}, {"_id": 0})
+    
+    @staticmethod
+    async def get_hypergraph_schemes() -> List[Dict[str, Any]]:
+        """获取所有超图的方案，只读取 id 和 schemes 字段"""
+        db = get_database()
+        cursor = db.hypergraphs.find({}, {"_id": 0, "id": 1, "schemes": 1})
+        return await cursor.to_list(length=None)
+    
+    @staticmethod
+    def _version_filter(base_version: int) -> Any:
+        # 版本字段出现之前保存的文档视为版本 1
+        return {"$in": [base_version, None]} if base_version == 1 else base_version
+    
+    @staticmethod
+    async def insert_hypergraph(hypergraph_data: Dict[str, Any]) -> bool:
+        """新建超图文档（不含层），同ID的超图已存在时不写入并返回 False"""
+        db = get_database()
+        try:
+            await db.hypergraphs.insert_one(hypergraph_data)
+        except DuplicateKeyError:
+            return False
+        hypergraph_data.pop("_id", None)
+        return True
+    
+    @staticmethod
+    async def save_hypergraph(hypergraph_data: Dict[str, Any], base_version: int) -> bool:
+        """重写已有的超图文档（不含层），只在文档版本仍为 base_version 时写入，返回是否已写入"""
+        db = get_database()
+        result = await db.hypergraphs.replace_one(
+            {"id": hypergraph_data["id"], "version": DatabaseService._version_filter(base_version)}, hypergraph_data
+        )
+        return result.matched_count > 0
+    
+    @staticmethod
+    async def delete_hypergraph(hypergraph_id: str) -> bool:
+        """删除超图及其所有层"""
+        db = get_database()
+        result = await db.hypergraphs.delete_one({"id": hypergraph_id})
+        await db.hypergraph_layers.delete_many({"hypergraph_id": hypergraph_id})
+        return result.deleted_count > 0
+    
+    @staticmethod
+    async def update_hypergraph(hypergraph_id: str, update_fields: Dict[str, Any]) -> None:
+        """更新超图文档的部分字段"""
+        db = get_database()
+        await db.hypergraphs.update_one({"id": hypergraph_id}, {"$set": update_fields})
+    
+    # 层文档中的节点、边和超边按 ID -> 对象 保存，补丁只需 $set / $unset 涉及的对象；
+    # 字段名不能包含 '.' 或以 '$' 开头，ID 中的这些字符需要转义
+    LAYER_ITEM_FIELDS = ("nodes", "edges", "hyperedges")
+    
+    @staticmethod
+    def _layer_item_key(item_id: str) -> str:
+        key = item_id.replace("%", "%25").replace(".", "%2E")
+        return "%24" + key[1:] if key.startswith("$") else key
+    
+    @staticmethod
+    async def get_hypergraph_layers(hypergraph_id: str) -> List[Dict[str, Any]]:
+        """获取超图的所有层，节点、边和超边按保存顺序还原为列表
+
+        按 ID 保存之前的层文档中这些字段为列表，读取时改写为按 ID 保存，之后才能按补丁更新。
+        """
+        db = get_database()
+        cursor = db.hypergraph_layers.find({"hypergraph_id": hypergraph_id}, {"_id": 0})
+        layers = await cursor.to_list(length=None)
+        for layer in layers:
+            legacy = False
+            for field in DatabaseService.LAYER_ITEM_FIELDS:
+                items = layer.get(field) or {}
+                if isinstance(items, list):
+                    legacy = True
+                    layer[field] = items
+                else:
+                    layer[field] = list(items.values())
+            if legacy:
+                # 只在层未被其他进程改写时迁移，否则其他进程已按新格式保存
+                layer_data = {key: value for key, value in layer.items() if key != "hypergraph_id"}
+                await DatabaseService.save_hypergraph_layer(hypergraph_id, layer_data, layer.get("version", 1))
+        return layers
+    
+    @staticmethod
+    async def save_hypergraph_layer(hypergraph_id: str, layer_data: Dict[str, Any], base_version: Optional[int] = None) -> bool:
+        """保存超图的一个层，每个层单独一个文档，修改一个层不需要重写整个超图；
+        base_version 为空时不存在则创建，否则只在层版本仍为 base_version 时写入，返回是否已写入"""
+        db = get_database()
+        document = {"hypergraph_id": hypergraph_id, **layer_data}
+        for field in DatabaseService.LAYER_ITEM_FIELDS:
+            document[field] = {DatabaseService._layer_item_key(item["id"]): item for item in layer_data.get(field, [])}
+        if base_version is None:
+            await db.hypergraph_layers.replace_one(
+                {"hypergraph_id": hypergraph_id, "id": layer_data["id"]}, document, upsert=True
+            )
+            return True
+        result = await db.hypergraph_layers.replace_one(
+            {"hypergraph_id": hypergraph_id, "id": layer_data["id"], "version": DatabaseService._version_filter(base_version)},
+            document
+        )
+        return result.matched_count > 0
+    
+    @staticmethod
+    async def patch_hypergraph_layer(hypergraph_id: str, layer_id: str, base_version: int,
+                                     upserts: Dict[str, List[Dict[str, Any]]], removals: Dict[str, List[str]],
+                                     update_fields: Dict[str, Any]) -> bool:
+        """按补丁更新层文档：upserts / removals 按 nodes / edges / hyperedges 给出对象或ID，
+        写入量只与补丁大小有关；同一对象既删除又写入时以写入为准。
+        只在文档版本仍为 base_version 时写入，否则返回 False"""
+        db = get_database()
+        set_fields = dict(update_fields)
+        unset_fields = {}
+        for field in DatabaseService.LAYER_ITEM_FIELDS:
+            for item_id in removals.get(field, []):
+                unset_fields[f"{field}.{DatabaseService._layer_item_key(item_id)}"] = ""
+            for item in upserts.get(field, []):
+                path = f"{field}.{DatabaseService._layer_item_key(item['id'])}"
+                unset_fields.pop(path, None)
+                set_fields[path] = item
+        update = {"$set": set_fields}
+        if unset_fields:
+            update["$unset"] = unset_fields
+        result = await db.hypergraph_layers.update_one(
+            {"hypergraph_id": hypergraph_id, "id": layer_id, "version": DatabaseService._version_filter(base_version)}, update
+        )
+        return result.matched_count > 0
+    
+    @staticmethod
+    async def delete_hypergraph_layer(hypergraph_id: str, layer_id: str) -> bool:
+        """删除超图的一个层"""
+        db = get_database()
+        result = await db.hypergraph_layers.delete_one({"hypergraph_id": hypergraph_id, "id": layer_id})
+        return result.deleted_count > 0
@@ -0,0 +1,244 @@
+from typing import AsyncIterator, Dict, Any, List, Optional, Tuple
+from services.db_service import DatabaseService
+import asyncio
+import codecs
+import csv
+import json
+import logging
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 支持的导入格式
+SUPPORTED_FORMATS = ("ndjson", "csv")
+
+# 支持的写入模式
+SUPPORTED_MODES = ("upsert", "insert")
+
+# Content-Type 到导入格式的映射
+CONTENT_TYPE_FORMATS = {
+    "application/x-ndjson": "ndjson",
+    "application/ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+    "application/json-lines": "ndjson",
+    "text/csv": "csv",
+    "application/csv": "csv",
+}
+
+def detect_format(content_type: Optional[str]) -> Optional[str]:
+    """根据 Content-Type 推断导入格式"""
+    if not content_type:
+        return None
+    media_type = content_type.split(";")[0].strip().lower()
+    return CONTENT_TYPE_FORMATS.get(media_type)
+
+async def iter_line_batches(chunks: AsyncIterator[bytes]) -> AsyncIterator[List[str]]:
+    """将字节流切分为文本行，每个数据块产出一批完整的行
+
+    按块产出而不是逐行产出，避免在大文件上为每一行付出一次异步迭代的开销。
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in chunks:
+        text = pending + decoder.decode(chunk)
+        lines = text.split("\n")
+        pending = lines.pop()
+        if lines:
+            yield lines
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield [pending]
+
+def _parse_cell(value: str) -> Any:
+    """解析CSV单元格：能按JSON解析的（数字、布尔、列表等）转换为对应类型，否则保留字符串"""
+    try:
+        return json.loads(value)
+    except ValueError:
+        return value
+
+class ElementImporter:
+    """要素批量导入器
+
+    逐行解析并校验 NDJSON/CSV 数据，将合法行按 batch_size 分批写入数据库。
+    写入一批的同时继续解析下一批，数据库往返与解析重叠进行。
+    """
+    def __init__(self, fmt: str, mode: str = "upsert", batch_size: int = 1000, max_errors: int = 1000):
+        self.format = fmt
+        self.mode = mode
+        self.batch_size = batch_size
+        self.max_errors = max_errors
+
+        # 导入统计
+        self.received = 0
+        self.inserted = 0
+        self.updated = 0
+        self.failed = 0
+        self.errors: List[Dict[str, Any]] = []
+
+        # 当前批次：(行号, 要素数据)
+        self._batch: List[Tuple[int, Dict[str, Any]]] = []
+        self._pending_write: Optional[asyncio.Task] = None
+
+        # CSV 解析状态
+        self._header: Optional[List[str]] = None
+        self._record_lines: List[str] = []
+        self._record_start = 0
+
+    def _add_error(self, line: int, error: str) -> None:
+        """记录单行错误"""
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"line": line, "error": error})
+
+    def _validate(self, line: int, row: Any) -> Optional[Dict[str, Any]]:
+        """校验单行数据，返回规范化后的要素数据；不合法时记录错误并返回 None"""
+        if not isinstance(row, dict):
+            self._add_error(line, "每一行必须是一个对象")
+            return None
+
+        element_id = row.get("id")
+        element_type = row.get("type")
+        if not isinstance(element_id, str) or not element_id:
+            self._add_error(line, "缺少有效的 id")
+            return None
+        if not isinstance(element_type, str) or not element_type:
+            self._add_error(line, "缺少有效的 type")
+            return None
+
+        # 同时支持 {"id", "type", "attributes": {...}} 和扁平结构
+        if "attributes" in row:
+            attributes = row["attributes"]
+            if not isinstance(attributes, dict):
+                self._add_error(line, "attributes 必须是对象")
+                return None
+        else:
+            attributes = {k: v for k, v in row.items() if k not in ("id", "type")}
+
+        return {"id": element_id, "type": element_type, "attributes": attributes}
+
+    def _parse_ndjson_line(self, line_no: int, line: str) -> Optional[Any]:
+        """解析一行 NDJSON"""
+        try:
+            return json.loads(line)
+        except ValueError as e:
+            self._add_error(line_no, f"JSON 解析失败: {e}")
+            return None
+
+    def _parse_csv_record(self, line_no: int, record: str) -> Optional[Any]:
+        """解析一条 CSV 记录，第一条记录作为表头"""
+        try:
+            values = next(csv.reader([record]))
+        except (csv.Error, StopIteration) as e:
+            self._add_error(line_no, f"CSV 解析失败: {e}")
+            return None
+
+        if self._header is None:
+            self._header = [name.strip() for name in values]
+            if "id" not in self._header or "type" not in self._header:
+                raise ValueError("CSV 表头必须包含 id 和 type 列")
+            return None
+
+        if len(values) != len(self._header):
+            self._add_error(line_no, f"列数不匹配: 期望 {len(self._header)} 列，实际 {len(values)} 列")
+            return None
+
+        row = {}
+        attributes = {}
+        for name, value in zip(self._header, values):
+            if name in ("id", "type"):
+                row[name] = value
+            elif value != "":
+                attributes[name] = _parse_cell(value)
+        row["attributes"] = attributes
+        return row
+
+    def _iter_rows(self, lines: List[str], first_line: int):
+        """解析一批文本行，产出 (行号, 原始行数据)"""
+        for offset, line in enumerate(lines):
+            line_no = first_line + offset
+            line = line.rstrip("\r")
+
+            if self.format == "ndjson":
+                if not line.strip():
+                    continue
+                row = self._parse_ndjson_line(line_no, line)
+                if row is not None:
+                    yield line_no, row
+                continue
+
+            # CSV 字段中可能包含换行，引号未闭合时继续拼接下一行
+            if not self._record_lines:
+                if not line.strip():
+                    continue
+                self._record_start = line_no
+            self._record_lines.append(line)
+            record = "\n".join(self._record_lines)
+            if record.count('"') % 2:
+                continue
+            self._record_lines = []
+            row = self._parse_csv_record(self._record_start, record)
+            if row is not None:
+                yield self._record_start, row
+
+    async def _write_batch(self, batch: List[Tuple[int, Dict[str, Any]]]) -> None:
+        """写入一批要素并汇总结果"""
+        result = await DatabaseService.bulk_write_elements([element for _, element in batch], self.mode)
+        self.inserted += result["inserted"]
+        self.updated += result["updated"]
+        for error in result["errors"]:
+            self._add_error(batch[error["index"]][0], error["error"])
+
+    async def _flush(self) -> None:
+        """提交当前批次；上一批写入完成后才会发起新的写入"""
+        if self._pending_write is not None:
+            await self._pending_write
+            self._pending_write = None
+        if self._batch:
+            batch, self._batch = self._batch, []
+            self._pending_write = asyncio.ensure_future(self._write_batch(batch))
+
+    async def _drain(self) -> None:
+        """提交最后一批并等待所有写入完成"""
+        await self._flush()
+        if self._pending_write is not None:
+            await self._pending_write
+            self._pending_write = None
+
+    async def run(self, chunks: AsyncIterator[bytes]) -> Dict[str, Any]:
+        """执行导入，返回导入报告"""
+        line_no = 1
+        try:
+            async for lines in iter_line_batches(chunks):
+                for row_line, row in self._iter_rows(lines, line_no):
+                    self.received += 1
+                    element = self._validate(row_line, row)
+                    if element is None:
+                        continue
+                    self._batch.append((row_line, element))
+                    if len(self._batch) >= self.batch_size:
+                        await self._flush()
+                line_no += len(lines)
+
+            if self._record_lines:
+                self.received += 1
+                self._add_error(self._record_start, "CSV 记录未结束：引号未闭合")
+
+            await self._drain()
+        finally:
+            if self._pending_write is not None and not self._pending_write.done():
+                self._pending_write.cancel()
+
+        logger.info(
+            f"要素导入完成: 接收 {self.received} 行，新增 {self.inserted}，更新 {self.updated}，失败 {self.failed}"
+        )
+
+        return {
+            "format": self.format,
+            "mode": self.mode,
+            "received": self.received,
+            "inserted": self.inserted,
+            "updated": self.updated,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors)
+        }
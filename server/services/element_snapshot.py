@@ -0,0 +1,418 @@
+from typing import Dict, Any, List, Optional, Tuple
+from array import array
+from datetime import datetime, timedelta
+from services.element_store import ElementStore
+import json
+import logging
+import marshal
+import mmap
+import os
+import pickle
+import struct
+import sys
+import tempfile
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 快照文件路径，为空时不读写快照
+SNAPSHOT_PATH = os.getenv("HYPERGRAPH_SNAPSHOT_PATH", "")
+# 要素版本比上次写入的快照前进这么多次后重写快照
+SNAPSHOT_REWRITE_VERSIONS = int(os.getenv("HYPERGRAPH_SNAPSHOT_REWRITE_VERSIONS", "100"))
+# 增量同步时把 updated_at 水位回退的秒数，容忍各进程之间的时钟偏差和写入延迟
+SNAPSHOT_CATCHUP_MARGIN = float(os.getenv("HYPERGRAPH_SNAPSHOT_CATCHUP_MARGIN", "5"))
+
+MAGIC = b"HGSNAP01"
+FORMAT_VERSION = 2
+
+# 每行一个标记字节：缺失、普通值、以 float64 保存的整数、None
+_FLAG_MISSING = 0
+_FLAG_VALUE = 1
+_FLAG_INT = 2
+_FLAG_NONE = 3
+
+_EPOCH = datetime(1970, 1, 1)
+_MAX_EXACT_FLOAT_INT = 2 ** 53
+_ABSENT = object()
+
+class SnapshotError(Exception):
+    """快照文件无效或与当前程序不兼容"""
+    pass
+
+def _to_micros(value: datetime) -> int:
+    delta = value - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+
+def _from_micros(micros: int) -> datetime:
+    return _EPOCH + timedelta(microseconds=micros)
+
+class _SectionWriter:
+    """顺序拼接数据段，每段按8字节对齐，返回 [偏移, 长度]"""
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.size = 0
+
+    def add(self, data: bytes) -> List[int]:
+        offset = self.size
+        self.chunks.append(data)
+        self.size += len(data)
+        padding = -self.size % 8
+        if padding:
+            self.chunks.append(b"\0" * padding)
+            self.size += padding
+        return [offset, len(data)]
+
+def _encode_fixed(storage: str, values: List[Any], flags: bytearray) -> bytes:
+    """定长列：int64 / float64 / datetime 为 8 字节，bool 为 1 字节；值与存储类型不符时抛出 TypeError"""
+    data = bytearray(len(values)) if storage == "bool" else array("d" if storage == "float64" else "q")
+    for index, value in enumerate(values):
+        if value is _ABSENT:
+            flag, value = _FLAG_MISSING, 0
+        elif value is None:
+            flag, value = _FLAG_NONE, 0
+        elif storage == "int64":
+            if type(value) is not int:
+                raise TypeError(value)
+            flag = _FLAG_VALUE
+        elif storage == "float64":
+            if type(value) is int and abs(value) <= _MAX_EXACT_FLOAT_INT:
+                flag = _FLAG_INT
+            elif type(value) is float:
+                flag = _FLAG_VALUE
+            else:
+                raise TypeError(value)
+        elif storage == "datetime":
+            if not isinstance(value, datetime) or value.tzinfo is not None:
+                raise TypeError(value)
+            flag, value = _FLAG_VALUE, _to_micros(value)
+        else:
+            if type(value) is not bool:
+                raise TypeError(value)
+            flag = _FLAG_VALUE
+        flags[index] = flag
+        if storage == "bool":
+            data[index] = value
+        else:
+            data.append(value)
+    return bytes(data) if storage == "bool" else data.tobytes()
+
+def _encode_text(values: List[Any], flags: bytearray, encode) -> Tuple[bytes, bytes]:
+    """变长文本列：拼接后的 UTF-8 文本和按字节计的偏移，可以只解码其中一行"""
+    blobs = []
+    offsets = array("q", [0])
+    length = 0
+    for index, value in enumerate(values):
+        if value is _ABSENT:
+            flags[index] = _FLAG_MISSING
+        elif value is None:
+            flags[index] = _FLAG_NONE
+        else:
+            blob = encode(value).encode("utf-8")
+            blobs.append(blob)
+            length += len(blob)
+            flags[index] = _FLAG_VALUE
+        offsets.append(length)
+    return b"".join(blobs), offsets.tobytes()
+
+def _encode_str(value: Any) -> str:
+    if type(value) is not str:
+        raise TypeError(value)
+    return value
+
+def _encode_str_lists(values: List[Any], flags: bytearray) -> Tuple[bytes, bytes, bytes]:
+    """字符串列表列：所有列表项拼接为一个文本列，另存每行的列表项范围"""
+    items = []
+    rows = array("q", [0])
+    for index, value in enumerate(values):
+        if value is _ABSENT:
+            flags[index] = _FLAG_MISSING
+        elif value is None:
+            flags[index] = _FLAG_NONE
+        elif type(value) is list:
+            items.extend(value)
+            flags[index] = _FLAG_VALUE
+        else:
+            raise TypeError(value)
+        rows.append(len(items))
+    text, offsets = _encode_text(items, bytearray(len(items)), _encode_str)
+    return text, offsets, rows.tobytes()
+
+def _encode_objects(values: List[Any], flags: bytearray) -> Tuple[bytes, bytes]:
+    """其他类型逐行 pickle，偏移按字节计"""
+    blobs = []
+    offsets = array("q", [0])
+    length = 0
+    for index, value in enumerate(values):
+        if value is _ABSENT:
+            flags[index] = _FLAG_MISSING
+        else:
+            blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+            blobs.append(blob)
+            length += len(blob)
+            flags[index] = _FLAG_VALUE
+        offsets.append(length)
+    return b"".join(blobs), offsets.tobytes()
+
+def _encode_column(writer: _SectionWriter, name: str, storage: str, values: List[Any]) -> Dict[str, Any]:
+    """按推断的存储类型编码一列；实际取值与存储类型不符时退回 object"""
+    flags = bytearray(len(values))
+    column: Dict[str, Any] = {"name": name, "storage": storage}
+    try:
+        if storage in ("int64", "float64", "datetime", "bool"):
+            column["data"] = writer.add(_encode_fixed(storage, values, flags))
+        elif storage == "str":
+            text, offsets = _encode_text(values, flags, _encode_str)
+            column["data"] = writer.add(text)
+            column["offsets"] = writer.add(offsets)
+        elif storage == "list[str]":
+            text, offsets, rows = _encode_str_lists(values, flags)
+            column["data"] = writer.add(text)
+            column["offsets"] = writer.add(offsets)
+            column["rows"] = writer.add(rows)
+        else:
+            raise TypeError(storage)
+    except (TypeError, OverflowError):
+        column["storage"] = "object"
+        data, offsets = _encode_objects(values, flags)
+        column["data"] = writer.add(data)
+        column["offsets"] = writer.add(offsets)
+    column["flags"] = writer.add(bytes(flags))
+    return column
+
+# 列中出现的值类型 -> 存储类型，与 AttributeSchema.storage 的选择一致；用于没有推断结构的列（如顶层字段）
+_STORAGE_BY_TYPES = {
+    frozenset([int]): "int64",
+    frozenset([float]): "float64",
+    frozenset([int, float]): "float64",
+    frozenset([bool]): "bool",
+    frozenset([str]): "str",
+    frozenset([list]): "list[str]",
+    frozenset([datetime]): "datetime",
+}
+
+def _column_storage(values: List[Any]) -> str:
+    """按列中出现的值类型选择存储类型（忽略缺失和 None）"""
+    types = {type(value) for value in values}
+    types.discard(type(None))
+    types.discard(object)
+    return _STORAGE_BY_TYPES.get(frozenset(types), "object")
+
+def _encode_rows(writer: _SectionWriter, rows: List[Dict[str, Any]], skip: Tuple[str, ...] = (),
+                 storages: Dict[str, str] = None) -> List[Dict[str, Any]]:
+    """把一组字典按键拆成列，键的顺序为首次出现的顺序；storages 中没有的列按取值选择存储类型"""
+    keys: Dict[str, Any] = {}
+    for row in rows:
+        keys.update(row)
+    columns = []
+    for name in keys:
+        if name in skip:
+            continue
+        values = [row.get(name, _ABSENT) for row in rows]
+        storage = (storages or {}).get(name) or _column_storage(values)
+        columns.append(_encode_column(writer, name, storage, values))
+    return columns
+
+def _encode_type(writer: _SectionWriter, element_type: str, elements: List[Dict[str, Any]],
+                 storages: Dict[str, str] = None) -> Dict[str, Any]:
+    """编码一类要素：ID列、顶层字段列（created_at 等）和属性列；storages 为推断的属性存储类型"""
+    return {
+        "type": element_type,
+        "count": len(elements),
+        "ids": _encode_column(writer, "id", "str", [element["id"] for element in elements]),
+        "fields": _encode_rows(writer, elements, skip=("id", "type", "attributes")),
+        "attributes": _encode_rows(writer, [element.get("attributes") or {} for element in elements], storages=storages)
+    }
+
+def encode_snapshot(store: ElementStore, rules_version: int, rules: List[Dict[str, Any]],
+                    compiled_rules: Dict[str, Any] = None,
+                    storages: Dict[str, Dict[str, str]] = None) -> List[bytes]:
+    """把要素和规则编码为快照，返回依次拼接即为完整快照的数据块
+
+    compiled_rules 为 规则代码 -> 编译后的代码对象，以 marshal 格式保存，只在相同的 Python 版本下复用。
+    storages 为 要素类型 -> 属性名 -> 存储类型，来自推断的要素结构（SchemaRegistry.storages），
+    为空时按各列的取值选择。
+    """
+    storages = storages or {}
+    writer = _SectionWriter()
+    types = [_encode_type(writer, element_type, elements, storages.get(element_type))
+             for element_type, elements in store.by_type().items()]
+    compiled = {code: marshal.dumps(code_object) for code, code_object in (compiled_rules or {}).items()}
+    rules_section = writer.add(pickle.dumps({"rules": rules, "compiled": compiled}, protocol=pickle.HIGHEST_PROTOCOL))
+
+    header = json.dumps({
+        "format": FORMAT_VERSION,
+        "python": sys.implementation.cache_tag,
+        "created_at": datetime.now().isoformat(),
+        "elements_version": store.version,
+        "rules_version": rules_version,
+        "watermark": _to_micros(store.watermark) if store.watermark else None,
+        "element_count": len(store),
+        "types": types,
+        "rules": rules_section
+    }, ensure_ascii=False).encode("utf-8")
+    prefix = MAGIC + struct.pack("<Q", len(header)) + header
+    prefix += b"\0" * (-len(prefix) % 8)
+    return [prefix] + writer.chunks
+
+def write_snapshot(path: str, store: ElementStore, rules_version: int, rules: List[Dict[str, Any]],
+                   compiled_rules: Dict[str, Any] = None, storages: Dict[str, Dict[str, str]] = None) -> int:
+    """把快照写入文件，先写临时文件再原子替换，返回文件字节数"""
+    chunks = encode_snapshot(store, rules_version, rules, compiled_rules, storages)
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(prefix=".snapshot-", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    return sum(len(chunk) for chunk in chunks)
+
+class ElementSnapshot:
+    """快照数据，来自以只读内存映射方式打开的文件或其他只读缓冲区（如共享内存），各数据段在解码时才读取"""
+    def __init__(self, path: str = None, buffer: Any = None):
+        self.path = path
+        self._file = None
+        self._mmap = None
+        try:
+            if buffer is None:
+                self._file = open(path, "rb")
+                self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+                buffer = self._mmap
+            self._buffer = buffer
+            if bytes(buffer[:len(MAGIC)]) != MAGIC:
+                raise SnapshotError(f"{path or '缓冲区'} 不是要素快照")
+            (header_length,) = struct.unpack("<Q", bytes(buffer[len(MAGIC):len(MAGIC) + 8]))
+            header_end = len(MAGIC) + 8 + header_length
+            self.header = json.loads(bytes(buffer[len(MAGIC) + 8:header_end]).decode("utf-8"))
+            if self.header.get("format") != FORMAT_VERSION:
+                raise SnapshotError(f"不支持的快照格式 {self.header.get('format')}")
+            self._data_start = header_end + (-header_end % 8)
+        except (ValueError, struct.error) as e:
+            self.close()
+            raise SnapshotError(f"快照 {path or '缓冲区'} 已损坏: {e}")
+        except BaseException:
+            self.close()
+            raise
+
+    @property
+    def elements_version(self) -> int:
+        return self.header["elements_version"]
+
+    @property
+    def rules_version(self) -> int:
+        return self.header["rules_version"]
+
+    @property
+    def element_count(self) -> int:
+        return self.header["element_count"]
+
+    @property
+    def watermark(self) -> Optional[datetime]:
+        watermark = self.header.get("watermark")
+        return _from_micros(watermark) if watermark is not None else None
+
+    def _read(self, section: List[int]) -> bytes:
+        start = self._data_start + section[0]
+        return bytes(self._buffer[start:start + section[1]])
+
+    def view(self, section: List[int]) -> memoryview:
+        """数据段的只读视图，不复制数据"""
+        start = self._data_start + section[0]
+        return memoryview(self._buffer).toreadonly()[start:start + section[1]]
+
+    def _offsets(self, column: Dict[str, Any], key: str = "offsets") -> array:
+        offsets = array("q")
+        offsets.frombytes(self._read(column[key]))
+        return offsets
+
+    def _decode_column(self, column: Dict[str, Any], count: int) -> Tuple[List[Any], bytes]:
+        """返回 (各行的值, 各行的标记)"""
+        storage = column["storage"]
+        flags = self._read(column["flags"])
+        if storage == "bool":
+            values = [bool(value) for value in self._read(column["data"])]
+        elif storage in ("int64", "float64", "datetime"):
+            data = array("d" if storage == "float64" else "q")
+            data.frombytes(self._read(column["data"]))
+            values = data.tolist()
+            if storage == "datetime":
+                # 批量写入的要素时间戳大多相同，每个不同的值只转换一次
+                converted = {value: _from_micros(value) for value in set(values)}
+                values = [converted[value] for value in values]
+        elif storage == "str":
+            data = self._read(column["data"])
+            offsets = self._offsets(column)
+            values = [data[offsets[index]:offsets[index + 1]].decode("utf-8") for index in range(count)]
+        elif storage == "list[str]":
+            data = self._read(column["data"])
+            offsets = self._offsets(column)
+            items = [data[offsets[index]:offsets[index + 1]].decode("utf-8") for index in range(len(offsets) - 1)]
+            rows = self._offsets(column, "rows")
+            values = [items[rows[index]:rows[index + 1]] for index in range(count)]
+        else:
+            data = self._read(column["data"])
+            offsets = self._offsets(column)
+            values = [
+                pickle.loads(data[offsets[index]:offsets[index + 1]]) if flags[index] else None
+                for index in range(count)
+            ]
+
+        if flags.count(_FLAG_VALUE) != count:
+            for index, flag in enumerate(flags):
+                if flag == _FLAG_NONE:
+                    values[index] = None
+                elif flag == _FLAG_INT:
+                    values[index] = int(values[index])
+        return values, flags
+
+    def _decode_rows(self, columns: List[Dict[str, Any]], count: int) -> List[Dict[str, Any]]:
+        """把列还原为每行一个字典；所有行都有值的列直接 zip，其余逐行补充"""
+        dense_names, dense_values, sparse = [], [], []
+        for column in columns:
+            values, flags = self._decode_column(column, count)
+            if flags.count(_FLAG_MISSING):
+                sparse.append((column["name"], values, flags))
+            else:
+                dense_names.append(column["name"])
+                dense_values.append(values)
+        rows = [dict(zip(dense_names, row)) for row in zip(*dense_values)] if dense_values else [{} for _ in range(count)]
+        for name, values, flags in sparse:
+            for index, flag in enumerate(flags):
+                if flag:
+                    rows[index][name] = values[index]
+        return rows
+
+    def load_store(self) -> ElementStore:
+        """解码全部要素，要素顺序与写入时一致"""
+        elements_by_type = {}
+        for type_header in self.header["types"]:
+            element_type = type_header["type"]
+            count = type_header["count"]
+            ids, _ = self._decode_column(type_header["ids"], count)
+            fields = self._decode_rows(type_header["fields"], count)
+            attributes = self._decode_rows(type_header["attributes"], count)
+            elements_by_type[element_type] = [
+                {"id": element_id, "type": element_type, "attributes": element_attributes, **element_fields}
+                for element_id, element_attributes, element_fields in zip(ids, attributes, fields)
+            ]
+        return ElementStore(self.elements_version, elements_by_type, self.watermark)
+
+    def load_rules(self) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """返回 (规则列表, 规则代码 -> 代码对象)；Python 版本不同时不返回编译结果"""
+        payload = pickle.loads(self._read(self.header["rules"]))
+        compiled = {}
+        if self.header.get("python") == sys.implementation.cache_tag:
+            compiled = {code: marshal.loads(data) for code, data in payload["compiled"].items()}
+        return payload["rules"], compiled
+
+    def close(self) -> None:
+        if self._mmap is not None:
+            self._mmap.close()
+        if self._file is not None:
+            self._file.close()
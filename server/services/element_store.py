@@ -0,0 +1,66 @@
+from typing import Dict, Any, List, Optional, Iterable
+from datetime import datetime
+
+class ElementStore:
+    """评估使用的全部要素（只读），按类型连续存放
+
+    要素更新时不修改已有实例，而是由 apply_delta 生成新实例，正在进行的评估继续使用旧列表。
+    """
+    __slots__ = ("version", "elements", "positions", "type_ranges", "watermark")
+
+    def __init__(self, version: int, elements_by_type: Dict[str, List[Dict[str, Any]]],
+                 watermark: Optional[datetime] = None):
+        self.version = version
+        self.elements: List[Dict[str, Any]] = []
+        self.type_ranges: Dict[str, tuple] = {}  # 要素类型 -> (起始下标, 结束下标)
+        for element_type, element_list in elements_by_type.items():
+            if not element_list:
+                continue
+            self.type_ranges[element_type] = (len(self.elements), len(self.elements) + len(element_list))
+            self.elements.extend(element_list)
+        self.positions = {element["id"]: index for index, element in enumerate(self.elements)}
+        # 已包含的最新 updated_at，增量同步从这里开始
+        self.watermark = watermark if watermark is not None else self._max_updated_at(self.elements)
+
+    def __len__(self) -> int:
+        return len(self.elements)
+
+    @staticmethod
+    def _max_updated_at(elements: Iterable[Dict[str, Any]], start: Optional[datetime] = None) -> Optional[datetime]:
+        watermark = start
+        for element in elements:
+            updated_at = element.get("updated_at")
+            if isinstance(updated_at, datetime) and (watermark is None or updated_at > watermark):
+                watermark = updated_at
+        return watermark
+
+    def by_type(self) -> Dict[str, List[Dict[str, Any]]]:
+        """按类型分组的要素列表"""
+        return {element_type: self.elements[start:end] for element_type, (start, end) in self.type_ranges.items()}
+
+    def apply_delta(self, version: int, changed: List[Dict[str, Any]], deleted_ids: Iterable[str] = ()) -> "ElementStore":
+        """合并新增或修改的要素并移除已删除的要素，返回新实例
+
+        修改后类型不变的要素保持原有位置，新要素追加到所属类型的末尾。
+        """
+        changed_by_id = {element["id"]: element for element in changed}
+        removed = set(deleted_ids)
+        elements_by_type: Dict[str, List[Dict[str, Any]]] = {}
+        for element_type, (start, end) in self.type_ranges.items():
+            element_list = elements_by_type[element_type] = []
+            for element in self.elements[start:end]:
+                element_id = element["id"]
+                if element_id in removed:
+                    continue
+                replacement = changed_by_id.get(element_id)
+                if replacement is None:
+                    element_list.append(element)
+                elif replacement["type"] == element_type:
+                    element_list.append(replacement)
+        for element in changed_by_id.values():
+            position = self.positions.get(element["id"])
+            if element["id"] in removed:
+                continue
+            if position is None or self.elements[position]["type"] != element["type"]:
+                elements_by_type.setdefault(element["type"], []).append(element)
+        return ElementStore(version, elements_by_type, self._max_updated_at(changed, self.watermark))
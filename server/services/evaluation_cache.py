@@ -0,0 +1,123 @@
+from typing import Dict, Any, List, Optional, Tuple, Mapping
+from collections import OrderedDict
+from services.instrumentation import record_cache_lookup
+from services.bitset import bits_from_indices
+import hashlib
+import json
+import os
+import threading
+
+# 最多缓存的规则得分列数
+EVAL_CACHE_COLUMNS = int(os.getenv("HYPERGRAPH_EVAL_CACHE_COLUMNS", "256"))
+
+def canonical_parameters(defaults: Dict[str, Any], overrides: Dict[str, Any] = None) -> str:
+    """合并规则默认参数和方案中的参数，生成与键顺序无关的字符串
+
+    与 Rule.apply 的合并方式一致，因此覆盖值等于默认值时与不覆盖共用同一列。
+    """
+    params = dict(defaults or {})
+    if overrides:
+        params.update(overrides)
+    return json.dumps(params, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+
+def rule_code_version(rule_data: Dict[str, Any]) -> str:
+    """规则代码版本：由代码和影响的要素类型决定，修改名称、描述或默认参数不会改变
+
+    默认参数已经包含在 canonical_parameters 的结果中，不需要计入代码版本。
+    """
+    source = json.dumps(
+        [rule_data.get("code", ""), sorted(rule_data.get("affected_element_types") or [])],
+        ensure_ascii=False, separators=(",", ":")
+    )
+    return hashlib.sha1(source.encode("utf-8")).hexdigest()[:16]
+
+class RuleColumn:
+    """规则在一组参数下对全部要素的未加权得分，只保存得分大于0的要素
+
+    匹配的要素集合同时可以表示为评估要素列表下标上的位集（Python 整数），
+    规则之间、方案之间的交、并、差和计数都按机器字并行计算。
+    """
+    __slots__ = ("element_ids", "scores", "elements_version", "_bits", "_bits_positions")
+
+    def __init__(self, element_ids: List[str], scores: List[float], elements_version: int):
+        self.element_ids = element_ids
+        self.scores = scores
+        self.elements_version = elements_version
+        self._bits = 0
+        self._bits_positions = None
+
+    def __len__(self) -> int:
+        return len(self.element_ids)
+
+    def bits(self, element_positions: Mapping[str, int], size: int) -> int:
+        """匹配要素的下标位集；按给定的 要素ID -> 下标 映射计算一次后缓存，映射换成新对象时重新计算"""
+        if self._bits_positions is not element_positions:
+            positions = (element_positions.get(element_id) for element_id in self.element_ids)
+            self._bits = bits_from_indices((position for position in positions if position is not None), size)
+            self._bits_positions = element_positions
+        return self._bits
+
+class EvaluationCache:
+    """按 (规则ID, 规则代码版本, 参数) 缓存规则得分列，最近最少使用的列先被淘汰
+
+    方案得分对权重是线性的：加权得分 = 规则得分 × 权重。只改权重时直接用缓存的列做一次加权求和，
+    不需要重新对要素应用规则；只改某个规则的参数时也只需重新计算这一列。
+    列同时记录计算时的要素版本，版本变化后视为未命中；其他规则的修改不影响该列。
+    """
+    def __init__(self, max_columns: int = EVAL_CACHE_COLUMNS):
+        self.max_columns = max_columns
+        self._columns: "OrderedDict[Tuple[str, str, str], RuleColumn]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, rule_id: str, code_version: str, parameters_key: str, elements_version: int) -> Optional[RuleColumn]:
+        """获取要素版本一致的列"""
+        key = (rule_id, code_version, parameters_key)
+        with self._lock:
+            column = self._columns.get(key)
+            hit = column is not None and column.elements_version == elements_version
+            if hit:
+                self._columns.move_to_end(key)
+            elif column is not None:
+                del self._columns[key]
+        record_cache_lookup("rule_columns", hit)
+        return column if hit else None
+
+    def peek(self, rule_id: str, code_version: str, parameters_key: str, elements_version: int) -> Optional[RuleColumn]:
+        """查看要素版本一致的列是否已缓存，不计入命中率也不调整淘汰顺序"""
+        with self._lock:
+            column = self._columns.get((rule_id, code_version, parameters_key))
+        return column if column is not None and column.elements_version == elements_version else None
+
+    def put(self, rule_id: str, code_version: str, parameters_key: str, elements_version: int,
+            element_ids: List[str], scores: List[float]) -> RuleColumn:
+        """保存列并返回；同一规则旧代码版本的列不会再被命中，一并移除"""
+        column = RuleColumn(element_ids, scores, elements_version)
+        key = (rule_id, code_version, parameters_key)
+        with self._lock:
+            for stale in [stale for stale in self._columns if stale[0] == rule_id and stale[1] != code_version]:
+                del self._columns[stale]
+            self._columns[key] = column
+            self._columns.move_to_end(key)
+            while len(self._columns) > self.max_columns:
+                self._columns.popitem(last=False)
+        return column
+
+    def invalidate(self, rule_id: str = None) -> None:
+        """移除某个规则的所有列；不指定规则时清空"""
+        with self._lock:
+            if rule_id is None:
+                self._columns.clear()
+                return
+            for key in [key for key in self._columns if key[0] == rule_id]:
+                del self._columns[key]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "columns": len(self._columns),
+                "max_columns": self.max_columns,
+                "matched_elements": sum(len(column) for column in self._columns.values())
+            }
+
+# 全局规则得分列缓存
+evaluation_cache = EvaluationCache()
@@ -0,0 +1,115 @@
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from services.metrics import registry
+import asyncio
+import contextvars
+import logging
+import os
+import time
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 评估执行方式：
+#   thread      在有界线程池中执行，事件循环在解释器切换线程时可以继续处理其他请求（默认）
+#   cooperative 在事件循环中分块执行，每 EVAL_YIELD_EVERY 个要素让出一次事件循环
+#   inline      直接在事件循环中执行（原有行为）
+# 规则函数由 exec 动态生成，无法序列化到子进程，因此不提供进程池方式。
+EVAL_MODE = os.getenv("HYPERGRAPH_EVAL_MODE", "thread")
+EVAL_WORKERS = int(os.getenv("HYPERGRAPH_EVAL_WORKERS", "4"))
+EVAL_CONCURRENCY = int(os.getenv("HYPERGRAPH_EVAL_CONCURRENCY", str(EVAL_WORKERS)))
+EVAL_YIELD_EVERY = int(os.getenv("HYPERGRAPH_EVAL_YIELD_EVERY", "2000"))
+
+SUPPORTED_MODES = ("thread", "cooperative", "inline")
+
+EVALUATIONS_IN_PROGRESS = registry.gauge(
+    "hypergraph_evaluations_in_progress",
+    "正在执行的评估任务数"
+)
+EVALUATION_QUEUE_WAIT = registry.histogram(
+    "hypergraph_evaluation_queue_wait_seconds",
+    "评估任务等待并发名额的时间"
+)
+
+class EvaluationExecutor:
+    """执行CPU密集的评估任务，避免长时间阻塞事件循环
+
+    同时执行的任务数由信号量限制，超出的任务在事件循环中等待，不占用线程。
+    """
+    def __init__(self, mode: str = EVAL_MODE, workers: int = EVAL_WORKERS,
+                 max_concurrency: int = EVAL_CONCURRENCY, yield_every: int = EVAL_YIELD_EVERY):
+        if mode not in SUPPORTED_MODES:
+            logger.warning(f"未知的评估执行方式 {mode}，使用 thread")
+            mode = "thread"
+        self.mode = mode
+        self.workers = max(1, workers)
+        self.max_concurrency = max(1, max_concurrency)
+        self.yield_every = max(1, yield_every)
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="evaluation")
+        return self._pool
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def _acquire(self) -> asyncio.Semaphore:
+        semaphore = self._get_semaphore()
+        started = time.perf_counter()
+        await semaphore.acquire()
+        EVALUATION_QUEUE_WAIT.observe(time.perf_counter() - started)
+        EVALUATIONS_IN_PROGRESS.inc()
+        return semaphore
+
+    def _release(self, semaphore: asyncio.Semaphore) -> None:
+        EVALUATIONS_IN_PROGRESS.dec()
+        semaphore.release()
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """执行一个同步函数；thread 方式下在线程池中执行并保留当前上下文（追踪、请求统计）"""
+        semaphore = await self._acquire()
+        try:
+            if self.mode == "thread":
+                context = contextvars.copy_context()
+                return await asyncio.get_running_loop().run_in_executor(self._get_pool(), context.run, func, *args)
+            return func(*args)
+        finally:
+            self._release(semaphore)
+
+    async def scan(self, func: Callable[..., List[Any]], items: Sequence[Any], *args: Any) -> Tuple[List[Any], float]:
+        """对一组要素执行 func(要素切片, *args)，拼接返回的列表
+
+        返回 (结果, 计算耗时秒数)；cooperative 方式下耗时不包含让出事件循环的时间。
+        """
+        if self.mode != "cooperative":
+            def timed():
+                started = time.perf_counter()
+                return func(items, *args), time.perf_counter() - started
+            return await self.run(timed)
+
+        semaphore = await self._acquire()
+        try:
+            results: List[Any] = []
+            seconds = 0.0
+            for start in range(0, len(items), self.yield_every):
+                started = time.perf_counter()
+                results.extend(func(items[start:start + self.yield_every], *args))
+                seconds += time.perf_counter() - started
+                await asyncio.sleep(0)
+            return results, seconds
+        finally:
+            self._release(semaphore)
+
+    def shutdown(self) -> None:
+        """关闭线程池"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+# 全局评估执行器
+evaluation_executor = EvaluationExecutor()
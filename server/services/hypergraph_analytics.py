@@ -0,0 +1,309 @@
+from typing import Dict, Any, List, Optional, Tuple
+from services.bitset import popcount, bit_indices, lowest_bit
+
+# 三层结构中的层
+LAYER_ELEMENT = "element"
+LAYER_RULE = "rule"
+LAYER_SCHEME = "scheme"
+LAYERS = (LAYER_ELEMENT, LAYER_RULE, LAYER_SCHEME)
+
+class UnionFind:
+    """按秩合并、路径压缩的并查集"""
+    def __init__(self, size: int):
+        self.parent = list(range(size))
+        self.rank = [0] * size
+
+    def find(self, item: int) -> int:
+        root = item
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[item] != root:
+            self.parent[item], item = root, self.parent[item]
+        return root
+
+    def union(self, a: int, b: int) -> None:
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            return
+        if self.rank[a] < self.rank[b]:
+            a, b = b, a
+        self.parent[b] = a
+        if self.rank[a] == self.rank[b]:
+            self.rank[a] += 1
+
+    def groups(self) -> List[List[int]]:
+        groups: Dict[int, List[int]] = {}
+        for item in range(len(self.parent)):
+            groups.setdefault(self.find(item), []).append(item)
+        return list(groups.values())
+
+class IncidenceGraph:
+    """要素层-规则层-方案层的关联表示
+
+    要素按评估要素列表中的下标编号，规则是要素上的超边（rule_elements[i] 为位集），
+    方案是规则上的超边（scheme_rules[j] 为规则下标的位集），rule_schemes 为反向索引。
+    位集使用 Python 整数，交、并、计数都在 C 层按机器字完成。
+    """
+    def __init__(self, element_ids: List[str], element_types: List[str],
+                 rules: List[Dict[str, Any]], rule_elements: List[int],
+                 schemes: List[Dict[str, Any]]):
+        self.element_ids = element_ids
+        self.element_types = element_types
+        self.element_positions = {element_id: index for index, element_id in enumerate(element_ids)}
+        self.rule_ids = [rule["id"] for rule in rules]
+        self.rule_names = [rule.get("name", "") for rule in rules]
+        self.rule_types = [frozenset(rule.get("affected_element_types") or ()) for rule in rules]
+        self.rule_positions = {rule_id: index for index, rule_id in enumerate(self.rule_ids)}
+        self.rule_elements = rule_elements
+        self.scheme_ids = [scheme["id"] for scheme in schemes]
+        self.scheme_names = [scheme.get("name", "") for scheme in schemes]
+        self.scheme_positions = {scheme_id: index for index, scheme_id in enumerate(self.scheme_ids)}
+        self.scheme_rules = []
+        self.rule_schemes = [0] * len(self.rule_ids)
+        for scheme_index, scheme in enumerate(schemes):
+            rule_bits = 0
+            for rule_id in scheme.get("rule_weights") or {}:
+                rule_index = self.rule_positions.get(rule_id)
+                if rule_index is not None:
+                    rule_bits |= 1 << rule_index
+                    self.rule_schemes[rule_index] |= 1 << scheme_index
+            self.scheme_rules.append(rule_bits)
+
+    def position(self, layer: str, node_id: str) -> Optional[int]:
+        positions = {
+            LAYER_ELEMENT: self.element_positions,
+            LAYER_RULE: self.rule_positions,
+            LAYER_SCHEME: self.scheme_positions
+        }[layer]
+        return positions.get(node_id)
+
+    def _ids(self, layer: str, bits: int, limit: Optional[int] = None) -> List[str]:
+        ids = {LAYER_ELEMENT: self.element_ids, LAYER_RULE: self.rule_ids, LAYER_SCHEME: self.scheme_ids}[layer]
+        indices = bit_indices(bits)
+        if limit is not None:
+            indices = indices[:limit]
+        return [ids[index] for index in indices]
+
+    def _layer_summary(self, layer: str, bits: int, limit: Optional[int]) -> Dict[str, Any]:
+        return {"count": popcount(bits), "ids": self._ids(layer, bits, limit)}
+
+    # s-连通分量
+
+    def s_components(self, s: int = 1, element_limit: Optional[int] = 100) -> Dict[str, Any]:
+        """规则和方案的 s-连通分量
+
+        两条规则共享至少 s 个要素时 s-相邻，两个方案共享至少 s 条规则时 s-相邻；
+        相邻关系的传递闭包用并查集合并。要素的分量由 1-连通的规则分量覆盖的要素给出。
+        """
+        rule_count = len(self.rule_ids)
+        rule_sets = UnionFind(rule_count)
+        for i in range(rule_count):
+            bits = self.rule_elements[i]
+            if popcount(bits) < s:
+                continue
+            for j in range(i + 1, rule_count):
+                if rule_sets.find(i) != rule_sets.find(j) and popcount(bits & self.rule_elements[j]) >= s:
+                    rule_sets.union(i, j)
+
+        scheme_count = len(self.scheme_ids)
+        scheme_sets = UnionFind(scheme_count)
+        for i in range(scheme_count):
+            for j in range(i + 1, scheme_count):
+                if scheme_sets.find(i) != scheme_sets.find(j) and popcount(self.scheme_rules[i] & self.scheme_rules[j]) >= s:
+                    scheme_sets.union(i, j)
+
+        rule_components = []
+        covered = 0
+        for group in rule_sets.groups():
+            elements = schemes = 0
+            for rule_index in group:
+                elements |= self.rule_elements[rule_index]
+                schemes |= self.rule_schemes[rule_index]
+            covered |= elements
+            rule_components.append({
+                "rules": [self.rule_ids[index] for index in group],
+                "elements": self._layer_summary(LAYER_ELEMENT, elements, element_limit),
+                "schemes": self._ids(LAYER_SCHEME, schemes)
+            })
+        rule_components.sort(key=lambda component: (-len(component["rules"]), -component["elements"]["count"]))
+
+        scheme_components = []
+        for group in scheme_sets.groups():
+            rules = 0
+            for scheme_index in group:
+                rules |= self.scheme_rules[scheme_index]
+            scheme_components.append({
+                "schemes": [self.scheme_ids[index] for index in group],
+                "rules": self._ids(LAYER_RULE, rules)
+            })
+        scheme_components.sort(key=lambda component: -len(component["schemes"]))
+
+        return {
+            "s": s,
+            "elements": len(self.element_ids),
+            "rules": rule_count,
+            "schemes": scheme_count,
+            "rule_components": rule_components,
+            "scheme_components": scheme_components,
+            "uncovered_elements": len(self.element_ids) - popcount(covered)
+        }
+
+    # 跨层广度优先搜索
+
+    def _expand(self, elements: int, rules: int, schemes: int) -> Tuple[int, int, int]:
+        """一跳之内可达的 (要素, 规则, 方案) 位集：要素 <-> 规则 <-> 方案"""
+        next_elements = next_rules = next_schemes = 0
+        if elements:
+            for rule_index, rule_bits in enumerate(self.rule_elements):
+                if rule_bits & elements:
+                    next_rules |= 1 << rule_index
+        for rule_index in bit_indices(rules) if rules else ():
+            next_elements |= self.rule_elements[rule_index]
+            next_schemes |= self.rule_schemes[rule_index]
+        for scheme_index in bit_indices(schemes) if schemes else ():
+            next_rules |= self.scheme_rules[scheme_index]
+        return next_elements, next_rules, next_schemes
+
+    def _start(self, layer: str, index: int) -> Tuple[int, int, int]:
+        bit = 1 << index
+        return (bit if layer == LAYER_ELEMENT else 0, bit if layer == LAYER_RULE else 0,
+                bit if layer == LAYER_SCHEME else 0)
+
+    def neighborhood(self, layer: str, index: int, k: int, limit: Optional[int] = 100) -> Dict[str, Any]:
+        """k 跳邻域：按跳数列出新到达的要素、规则和方案"""
+        frontier = visited = self._start(layer, index)
+        hops = []
+        for hop in range(1, k + 1):
+            reached = self._expand(*frontier)
+            frontier = tuple(new & ~seen for new, seen in zip(reached, visited))
+            if not any(frontier):
+                break
+            visited = tuple(seen | new for seen, new in zip(visited, frontier))
+            hops.append({
+                "hop": hop,
+                **{name: self._layer_summary(name, bits, limit) for name, bits in zip(LAYERS, frontier)}
+            })
+        source_id = self._ids(layer, 1 << index)[0]
+        return {
+            "source": {"layer": layer, "id": source_id},
+            "k": k,
+            "hops": hops,
+            "total": {name: popcount(bits) for name, bits in zip(LAYERS, visited)}
+        }
+
+    def shortest_path(self, source_layer: str, source: int, target_layer: str, target: int) -> Optional[List[Dict[str, str]]]:
+        """最短超路径：逐层扩展直到到达目标，返回途经的节点序列（规则是要素上的超边，方案是规则上的超边）"""
+        frontier = visited = self._start(source_layer, source)
+        target_layer_index = LAYERS.index(target_layer)
+        levels = [frontier]
+        while not frontier[target_layer_index] >> target & 1:
+            reached = self._expand(*frontier)
+            frontier = tuple(new & ~seen for new, seen in zip(reached, visited))
+            if not any(frontier):
+                return None
+            visited = tuple(seen | new for seen, new in zip(visited, frontier))
+            levels.append(frontier)
+
+        # 从目标倒推：在上一层的前沿中找一个与当前节点相邻的节点
+        path = [(target_layer, target)]
+        for level in range(len(levels) - 2, -1, -1):
+            elements, rules, schemes = levels[level]
+            layer, index = path[-1]
+            if layer == LAYER_ELEMENT:
+                previous = (LAYER_RULE, next(rule_index for rule_index in bit_indices(rules)
+                                             if self.rule_elements[rule_index] >> index & 1))
+            elif layer == LAYER_SCHEME:
+                previous = (LAYER_RULE, lowest_bit(self.scheme_rules[index] & rules))
+            elif self.rule_elements[index] & elements:
+                previous = (LAYER_ELEMENT, lowest_bit(self.rule_elements[index] & elements))
+            else:
+                previous = (LAYER_SCHEME, lowest_bit(self.rule_schemes[index] & schemes))
+            path.append(previous)
+        path.reverse()
+        return [{"layer": layer, "id": self._ids(layer, 1 << index)[0]} for layer, index in path]
+
+    # 集合运算
+
+    def scheme_elements(self, index: int) -> int:
+        """方案覆盖的要素位集：所用规则位集的并"""
+        elements = 0
+        for rule_index in bit_indices(self.scheme_rules[index]):
+            elements |= self.rule_elements[rule_index]
+        return elements
+
+    def overlaps(self, layer: str, indices: List[int]) -> Dict[str, Any]:
+        """规则或方案两两之间共享的要素数
+
+        每个节点的要素集合是一个位集，交集大小为 popcount(a & b)，Jaccard 系数为交集与并集大小之比；
+        只列出交集非空的节点对。
+        """
+        if layer == LAYER_RULE:
+            ids, sets = self.rule_ids, [self.rule_elements[index] for index in indices]
+        else:
+            ids, sets = self.scheme_ids, [self.scheme_elements(index) for index in indices]
+        sizes = [popcount(bits) for bits in sets]
+        union = shared = 0
+        for bits in sets:
+            shared |= union & bits
+            union |= bits
+        pairs = []
+        for i in range(len(indices)):
+            for j in range(i + 1, len(indices)):
+                intersection = popcount(sets[i] & sets[j])
+                if intersection:
+                    pairs.append({
+                        "a": ids[indices[i]],
+                        "b": ids[indices[j]],
+                        "intersection": intersection,
+                        "jaccard": intersection / (sizes[i] + sizes[j] - intersection)
+                    })
+        pairs.sort(key=lambda pair: -pair["intersection"])
+        return {
+            "layer": layer,
+            "sizes": {ids[index]: size for index, size in zip(indices, sizes)},
+            "union": popcount(union),
+            "shared": popcount(shared),
+            "pairs": pairs
+        }
+
+    # 影响分析
+
+    def impact(self, layer: str, index: int, limit: Optional[int] = 100) -> Dict[str, Any]:
+        """节点变化时受影响的规则和方案
+
+        要素：当前匹配它的规则，以及按影响的要素类型可能因修改而开始匹配的规则；
+        规则：使用它的方案及它匹配的要素；方案：它使用的规则覆盖的要素。
+        """
+        if layer == LAYER_ELEMENT:
+            matching = applicable = 0
+            element_type = self.element_types[index]
+            for rule_index, rule_bits in enumerate(self.rule_elements):
+                if rule_bits >> index & 1:
+                    matching |= 1 << rule_index
+                types = self.rule_types[rule_index]
+                if not types or element_type in types:
+                    applicable |= 1 << rule_index
+            schemes = 0
+            for rule_index in bit_indices(applicable):
+                schemes |= self.rule_schemes[rule_index]
+            affected_schemes = 0
+            for rule_index in bit_indices(matching):
+                affected_schemes |= self.rule_schemes[rule_index]
+            return {
+                "source": {"layer": layer, "id": self.element_ids[index], "type": element_type},
+                "matching_rules": self._ids(LAYER_RULE, matching),
+                "applicable_rules": self._ids(LAYER_RULE, applicable),
+                "affected_schemes": self._ids(LAYER_SCHEME, affected_schemes),
+                "possibly_affected_schemes": self._ids(LAYER_SCHEME, schemes)
+            }
+        if layer == LAYER_RULE:
+            return {
+                "source": {"layer": layer, "id": self.rule_ids[index]},
+                "affected_schemes": self._ids(LAYER_SCHEME, self.rule_schemes[index]),
+                "elements": self._layer_summary(LAYER_ELEMENT, self.rule_elements[index], limit)
+            }
+        return {
+            "source": {"layer": layer, "id": self.scheme_ids[index]},
+            "rules": self._ids(LAYER_RULE, self.scheme_rules[index]),
+            "elements": self._layer_summary(LAYER_ELEMENT, self.scheme_elements(index), limit)
+        }
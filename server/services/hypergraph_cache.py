@@ -0,0 +1,123 @@
+from typing import Dict, Any, List, Optional, Tuple, Iterable
+from collections import OrderedDict
+from models.hypergraph import Hypergraph
+from services.instrumentation import record_cache_lookup
+import logging
+import os
+import threading
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 常驻内存的超图的内存预算（MB），超出时淘汰最近最少使用的超图；最近使用的一个超图总是保留
+HYPERGRAPH_CACHE_BUDGET_MB = float(os.getenv("HYPERGRAPH_CACHE_BUDGET_MB", "512"))
+
+# 估算常驻内存用的近似字节数：层中对象按 pydantic 模型及邻接索引中的条目估算
+_HYPERGRAPH_BYTES = 4096
+_ELEMENT_REF_BYTES = 200
+_RULE_REF_BYTES = 200
+_SCHEME_BYTES = 1024
+_NODE_BYTES = 800
+_EDGE_BYTES = 1000
+_HYPEREDGE_BYTES = 800
+_INCIDENCE_BYTES = 160
+
+def estimate_hypergraph_size(hypergraph: Hypergraph) -> int:
+    """超图常驻内存的近似字节数，耗时与层中的对象数成正比"""
+    size = (_HYPERGRAPH_BYTES + len(hypergraph.elements) * _ELEMENT_REF_BYTES
+            + len(hypergraph.rules) * _RULE_REF_BYTES + len(hypergraph.schemes) * _SCHEME_BYTES)
+    for layer in hypergraph.layers:
+        size += estimate_layer_size(layer)
+    return size
+
+def estimate_layer_size(layer: Any) -> int:
+    """层及其邻接索引常驻内存的近似字节数"""
+    return estimate_items_size(layer.nodes, layer.edges, layer.hyperedges)
+
+def estimate_items_size(nodes: Iterable[Any], edges: Iterable[Any], hyperedges: Iterable[Any]) -> int:
+    """一组节点、边和超边常驻内存的近似字节数，用于按补丁调整超图的大小"""
+    size = sum(_NODE_BYTES for _ in nodes) + sum(_EDGE_BYTES for _ in edges)
+    for hyperedge in hyperedges:
+        size += _HYPEREDGE_BYTES + len(hyperedge.nodes) * _INCIDENCE_BYTES
+    return size
+
+class HypergraphCache:
+    """常驻内存的超图，按估算的内存大小在预算内保留最近使用的超图
+
+    超图的每次修改都已写入数据库，淘汰时直接丢弃，下次访问时重新加载。
+    """
+    def __init__(self, budget_bytes: int = int(HYPERGRAPH_CACHE_BUDGET_MB * 1024 * 1024)):
+        self.budget_bytes = budget_bytes
+        self._entries: "OrderedDict[str, Tuple[Hypergraph, int]]" = OrderedDict()
+        self._bytes = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def __contains__(self, hypergraph_id: str) -> bool:
+        return hypergraph_id in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def values(self) -> List[Hypergraph]:
+        with self._lock:
+            return [hypergraph for hypergraph, _ in self._entries.values()]
+
+    def get(self, hypergraph_id: str) -> Optional[Hypergraph]:
+        """获取常驻的超图并标记为最近使用"""
+        with self._lock:
+            entry = self._entries.get(hypergraph_id)
+            if entry is not None:
+                self._entries.move_to_end(hypergraph_id)
+        record_cache_lookup("hypergraphs", entry is not None)
+        return entry[0] if entry is not None else None
+
+    def put(self, hypergraph: Hypergraph, size: Optional[int] = None) -> None:
+        """保存超图并按预算淘汰；size 为空时重新估算"""
+        if size is None:
+            size = estimate_hypergraph_size(hypergraph)
+        with self._lock:
+            previous = self._entries.pop(hypergraph.id, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            self._entries[hypergraph.id] = (hypergraph, size)
+            self._bytes += size
+            self._evict()
+
+    def resize(self, hypergraph: Hypergraph) -> None:
+        """超图内容变化后重新估算大小"""
+        if hypergraph.id in self._entries:
+            self.put(hypergraph)
+
+    def adjust(self, hypergraph_id: str, delta: int) -> None:
+        """按增量调整超图的估算大小，不需要重新遍历超图"""
+        with self._lock:
+            entry = self._entries.get(hypergraph_id)
+            if entry is None:
+                return
+            size = max(entry[1] + delta, 0)
+            self._entries[hypergraph_id] = (entry[0], size)
+            self._bytes += size - entry[1]
+            self._evict()
+
+    def discard(self, hypergraph_id: str) -> None:
+        with self._lock:
+            entry = self._entries.pop(hypergraph_id, None)
+            if entry is not None:
+                self._bytes -= entry[1]
+
+    def _evict(self) -> None:
+        while self._bytes > self.budget_bytes and len(self._entries) > 1:
+            hypergraph_id, (_, size) = self._entries.popitem(last=False)
+            self._bytes -= size
+            self.evictions += 1
+            logger.info(f"超图 {hypergraph_id} 超出内存预算被淘汰（约 {size / 1024 / 1024:.1f} MB）")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "hypergraphs": len(self._entries),
+                "bytes": self._bytes,
+                "budget_bytes": self.budget_bytes,
+                "evictions": self.evictions
+            }
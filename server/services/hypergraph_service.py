@@ -1,24 +1,72 @@
 from typing import List, Optional, Dict, Any, Callable, Set
-from models.hypergraph import Hypergraph, HypergraphCreate, HypergraphUpdate, Layer, LayerCreate, LayerUpdate, Rule, Scheme, Element, RuleElementHyperedge, SchemeRuleHyperedge
-from datetime import datetime
+from models.hypergraph import Hypergraph, HypergraphCreate, HypergraphUpdate, Layer, LayerCreate, LayerUpdate, LayerPatch, Rule, Scheme, Element, RuleElementHyperedge, SchemeRuleHyperedge
+from datetime import datetime, timedelta
 import uuid
 import json
 import asyncio
+from models.layer_graph import LayerGraph
 from services.db_service import DatabaseService
+from services.element_import import ElementImporter
+from services.instrumentation import record_rule_evaluations, record_elements_scanned, record_cache_lookup
+from services.rule_profiler import rule_profiler
+from services.evaluation_executor import evaluation_executor
+from services.evaluation_cache import evaluation_cache, canonical_parameters, rule_code_version, RuleColumn
+from services.schema_inference import schema_registry
+from services.element_store import ElementStore
+from services.element_snapshot import (
+    ElementSnapshot, SnapshotError, write_snapshot,
+    SNAPSHOT_PATH, SNAPSHOT_REWRITE_VERSIONS, SNAPSHOT_CATCHUP_MARGIN
+)
+from services.shared_element_store import shared_element_store, SHARED_STORE_WAIT
+from services.hypergraph_analytics import IncidenceGraph, LAYER_RULE
+from services.hypergraph_cache import HypergraphCache, estimate_items_size
+from services.bitset import bit_indices, popcount
+from services.rule_query import parse_rule_query, RuleQueryEvaluator, RuleTerm
+from services.tracing import span
+import heapq
+import os
 import textwrap
-import time
+
+class HypergraphVersionConflict(Exception):
+    """数据库中的超图已被其他进程修改，内存中的超图已过期"""
+    pass
+
+class HypergraphExists(Exception):
+    """同ID的超图已存在；超图ID由名称生成"""
+    pass
+
+class LayerVersionConflict(HypergraphVersionConflict):
+    """补丁基于的层版本不是当前版本"""
+    pass
 
 class HypergraphService:
     def __init__(self):
-        # 在实际应用中，这里应该连接到数据库
-        # 这里使用内存存储作为示例
-        self.hypergraphs: Dict[str, Hypergraph] = {}
+        # 常驻内存的超图：超图保存在数据库中，首次访问时加载，按内存预算淘汰最近最少使用的超图
+        self.hypergraphs = HypergraphCache()
+        self._hypergraph_loads: Dict[str, asyncio.Task] = {}
+        # 层ID -> 锁，同一层的修改按顺序写入内存和数据库
+        self._layer_locks: Dict[str, asyncio.Lock] = {}
         
         # 共享的要素层和规则层
         self.shared_elements: Dict[str, Element] = {}  # 所有要素的字典，按ID索引
         self.shared_elements_by_type: Dict[str, List[Element]] = {}  # 按类型分组的要素
         self.shared_rules: Dict[str, Rule] = {}  # 所有规则的字典，按ID索引
         
+        # 方案结果快照，按方案ID索引；以及正在后台刷新的快照任务
+        self._scheme_snapshots: Dict[str, Dict[str, Any]] = {}
+        self._snapshot_tasks: Dict[str, asyncio.Task] = {}
+        
+        # 评估使用的要素及其数据版本，版本不变时不再从数据库读取，版本变化时按 updated_at 增量同步
+        self._evaluation_elements_cache: Optional[ElementStore] = None
+        
+        # 规则代码 -> 编译后的代码对象；最近写入快照的要素版本及正在写入快照的任务
+        self._compiled_rules: Dict[str, Any] = {}
+        self._element_snapshot_version: Optional[int] = None
+        self._element_snapshot_task: Optional[asyncio.Task] = None
+        
+        # 三层结构的关联表示及其对应的 (要素版本, 规则, 方案) 键
+        self._incidence_graph_cache: Optional[tuple] = None
+        
         # 初始化共享要素和规则
         self._initialize_shared_elements_and_rules()
     
@@ -127,33 +175,43 @@ class HypergraphService:
         )
         self.shared_rules["rule_transport"] = rule_transport
     
-    # 添加缓存
+    # 添加缓存：按规则版本号缓存，其他进程写入规则后版本号变化，下次读取时重新获取
     _rules_cache = None
-    _rules_cache_timestamp = 0
-    _CACHE_DURATION = 60  # 缓存有效期，单位秒
+    _rules_cache_version = None
     
     async def get_all_rules_async(self) -> List[Dict[str, Any]]:
         """异步获取所有共享规则（带缓存）"""
-        current_time = time.time()
+        rules_version = (await DatabaseService.get_data_versions())["rules"]
         
-        # 如果缓存存在且未过期，直接返回缓存数据
-        if self._rules_cache is not None and (current_time - self._rules_cache_timestamp) < self._CACHE_DURATION:
+        # 如果缓存的规则版本与数据库一致，直接返回缓存数据
+        if self._rules_cache is not None and self._rules_cache_version == rules_version:
+            record_cache_lookup("rules", True)
             return self._rules_cache
+        record_cache_lookup("rules", False)
         
-        # 否则从数据库获取
-        rules = await DatabaseService.get_all_rules()
+        # 否则从数据库获取；版本号先于规则读取，期间的写入只会让缓存被判定为过期
+        with span("rules.fetch"):
+            rules = await DatabaseService.get_all_rules()
         
         # 更新缓存
         self._rules_cache = rules
-        self._rules_cache_timestamp = current_time
+        self._rules_cache_version = rules_version
         
         return rules
     
+    def _invalidate_rules_cache(self) -> None:
+        """规则写入后使规则缓存失效"""
+        self._rules_cache = None
+    
     # 异步方法 - 使用数据库服务
     
     async def get_all_elements_async(self) -> Dict[str, List[Dict[str, Any]]]:
         """异步获取所有共享要素"""
-        return await DatabaseService.get_all_elements()
+        with span("elements.fetch") as current:
+            elements = await DatabaseService.get_all_elements()
+            if current is not None:
+                current.set_attribute("elements", sum(len(element_list) for element_list in elements.values()))
+            return elements
     
     async def get_elements_by_type_async(self, element_type: str) -> List[Dict[str, Any]]:
         """异步获取特定类型的共享要素"""
@@ -166,15 +224,55 @@ class HypergraphService:
             "type": element_type,
             "attributes": attributes
         }
-        return await DatabaseService.create_element(element_data)
+        element = await DatabaseService.create_element(element_data)
+        await self._observe_schema_write([element])
+        return element
+    
+    async def import_elements_async(self, chunks: Any, fmt: str, mode: str = "upsert", batch_size: int = 1000) -> Dict[str, Any]:
+        """异步批量导入共享要素，chunks 为请求体的字节流"""
+        importer = ElementImporter(fmt, mode=mode, batch_size=batch_size)
+        return await importer.run(chunks)
     
     async def update_element_async(self, element_id: str, attributes: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """异步更新共享要素"""
-        return await DatabaseService.update_element(element_id, attributes)
+        element = await DatabaseService.update_element(element_id, attributes)
+        if element:
+            await self._observe_schema_write([element], new=False)
+        return element
+    
+    async def update_elements_async(self, patches: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """异步批量更新共享要素"""
+        result = await DatabaseService.update_elements(patches)
+        if result["updated"]:
+            await self._observe_schema_write(result["updated"], new=False)
+        return result
     
     async def delete_element_async(self, element_id: str) -> bool:
         """异步删除共享要素"""
-        return await DatabaseService.delete_element(element_id)
+        element = await DatabaseService.delete_element(element_id)
+        if element is None:
+            return False
+        await self._observe_schema_write([element], deleted=True)
+        return True
+    
+    async def _observe_schema_write(self, elements: List[Dict[str, Any]], new: bool = True, deleted: bool = False) -> None:
+        """要素写入后增量更新推断的属性结构；从未推断过时不做任何事，有并发写入时留到下次读取重新推断"""
+        if schema_registry.version is None:
+            return
+        elements_version = await self._elements_version()
+        if deleted:
+            schema_registry.observe_delete(elements_version, elements)
+        else:
+            schema_registry.observe_write(elements_version, elements, new)
+    
+    async def get_element_schemas_async(self, refresh: bool = False) -> Dict[str, Any]:
+        """获取按要素类型推断的属性结构；要素版本变化且无法增量更新时重新推断"""
+        elements_version = await self._elements_version()
+        if refresh or not schema_registry.is_current(elements_version):
+            all_elements, _ = await self._evaluation_elements(elements_version)
+            with span("schema.infer", elements=len(all_elements)):
+                await evaluation_executor.run(schema_registry.rebuild, elements_version, all_elements)
+        return schema_registry.to_dict()
     
     async def create_rule_async(self, name: str, weight: float = 1.0, 
                                affected_element_types: List[str] = None,
@@ -190,7 +288,9 @@ class HypergraphService:
             "code": code,
             "parameters": parameters
         }
-        return await DatabaseService.create_rule(rule_data)
+        rule = await DatabaseService.create_rule(rule_data)
+        self._invalidate_rules_cache()
+        return rule
     
     async def update_rule_async(self, rule_id: str, rule_data: Any) -> Optional[Dict[str, Any]]:
         """异步更新共享规则"""
@@ -217,11 +317,19 @@ class HypergraphService:
         if hasattr(rule_data, "parameters") and rule_data.parameters is not None:
             update_data["parameters"] = rule_data.parameters
         
-        return await DatabaseService.update_rule(rule_id, update_data)
+        rule = await DatabaseService.update_rule(rule_id, update_data)
+        self._invalidate_rules_cache()
+        return rule
     
     async def delete_rule_async(self, rule_id: str) -> bool:
         """异步删除共享规则"""
-        return await DatabaseService.delete_rule(rule_id)
+        rule = await DatabaseService.delete_rule(rule_id)
+        self._invalidate_rules_cache()
+        if rule is None:
+            return False
+        # 得分列按规则的规范ID缓存，rule_id 可能是名称或别名
+        evaluation_cache.invalidate(rule["id"])
+        return True
     
     # 同步方法包装异步方法（用于兼容现有代码）
     
@@ -468,18 +576,311 @@ class HypergraphService:
         hypergraph.add_scheme(scheme3)
         
         # 保存超图
-        self.hypergraphs[hypergraph.id] = hypergraph
+        self.hypergraphs.put(hypergraph)
         
         return hypergraph
     
+    async def create_demo_hypergraph_async(self) -> Hypergraph:
+        """创建演示超图并保存到数据库；数据库中已有时加载已保存的版本，保留其中的修改和方案ID"""
+        hypergraph = self.create_demo_hypergraph()
+        self.hypergraphs.discard(hypergraph.id)
+        try:
+            await self._save_hypergraph(hypergraph)
+            return hypergraph
+        except HypergraphExists:
+            return await self.get_hypergraph_async(hypergraph.id)
+    
     def get_all_hypergraphs(self) -> List[Dict[str, Any]]:
-        """获取所有超图"""
+        """获取常驻内存的超图"""
         return [hypergraph.to_dict() for hypergraph in self.hypergraphs.values()]
     
     def get_hypergraph(self, hypergraph_id: str) -> Optional[Hypergraph]:
-        """获取特定超图"""
+        """获取常驻内存的超图，未加载或已被淘汰时返回 None；需要从数据库加载时使用 get_hypergraph_async"""
         return self.hypergraphs.get(hypergraph_id)
     
+    # 超图持久化：超图文档保存基本信息、方案以及引用的共享要素和规则的ID，每个层单独保存为一个文档
+    
+    async def get_all_hypergraphs_async(self) -> List[Dict[str, Any]]:
+        """获取所有超图的概要，不加载超图"""
+        return await DatabaseService.get_hypergraph_summaries()
+    
+    async def get_hypergraph_async(self, hypergraph_id: str) -> Optional[Hypergraph]:
+        """获取超图，不在内存中时从数据库加载；同一超图的并发请求只加载一次"""
+        hypergraph = self.hypergraphs.get(hypergraph_id)
+        if hypergraph is not None:
+            return hypergraph
+        
+        task = self._hypergraph_loads.get(hypergraph_id)
+        if task is None:
+            task = asyncio.ensure_future(self._load_hypergraph(hypergraph_id))
+            self._hypergraph_loads[hypergraph_id] = task
+            task.add_done_callback(lambda _: self._hypergraph_loads.pop(hypergraph_id, None))
+        return await asyncio.shield(task)
+    
+    async def _load_hypergraph(self, hypergraph_id: str) -> Optional[Hypergraph]:
+        document = await DatabaseService.get_hypergraph_by_id(hypergraph_id)
+        if document is None:
+            return None
+        layers = await DatabaseService.get_hypergraph_layers(hypergraph_id) if document.get("layer_ids") else []
+        with span("hypergraph.load", hypergraph_id=hypergraph_id):
+            hypergraph = self._hypergraph_from_document(document, layers)
+        self.hypergraphs.put(hypergraph)
+        print(f"已加载超图 {hypergraph_id}（{len(hypergraph.layers)} 个层）")
+        return hypergraph
+    
+    @staticmethod
+    def _hypergraph_document(hypergraph: Hypergraph) -> Dict[str, Any]:
+        """超图文档：概要字段与 to_dict 一致，层只保存ID及顺序"""
+        document = hypergraph.to_dict()
+        document.update({
+            "element_ids": list(hypergraph.elements),
+            "rule_ids": list(hypergraph.rules),
+            "schemes": [scheme.to_dict() for scheme in hypergraph.schemes.values()],
+            "layer_ids": [layer.id for layer in hypergraph.layers],
+            "layers_count": len(hypergraph.layers),
+            "version": hypergraph.version,
+            "created_at": hypergraph.created_at,
+            "updated_at": hypergraph.updated_at
+        })
+        return document
+    
+    def _hypergraph_from_document(self, document: Dict[str, Any], layers: List[Dict[str, Any]]) -> Hypergraph:
+        """由超图文档和层文档重建超图；引用的要素和规则取共享要素层和规则层中的对象，层的邻接索引在首次使用时建立"""
+        hypergraph = Hypergraph(document["name"], document.get("description", ""))
+        hypergraph.id = document["id"]
+        hypergraph.version = document.get("version", 1)
+        hypergraph.created_at = document.get("created_at", hypergraph.created_at)
+        hypergraph.updated_at = document.get("updated_at", hypergraph.updated_at)
+        
+        for element_id in document.get("element_ids", []):
+            element = self.shared_elements.get(element_id)
+            if element is not None:
+                hypergraph.add_element(element_id, element.type, element.attributes)
+        for rule_id in document.get("rule_ids", []):
+            rule = self.shared_rules.get(rule_id)
+            if rule is not None:
+                hypergraph.add_rule(rule)
+        for scheme_data in document.get("schemes", []):
+            hypergraph.add_scheme(self.scheme_from_data(scheme_data))
+        
+        layers_by_id = {layer_data["id"]: layer_data for layer_data in layers}
+        for layer_id in document.get("layer_ids", []):
+            layer_data = layers_by_id.get(layer_id)
+            if layer_data is not None:
+                layer_data.pop("hypergraph_id", None)
+                hypergraph.layers.append(Layer(**layer_data))
+        return hypergraph
+    
+    async def _save_hypergraph(self, hypergraph: Hypergraph) -> None:
+        """保存新建的超图及其全部层，保存成功后才放入常驻内存；同ID的超图已存在时抛出 HypergraphExists
+
+        先保存层再保存引用它们的超图文档；超图已存在时删除刚保存的层，已有超图的层不受影响。
+        """
+        for layer in hypergraph.layers:
+            self._materialize_layer(hypergraph, layer)
+            await DatabaseService.save_hypergraph_layer(hypergraph.id, layer.dict())
+        if not await DatabaseService.insert_hypergraph(self._hypergraph_document(hypergraph)):
+            for layer in hypergraph.layers:
+                await DatabaseService.delete_hypergraph_layer(hypergraph.id, layer.id)
+            raise HypergraphExists(f"超图 {hypergraph.id} 已存在")
+        self.hypergraphs.put(hypergraph)
+    
+    async def _save_hypergraph_document(self, hypergraph: Hypergraph) -> None:
+        """重写已有超图的文档（层列表、方案等），并重新估算常驻内存大小
+        
+        只在数据库中的文档仍是内存中超图的版本时写入，否则内存中的超图已落后于其他进程的修改，
+        丢弃后抛出 HypergraphVersionConflict，下次访问时重新加载。
+        """
+        base_version = hypergraph.version
+        hypergraph.version += 1
+        if not await DatabaseService.save_hypergraph(self._hypergraph_document(hypergraph), base_version):
+            self.hypergraphs.discard(hypergraph.id)
+            raise HypergraphVersionConflict(f"超图 {hypergraph.id} 已被其他进程修改，请重新读取后再提交")
+        self._resize_hypergraph(hypergraph)
+    
+    def _resize_hypergraph(self, hypergraph: Hypergraph) -> None:
+        """按层的当前内容重新估算超图的常驻内存大小"""
+        for layer in hypergraph.layers:
+            self._materialize_layer(hypergraph, layer)
+        self.hypergraphs.resize(hypergraph)
+    
+    async def create_hypergraph_async(self, hypergraph_data: HypergraphCreate) -> Hypergraph:
+        """创建新超图及请求中的层并保存；同名（同ID）的超图已存在时抛出 HypergraphExists"""
+        hypergraph = Hypergraph(name=hypergraph_data.name, description=hypergraph_data.description)
+        for layer_data in hypergraph_data.layers:
+            self._add_layer(hypergraph, layer_data)
+        await self._save_hypergraph(hypergraph)
+        return hypergraph
+    
+    async def delete_hypergraph_async(self, hypergraph_id: str) -> bool:
+        """删除超图及其所有层"""
+        self.hypergraphs.discard(hypergraph_id)
+        return await DatabaseService.delete_hypergraph(hypergraph_id)
+    
+    async def get_hypergraph_layers_async(self, hypergraph_id: str) -> Optional[List[Dict[str, Any]]]:
+        """获取超图各层的概要（ID、名称、版本及对象数），超图不存在时返回 None"""
+        hypergraph = await self.get_hypergraph_async(hypergraph_id)
+        if hypergraph is None:
+            return None
+        return self.layer_summaries(hypergraph)
+    
+    def layer_summaries(self, hypergraph: Hypergraph) -> List[Dict[str, Any]]:
+        summaries = []
+        for layer in hypergraph.layers:
+            self._materialize_layer(hypergraph, layer)
+            summaries.append({
+                "id": layer.id,
+                "name": layer.name,
+                "description": layer.description,
+                "version": layer.version,
+                "nodes": len(layer.nodes),
+                "edges": len(layer.edges),
+                "hyperedges": len(layer.hyperedges),
+                "updated_at": layer.updated_at
+            })
+        return summaries
+    
+    async def get_hypergraph_layer_async(self, hypergraph_id: str, layer_id: str) -> Optional[Layer]:
+        """获取超图的特定层，超图不在内存中时先加载"""
+        if await self.get_hypergraph_async(hypergraph_id) is None:
+            return None
+        return self.get_hypergraph_layer(hypergraph_id, layer_id)
+    
+    async def add_layer_to_hypergraph_async(self, hypergraph_id: str, layer_data: LayerCreate) -> Optional[Hypergraph]:
+        """添加新层到超图并保存"""
+        if await self.get_hypergraph_async(hypergraph_id) is None:
+            return None
+        hypergraph = self.add_layer_to_hypergraph(hypergraph_id, layer_data)
+        layer = hypergraph.layers[-1]
+        # 先保存层再引用它，其他进程加载超图时不会读到缺失的层
+        await DatabaseService.save_hypergraph_layer(hypergraph.id, layer.dict())
+        try:
+            await self._save_hypergraph_document(hypergraph)
+        except HypergraphVersionConflict:
+            await DatabaseService.delete_hypergraph_layer(hypergraph.id, layer.id)
+            raise
+        return hypergraph
+    
+    async def update_hypergraph_layer_async(self, hypergraph_id: str, layer_id: str, layer_data: LayerUpdate) -> Optional[Hypergraph]:
+        """更新超图中的层，只保存这一个层"""
+        if await self.get_hypergraph_async(hypergraph_id) is None:
+            return None
+        async with self._layer_lock(layer_id):
+            layer = self.get_hypergraph_layer(hypergraph_id, layer_id)
+            if layer is None:
+                return None
+            base_version = layer.version
+            hypergraph = self.update_hypergraph_layer(hypergraph_id, layer_id, layer_data)
+            try:
+                saved = await DatabaseService.save_hypergraph_layer(hypergraph_id, layer.dict(), base_version)
+                if saved:
+                    await DatabaseService.update_hypergraph(hypergraph_id, {"updated_at": hypergraph.updated_at})
+            except Exception:
+                # 写入失败时内存中的修改未保存，丢弃后下次访问时重新加载
+                self.hypergraphs.discard(hypergraph_id)
+                raise
+            if not saved:
+                # 内存中的超图已落后于数据库，丢弃后下次访问时重新加载
+                self.hypergraphs.discard(hypergraph_id)
+                raise LayerVersionConflict(f"层 {layer_id} 已被其他进程修改，请重新读取后再提交")
+            self._resize_hypergraph(hypergraph)
+        return hypergraph
+    
+    async def patch_hypergraph_layer_async(self, hypergraph_id: str, layer_id: str, patch: LayerPatch) -> Optional[Dict[str, Any]]:
+        """按补丁增量修改层，返回层的新版本及变更数；层不存在时返回 None
+        
+        只更新邻接索引和数据库中涉及的对象，耗时与补丁大小成正比（超图或索引尚未加载时先加载一次）。
+        base_version 不是当前版本，或数据库中的层已被其他进程修改时抛出 LayerVersionConflict。
+        """
+        hypergraph = await self.get_hypergraph_async(hypergraph_id)
+        if hypergraph is None:
+            return None
+        layer = next((layer for layer in hypergraph.layers if layer.id == layer_id), None)
+        if layer is None:
+            return None
+        
+        async with self._layer_lock(layer_id):
+            if patch.base_version is not None and patch.base_version != layer.version:
+                raise LayerVersionConflict(f"层 {layer_id} 的当前版本为 {layer.version}，补丁基于版本 {patch.base_version}")
+            
+            graph = self._layer_graph(hypergraph, layer)
+            replaced = estimate_items_size(
+                self._patched_items(graph.nodes, patch.remove_nodes, patch.upsert_nodes),
+                self._patched_items(graph.edges, patch.remove_edges, patch.upsert_edges),
+                self._patched_items(graph.hyperedges, patch.remove_hyperedges, patch.upsert_hyperedges)
+            )
+            changes = graph.apply_patch(patch)
+            self.hypergraphs.adjust(hypergraph.id, estimate_items_size(
+                patch.upsert_nodes, patch.upsert_edges, patch.upsert_hyperedges) - replaced)
+            
+            base_version = layer.version
+            layer.version += 1
+            layer.updated_at = hypergraph.updated_at = datetime.now()
+            try:
+                saved = await DatabaseService.patch_hypergraph_layer(
+                    hypergraph_id, layer_id, base_version,
+                    upserts={
+                        "nodes": [node.dict() for node in patch.upsert_nodes],
+                        "edges": [edge.dict() for edge in patch.upsert_edges],
+                        "hyperedges": [hyperedge.dict() for hyperedge in patch.upsert_hyperedges]
+                    },
+                    removals={
+                        "nodes": patch.remove_nodes,
+                        "edges": patch.remove_edges,
+                        "hyperedges": patch.remove_hyperedges
+                    },
+                    update_fields={"version": layer.version, "updated_at": layer.updated_at}
+                )
+                if saved:
+                    await DatabaseService.update_hypergraph(hypergraph_id, {"updated_at": hypergraph.updated_at})
+            except Exception:
+                # 补丁已应用到缓存但未保存，丢弃后下次访问时重新加载
+                self.hypergraphs.discard(hypergraph_id)
+                raise
+            if not saved:
+                # 内存中的超图已落后于数据库，丢弃后下次访问时重新加载
+                self.hypergraphs.discard(hypergraph_id)
+                raise LayerVersionConflict(f"层 {layer_id} 已被其他进程修改，请重新读取后再提交补丁")
+        
+        return {
+            "hypergraph_id": hypergraph_id,
+            "layer_id": layer_id,
+            "version": layer.version,
+            "updated_at": layer.updated_at,
+            "changes": changes
+        }
+    
+    @staticmethod
+    def _patched_items(items: Dict[str, Any], removed_ids: List[str], upserted: List[Any]) -> List[Any]:
+        """补丁删除或替换的现有对象"""
+        ids = set(removed_ids)
+        ids.update(item.id for item in upserted)
+        return [items[item_id] for item_id in ids if item_id in items]
+    
+    def _layer_lock(self, layer_id: str) -> asyncio.Lock:
+        lock = self._layer_locks.get(layer_id)
+        if lock is None:
+            lock = self._layer_locks[layer_id] = asyncio.Lock()
+        return lock
+    
+    async def delete_hypergraph_layer_async(self, hypergraph_id: str, layer_id: str) -> Optional[Hypergraph]:
+        """删除超图中的层"""
+        if await self.get_hypergraph_async(hypergraph_id) is None:
+            return None
+        hypergraph = self.delete_hypergraph_layer(hypergraph_id, layer_id)
+        if hypergraph is not None:
+            self._layer_locks.pop(layer_id, None)
+            # 先去掉引用再删除层，版本冲突时数据库中的层保持不变
+            await self._save_hypergraph_document(hypergraph)
+            await DatabaseService.delete_hypergraph_layer(hypergraph_id, layer_id)
+        return hypergraph
+    
+    async def get_layer_graph_async(self, hypergraph_id: str, layer_id: str) -> Optional[LayerGraph]:
+        """获取超图中层的邻接索引，超图不在内存中时先加载"""
+        if await self.get_hypergraph_async(hypergraph_id) is None:
+            return None
+        return self.get_layer_graph(hypergraph_id, layer_id)
+    
     def create_hypergraph(self, hypergraph_data: HypergraphCreate) -> Hypergraph:
         """创建新超图"""
         hypergraph = Hypergraph(
@@ -488,7 +889,7 @@ class HypergraphService:
         )
         
         # 存储超图
-        self.hypergraphs[hypergraph.id] = hypergraph
+        self.hypergraphs.put(hypergraph)
         
         return hypergraph
     
@@ -508,12 +909,12 @@ class HypergraphService:
         return hypergraph
     
     def delete_hypergraph(self, hypergraph_id: str) -> bool:
-        """删除超图"""
+        """从内存中删除超图，数据库中的超图由 delete_hypergraph_async 删除"""
         if hypergraph_id not in self.hypergraphs:
             return False
         
-        # 从字典中删除
-        del self.hypergraphs[hypergraph_id]
+        # 从常驻超图中删除
+        self.hypergraphs.discard(hypergraph_id)
         
         return True
     
@@ -541,17 +942,30 @@ class HypergraphService:
         
         for layer in hypergraph.layers:
             if layer.id == layer_id:
+                self._materialize_layer(hypergraph, layer)
                 return layer
         
         return None
     
+    @staticmethod
+    def _materialize_layer(hypergraph: Hypergraph, layer: Layer) -> None:
+        """按补丁修改过的层在读取前按邻接索引重建列表"""
+        graph = hypergraph.layer_graphs.get(layer.id)
+        if graph is not None:
+            graph.materialize(layer)
+    
     def add_layer_to_hypergraph(self, hypergraph_id: str, layer_data: LayerCreate) -> Optional[Hypergraph]:
         """添加新层到超图"""
         hypergraph = self.get_hypergraph(hypergraph_id)
         if not hypergraph:
             return None
         
-        # 创建新层
+        self._add_layer(hypergraph, layer_data)
+        return hypergraph
+    
+    @staticmethod
+    def _add_layer(hypergraph: Hypergraph, layer_data: LayerCreate) -> Layer:
+        """创建新层并添加到超图"""
         layer_id = str(uuid.uuid4())
         layer = Layer(
             id=layer_id,
@@ -566,9 +980,10 @@ class HypergraphService:
         
         # 添加到超图
         hypergraph.layers.append(layer)
+        hypergraph.layer_graphs[layer.id] = LayerGraph(layer)
         hypergraph.updated_at = datetime.now()
         
-        return hypergraph
+        return layer
     
     def update_hypergraph_layer(self, hypergraph_id: str, layer_id: str, layer_data: LayerUpdate) -> Optional[Hypergraph]:
         """更新超图中的层"""
@@ -579,6 +994,8 @@ class HypergraphService:
         # 查找并更新层
         for i, layer in enumerate(hypergraph.layers):
             if layer.id == layer_id:
+                self._materialize_layer(hypergraph, layer)
+                
                 if layer_data.name is not None:
                     layer.name = layer_data.name
                 
@@ -594,6 +1011,11 @@ class HypergraphService:
                 if layer_data.hyperedges is not None:
                     layer.hyperedges = layer_data.hyperedges
                 
+                # 只更新变化部分的邻接索引
+                if layer_data.nodes is not None or layer_data.edges is not None or layer_data.hyperedges is not None:
+                    self._layer_graph(hypergraph, layer).sync(layer)
+                
+                layer.version += 1
                 layer.updated_at = datetime.now()
                 hypergraph.updated_at = datetime.now()
                 
@@ -611,96 +1033,159 @@ class HypergraphService:
         for i, layer in enumerate(hypergraph.layers):
             if layer.id == layer_id:
                 hypergraph.layers.pop(i)
+                hypergraph.layer_graphs.pop(layer_id, None)
                 hypergraph.updated_at = datetime.now()
                 return hypergraph
         
         return None
     
-    async def calculate_rule_element_hyperedges(self) -> List[Dict[str, Any]]:
-        """计算规则到要素的超边，表示每个规则影响的所有要素"""
+    @staticmethod
+    def _layer_graph(hypergraph: Hypergraph, layer: Layer) -> LayerGraph:
+        """层的邻接索引，不存在时按层当前内容建立"""
+        graph = hypergraph.layer_graphs.get(layer.id)
+        if graph is None:
+            graph = hypergraph.layer_graphs[layer.id] = LayerGraph(layer)
+        return graph
+    
+    def get_layer_graph(self, hypergraph_id: str, layer_id: str) -> Optional[LayerGraph]:
+        """获取超图中层的邻接索引"""
+        layer = self.get_hypergraph_layer(hypergraph_id, layer_id)
+        if layer is None:
+            return None
+        return self._layer_graph(self.get_hypergraph(hypergraph_id), layer)
+    
+    async def calculate_rule_element_hyperedges(self, progress: Callable[[int, int], None] = None) -> List[Dict[str, Any]]:
+        """计算规则到要素的超边，表示每个规则影响的所有要素
+
+        progress(已处理规则数, 规则总数) 在每个规则开始前和全部完成后调用。
+        """
         print("开始计算规则到要素的超边...")
         
-        # 获取所有规则和要素
+        # 获取所有规则和要素，先读取要素版本（见 evaluate_scheme_weights）
+        elements_version = await self._elements_version()
         rules = await self.get_all_rules_async()
-        elements_by_type = await self.get_all_elements_async()
-        
-        print(f"获取到 {len(rules)} 个规则和 {sum(len(elements) for elements in elements_by_type.values())} 个要素")
+        all_elements, element_positions = await self._evaluation_elements(elements_version)
         
-        # 将所有要素放入一个列表
-        all_elements = []
-        for element_list in elements_by_type.values():
-            all_elements.extend(element_list)
+        print(f"获取到 {len(rules)} 个规则和 {len(all_elements)} 个要素")
+        record_elements_scanned(len(all_elements))
         # 创建超边列表
         hyperedges = []
         
         # 对每个规则，计算其影响的要素
-        for rule_data in rules:
+        for index, rule_data in enumerate(rules):
+            if progress:
+                progress(index, len(rules))
             rule_id = rule_data["id"]
             rule_name = rule_data["name"]
             
             print(f"处理规则: {rule_name} (ID: {rule_id})")
             
-            # 创建规则对象
-            rule_function = None
-            if "code" in rule_data and rule_data["code"]:
-                try:
-                    # 编译规则代码
-                    code = rule_data["code"]
-                    print(f"规则代码: {code}")
-                    
-                    # 创建规则函数
-                    rule_function = self.create_rule_function(code)
-                except Exception as e:
-                    print(f"编译规则 {rule_id} 代码失败: {e}")
-                    continue
-            
-            # 创建规则对象
-            rule = Rule(
-                name=rule_data["name"],
-                rule_function=rule_function,
-                weight=rule_data.get("weight", 1.0),
-                affected_element_keys=rule_data.get("affected_element_keys", []),
-                affected_element_types=rule_data.get("affected_element_types", []),
-                description=rule_data.get("description", ""),
-                code=rule_data.get("code", "")
-            )
+            # 获取规则在默认参数下的得分列，与方案中未覆盖参数的规则共用
+            column = await self._rule_column(rule_data, all_elements, {}, elements_version,
+                                             source="rule_element_hyperedges")
+            if column is None:
+                continue
             
             # 创建超边
-            hyperedge = RuleElementHyperedge(rule_id, rule_name)
-            
-            # 对每个要素，检查是否满足规则
-            matched_elements = 0
-            for element in all_elements:
-                # 应用规则
-                score = rule.apply(element)
+            with span("hyperedge.build", rule_id=rule_id):
+                hyperedge = self._column_hyperedge(rule_id, rule_name, column, all_elements, element_positions)
                 
-                # 如果得分大于0，则要素满足规则
-                if score > 0:
-                    hyperedge.add_element(element, score)
-                    matched_elements += 1
-            
-            print(f"规则 {rule_name} 匹配到 {matched_elements} 个要素")
-            
-            # 如果超边包含要素，则添加到列表
-            if hyperedge.elements:
-                hyperedges.append(hyperedge.to_dict())
+                print(f"规则 {rule_name} 匹配到 {len(hyperedge.elements)} 个要素")
+                
+                # 如果超边包含要素，则添加到列表
+                if hyperedge.elements:
+                    hyperedges.append(hyperedge.to_dict())
         
+        if progress:
+            progress(len(rules), len(rules))
         print(f"计算完成，共生成 {len(hyperedges)} 个超边")
         return hyperedges
 
+    @staticmethod
+    def _column_hyperedge(rule_id: str, rule_name: str, column: RuleColumn, elements: List[Dict[str, Any]],
+                          element_positions: Dict[str, int]) -> RuleElementHyperedge:
+        """由规则得分列创建规则-要素超边，要素顺序与得分列一致"""
+        hyperedge = RuleElementHyperedge(rule_id, rule_name)
+        for element_id, score in zip(column.element_ids, column.scores):
+            position = element_positions.get(element_id)
+            if position is not None:
+                hyperedge.add_element(elements[position], score)
+        return hyperedge
+
+    def _build_rule(self, rule_id: str, rule_data: Dict[str, Any]) -> Optional[Rule]:
+        """根据数据库中的规则数据创建规则对象，编译失败时返回 None"""
+        rule_function = None
+        if "code" in rule_data and rule_data["code"]:
+            try:
+                with span("rule.compile", rule_id=rule_id):
+                    rule_function = self.create_rule_function(rule_data["code"])
+            except Exception as e:
+                print(f"编译规则 {rule_id} 代码失败: {e}")
+                return None
+        
+        rule = Rule(
+            name=rule_data["name"],
+            rule_function=rule_function,
+            weight=rule_data.get("weight", 1.0),
+            affected_element_keys=rule_data.get("affected_element_keys", []),
+            affected_element_types=rule_data.get("affected_element_types", []),
+            description=rule_data.get("description", ""),
+            code=rule_data.get("code", ""),
+            parameters=rule_data.get("parameters", {})  # 默认参数
+        )
+        rule.id = rule_id
+        return rule
+
+    @staticmethod
+    def _match_elements(elements: List[Dict[str, Any]], rule: Rule, parameter_values: Dict[str, Any] = None) -> List[tuple]:
+        """对一组要素应用规则，返回得分大于0的 (要素, 得分) 列表"""
+        matches = []
+        for element in elements:
+            score = rule.apply(element, parameter_values)
+            if score > 0:
+                matches.append((element, score))
+        return matches
+
+    async def _scan_rule(self, rule: Rule, elements: List[Dict[str, Any]], parameter_values: Dict[str, Any] = None,
+                         source: str = "") -> List[tuple]:
+        """对一组要素应用规则，返回得分大于0的 (要素, 得分) 列表，并记录该规则的开销
+
+        扫描交给评估执行器，不在事件循环中长时间占用CPU。
+        """
+        errors_before = rule.error_count
+        
+        with span("rule.scan", rule_id=rule.id, elements=len(elements)) as current:
+            matches, duration = await evaluation_executor.scan(self._match_elements, elements, rule, parameter_values)
+            if current is not None:
+                current.set_attribute("matches", len(matches))
+        
+        record_rule_evaluations(len(elements))
+        errors = rule.error_count - errors_before
+        rule_profiler.record(
+            rule.id, rule.name, source, len(elements), len(matches), errors, duration,
+            rule.last_error if errors else None
+        )
+        return matches
+
     def create_rule_function(self, code_str):
         """创建规则函数，接受规则代码字符串，返回一个函数"""
         try:
-            # 将代码包装在函数中，接受两个参数：attrs 和 params
-            wrapped_code = f"""
+            # 相同代码只编译一次，编译结果随要素快照保存
+            code = self._compiled_rules.get(code_str)
+            if code is None:
+                # 将代码包装在函数中，接受两个参数：attrs 和 params
+                wrapped_code = f"""
 def rule_function(attrs, params):
 {textwrap.indent(code_str, '    ')}
 """
+                code = compile(wrapped_code, "<rule>", "exec")
+                self._compiled_rules[code_str] = code
+            
             # 创建一个局部命名空间
             local_vars = {}
             
-            # 执行包装后的代码，定义函数
-            exec(wrapped_code, {}, local_vars)
+            # 执行编译后的代码，定义函数
+            exec(code, {}, local_vars)
             
             # 返回定义的函数
             return local_vars["rule_function"]
@@ -712,8 +1197,8 @@ def rule_function(attrs, params):
         """计算方案到规则的超边，表示每个方案使用的所有规则"""
         print("开始计算方案到规则的超边...")
         
-        # 获取所有超图
-        hypergraphs = self.get_all_hypergraphs()
+        # 获取所有超图的方案，不需要把超图加载到内存
+        hypergraphs = await DatabaseService.get_hypergraph_schemes()
         
         # 获取所有规则
         rules = await self.get_all_rules_async()
@@ -724,12 +1209,8 @@ def rule_function(attrs, params):
         
         # 对每个超图
         for hypergraph in hypergraphs:
-            hypergraph_obj = self.get_hypergraph(hypergraph["id"])
-            if not hypergraph_obj:
-                continue
-            
             # 获取所有方案
-            schemes = hypergraph_obj.get_all_schemes()
+            schemes = hypergraph.get("schemes", [])
             
             # 对每个方案，创建超边
             for scheme in schemes:
@@ -768,83 +1249,62 @@ def rule_function(attrs, params):
         
         return scheme.to_dict()
     
-    async def generate_scheme_details(self, scheme: Scheme) -> Dict[str, Any]:
-        """生成方案的详细信息"""
+    async def generate_scheme_details(self, scheme: Scheme, progress: Callable[[int, int], None] = None) -> Dict[str, Any]:
+        """生成方案的详细信息，progress 的含义同 calculate_rule_element_hyperedges"""
         # 获取所有规则
         rules = await self.get_all_rules_async()
         rules_dict = {rule["id"]: rule for rule in rules}
         
         # 创建方案-规则超边
-        scheme_rule_hyperedge = SchemeRuleHyperedge(scheme.id, scheme.name)
-        
-        # 添加方案使用的规则
-        for rule_id, rule_config in scheme.rule_weights.items():
-            if rule_id in rules_dict:
-                # 处理两种可能的格式：简单的数字权重或包含权重和参数的对象
-                if isinstance(rule_config, (int, float)):
-                    weight = rule_config
-                else:
-                    weight = rule_config.get("weight", 1.0)
-                
-                scheme_rule_hyperedge.add_rule(rules_dict[rule_id], weight)
+        with span("hyperedge.build", scheme_id=scheme.id):
+            scheme_rule_hyperedge = SchemeRuleHyperedge(scheme.id, scheme.name)
+            
+            # 添加方案使用的规则
+            for rule_id, rule_config in scheme.rule_weights.items():
+                if rule_id in rules_dict:
+                    # 处理两种可能的格式：简单的数字权重或包含权重和参数的对象
+                    if isinstance(rule_config, (int, float)):
+                        weight = rule_config
+                    else:
+                        weight = rule_config.get("weight", 1.0)
+                    
+                    scheme_rule_hyperedge.add_rule(rules_dict[rule_id], weight)
         
         # 计算规则-要素超边
         rule_element_hyperedges = []
         
-        # 获取所有要素
-        elements_by_type = await self.get_all_elements_async()
-        all_elements = []
-        for element_list in elements_by_type.values():
-            all_elements.extend(element_list)
+        # 获取所有要素，先读取要素版本（见 evaluate_scheme_weights）
+        elements_version = await self._elements_version()
+        all_elements, element_positions = await self._evaluation_elements(elements_version)
+        record_elements_scanned(len(all_elements))
         
         # 对每个规则，计算其影响的要素
-        for rule_id, rule_config in scheme.rule_weights.items():
+        for index, (rule_id, rule_config) in enumerate(scheme.rule_weights.items()):
+            if progress:
+                progress(index, len(scheme.rule_weights))
             if rule_id not in rules_dict:
                 continue
             
             rule_data = rules_dict[rule_id]
             
-            # 获取权重和参数
-            weight = rule_config if isinstance(rule_config, (int, float)) else rule_config.get("weight", 1.0)
+            # 获取参数
             parameter_values = {} if isinstance(rule_config, (int, float)) else rule_config.get("parameters", {})
             
-            # 创建规则函数
-            rule_function = None
-            if "code" in rule_data and rule_data["code"]:
-                try:
-                    rule_function = self.create_rule_function(rule_data["code"])
-                except Exception as e:
-                    print(f"编译规则 {rule_id} 代码失败: {e}")
-                    continue
-            
-            # 创建规则对象
-            rule = Rule(
-                name=rule_data["name"],
-                rule_function=rule_function,
-                weight=rule_data.get("weight", 1.0),
-                affected_element_keys=rule_data.get("affected_element_keys", []),
-                affected_element_types=rule_data.get("affected_element_types", []),
-                description=rule_data.get("description", ""),
-                code=rule_data.get("code", ""),
-                parameters=rule_data.get("parameters", {})  # 默认参数
-            )
+            # 获取规则得分列，只修改了某个规则的参数时其余规则的列直接复用
+            column = await self._rule_column(rule_data, all_elements, parameter_values, elements_version,
+                                             source="scheme_details")
+            if column is None:
+                continue
             
             # 创建规则-要素超边
-            hyperedge = RuleElementHyperedge(rule_id, rule_data["name"])
-            
-            # 对每个要素，检查是否满足规则
-            matched_elements = 0
-            for element in all_elements:
-                # 应用规则，传入参数值
-                rule_score = rule.apply(element, parameter_values)
+            with span("hyperedge.build", rule_id=rule_id):
+                hyperedge = self._column_hyperedge(rule_id, rule_data["name"], column, all_elements, element_positions)
                 
-                # 如果得分大于0，则要素满足规则
-                if rule_score > 0:
-                    hyperedge.add_element(element, rule_score)
-                    matched_elements += 1
-            
-            if matched_elements > 0:
-                rule_element_hyperedges.append(hyperedge.to_dict())
+                if hyperedge.elements:
+                    rule_element_hyperedges.append(hyperedge.to_dict())
+        
+        if progress:
+            progress(len(scheme.rule_weights), len(scheme.rule_weights))
         
         # 返回方案数据
         return {
@@ -853,105 +1313,502 @@ def rule_function(attrs, params):
             "rule_element_hyperedges": rule_element_hyperedges
         }
 
+    async def _analytics_schemes(self) -> List[Dict[str, Any]]:
+        """数据库中的方案及内存中的独立方案"""
+        schemes = {scheme["id"]: scheme for scheme in await self.get_all_schemes_async()}
+        for scheme in getattr(self, "standalone_schemes", {}).values():
+            schemes.setdefault(scheme.id, scheme.to_dict())
+        return list(schemes.values())
+
+    async def _incidence_graph(self) -> IncidenceGraph:
+        """要素层-规则层-方案层的关联表示，要素版本、规则代码与默认参数、方案使用的规则都未变化时复用
+
+        规则在要素上的超边取默认参数下的得分列，与 calculate_rule_element_hyperedges 一致。
+        """
+        elements_version = await self._elements_version()
+        rules = await self.get_all_rules_async()
+        schemes = await self._analytics_schemes()
+        key = (
+            elements_version,
+            tuple((rule["id"], rule_code_version(rule), canonical_parameters(rule.get("parameters", {})))
+                  for rule in rules),
+            tuple((scheme["id"], tuple(scheme.get("rule_weights") or ())) for scheme in schemes)
+        )
+        if self._incidence_graph_cache is not None and self._incidence_graph_cache[0] == key:
+            record_cache_lookup("incidence_graph", True)
+            return self._incidence_graph_cache[1]
+        record_cache_lookup("incidence_graph", False)
+        
+        all_elements, element_positions = await self._evaluation_elements(elements_version)
+        rule_elements = []
+        for rule_data in rules:
+            column = await self._rule_column(rule_data, all_elements, {}, elements_version, source="analytics")
+            rule_elements.append(column.bits(element_positions, len(all_elements)) if column is not None else 0)
+        with span("analytics.build", elements=len(all_elements), rules=len(rules), schemes=len(schemes)):
+            graph = await evaluation_executor.run(
+                IncidenceGraph,
+                [element["id"] for element in all_elements], [element["type"] for element in all_elements],
+                rules, rule_elements, schemes
+            )
+        self._incidence_graph_cache = (key, graph)
+        return graph
+
+    async def get_components_async(self, s: int = 1, element_limit: int = 100) -> Dict[str, Any]:
+        """三层结构的 s-连通分量"""
+        graph = await self._incidence_graph()
+        with span("analytics.components", s=s):
+            return await evaluation_executor.run(graph.s_components, s, element_limit)
+
+    async def get_overlaps_async(self, layer: str, node_ids: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+        """规则或方案两两之间共享的要素数，不指定时比较该层全部节点；有节点不存在时返回 None"""
+        graph = await self._incidence_graph()
+        if node_ids is None:
+            indices = list(range(len(graph.rule_ids if layer == LAYER_RULE else graph.scheme_ids)))
+        else:
+            indices = [graph.position(layer, node_id) for node_id in node_ids]
+            if None in indices:
+                return None
+        with span("analytics.overlaps", nodes=len(indices)):
+            return await evaluation_executor.run(graph.overlaps, layer, indices)
+
+    async def get_neighborhood_async(self, layer: str, node_id: str, k: int = 1, limit: int = 100) -> Optional[Dict[str, Any]]:
+        """节点跨层的 k 跳邻域，节点不存在时返回 None"""
+        graph = await self._incidence_graph()
+        index = graph.position(layer, node_id)
+        if index is None:
+            return None
+        with span("analytics.neighborhood", k=k):
+            return await evaluation_executor.run(graph.neighborhood, layer, index, k, limit)
+
+    async def get_hyperpath_async(self, source_layer: str, source_id: str,
+                                  target_layer: str, target_id: str) -> Optional[Dict[str, Any]]:
+        """两个节点之间的最短超路径，节点不存在时返回 None，不连通时 path 为 None"""
+        graph = await self._incidence_graph()
+        source = graph.position(source_layer, source_id)
+        target = graph.position(target_layer, target_id)
+        if source is None or target is None:
+            return None
+        with span("analytics.path"):
+            path = await evaluation_executor.run(graph.shortest_path, source_layer, source, target_layer, target)
+        return {
+            "source": {"layer": source_layer, "id": source_id},
+            "target": {"layer": target_layer, "id": target_id},
+            "length": len(path) - 1 if path is not None else None,
+            "path": path
+        }
+
+    async def get_impact_async(self, layer: str, node_id: str, limit: int = 100) -> Optional[Dict[str, Any]]:
+        """节点变化时受影响的规则和方案，节点不存在时返回 None"""
+        graph = await self._incidence_graph()
+        index = graph.position(layer, node_id)
+        if index is None:
+            return None
+        with span("analytics.impact"):
+            return await evaluation_executor.run(graph.impact, layer, index, limit)
+
+    @staticmethod
+    def scheme_from_data(scheme_data: Dict[str, Any]) -> Scheme:
+        """根据数据库中的方案数据创建方案对象，保留原有ID"""
+        scheme = Scheme(scheme_data["name"], scheme_data.get("description", ""), scheme_data.get("rule_weights", {}))
+        scheme.id = scheme_data["id"]
+        if scheme_data.get("created_at"):
+            scheme.created_at = scheme_data["created_at"]
+        return scheme
+
     async def create_scheme_standalone(self, name: str, description: str = "", rule_weights: Dict[str, Any] = None) -> Dict[str, Any]:
         """创建独立的方案，不关联到特定超图"""
         # 创建方案对象
         scheme = Scheme(name, description, rule_weights)
         
         # 将方案存储到数据库
-        scheme_data = scheme.to_dict()
-        await DatabaseService.create_scheme(scheme_data)
-        return await self.generate_scheme_details(scheme)
-        
+        scheme_data = await DatabaseService.create_scheme(scheme.to_dict())
         
+        # 创建接口需要直接返回方案详情，因此在请求内计算一次，并保存为快照供后续读取
+        snapshot = await self._refresh_scheme_snapshot(scheme_data)
+        return snapshot["result"]
 
-    async def evaluate_scheme_standalone(self, scheme_id: str) -> Dict[str, Any]:
-        """评估独立的方案，不关联到特定超图"""
+    async def evaluate_scheme_standalone(self, scheme_id: str, progress: Callable[[int, int], None] = None) -> Dict[str, Any]:
+        """评估独立的方案，不关联到特定超图，progress 的含义同 calculate_rule_element_hyperedges"""
         if not hasattr(self, 'standalone_schemes'):
             self.standalone_schemes = {}
         
         scheme = self.standalone_schemes.get(scheme_id)
+        if not scheme:
+            # 不在内存中的方案从数据库读取
+            scheme_data = await self.get_scheme_by_id_async(scheme_id)
+            if scheme_data:
+                scheme = self.scheme_from_data(scheme_data)
         if not scheme:
             return {"error": f"方案 {scheme_id} 不存在"}
         
+        return await self.evaluate_scheme_weights(scheme, progress)
+
+    async def evaluate_scheme_weights(self, scheme: Scheme, progress: Callable[[int, int], None] = None,
+                                      top: Optional[int] = None) -> Dict[str, Any]:
+        """按方案的规则权重评估全部要素
+        
+        每个规则的未加权得分列按 (规则, 代码版本, 参数) 缓存，只修改权重时不会重新应用规则，
+        只需把缓存的列按新权重加权求和。指定 top 时只返回得分最高的 top 个要素（按得分降序），
+        并在结果中附带 selected_count。
+        """
+        # 先读取要素版本，再读取要素：读取期间发生的写入只会让缓存的列被误判为过期
+        elements_version = await self._elements_version()
+        
         # 获取所有要素
-        elements_by_type = await self.get_all_elements_async()
-        all_elements = []
-        for element_list in elements_by_type.values():
-            all_elements.extend(element_list)
+        all_elements, element_positions = await self._evaluation_elements(elements_version)
+        record_elements_scanned(len(all_elements))
         
         # 获取所有规则
         rules = await self.get_all_rules_async()
         rules_dict = {rule["id"]: rule for rule in rules}
         
-        # 评估结果
-        selected_elements = []
-        total_score = 0.0
-        
         # 获取方案使用的规则及其权重
         rule_weights = scheme.rule_weights
         
-        for element in all_elements:
-            element_score = 0.0
-            element_rule_scores = {}
+        columns = []
+        candidates = 0
+        for index, (rule_id, rule_config) in enumerate(rule_weights.items()):
+            if progress:
+                progress(index, len(rule_weights))
+            if rule_id not in rules_dict:
+                continue
             
-            # 对每个规则进行评估
-            for rule_id, rule_config in rule_weights.items():
-                if rule_id not in rules_dict:
-                    continue
-                    
-                rule_data = rules_dict[rule_id]
-                
-                # 获取权重和参数
-                weight = rule_config if isinstance(rule_config, (int, float)) else rule_config.get("weight", 1.0)
-                parameter_values = {} if isinstance(rule_config, (int, float)) else rule_config.get("parameters", {})
-                
-                # 创建规则函数
-                rule_function = None
-                if "code" in rule_data and rule_data["code"]:
-                    try:
-                        rule_function = self.create_rule_function(rule_data["code"])
-                    except Exception as e:
-                        print(f"编译规则 {rule_id} 代码失败: {e}")
-                        continue
-                
-                # 创建规则对象
-                rule = Rule(
-                    name=rule_data["name"],
-                    rule_function=rule_function,
-                    weight=rule_data.get("weight", 1.0),
-                    affected_element_keys=rule_data.get("affected_element_keys", []),
-                    affected_element_types=rule_data.get("affected_element_types", []),
-                    description=rule_data.get("description", ""),
-                    code=rule_data.get("code", ""),
-                    parameters=rule_data.get("parameters", {})  # 默认参数
-                )
-                
-                # 应用规则，传入参数值
-                rule_score = rule.apply(element, parameter_values)
-                if rule_score > 0:
-                    # 应用权重
-                    weighted_score = rule_score * weight
-                    element_score += weighted_score
-                    element_rule_scores[rule_id] = weighted_score
+            # 获取权重和参数
+            weight = rule_config if isinstance(rule_config, (int, float)) else rule_config.get("weight", 1.0)
+            parameter_values = {} if isinstance(rule_config, (int, float)) else rule_config.get("parameters", {})
             
-            if element_score > 0:
-                # 创建要素的副本，添加得分信息
-                element_copy = element.copy()
-                element_copy["score"] = element_score
-                element_copy["rule_scores"] = element_rule_scores
-                
-                selected_elements.append(element_copy)
-                total_score += element_score
+            column = await self._rule_column(rules_dict[rule_id], all_elements, parameter_values, elements_version,
+                                             source="scheme_evaluation")
+            if column is None:
+                continue
+            columns.append((rule_id, weight, column))
+            candidates |= column.bits(element_positions, len(all_elements))
+        
+        # 只有至少被一个规则匹配的要素（各列位集的并集）可能得分大于0，只为它们记录得分
+        # element_rule_scores[i] 为第 i 个要素在各规则上的加权得分，按要素下标升序
+        element_rule_scores: Dict[int, Dict[str, float]] = {position: {} for position in bit_indices(candidates)}
+        for rule_id, weight, column in columns:
+            # 应用权重
+            for element_id, rule_score in zip(column.element_ids, column.scores):
+                position = element_positions.get(element_id)
+                if position is not None:
+                    element_rule_scores[position][rule_id] = rule_score * weight
+        
+        # 汇总各要素得分
+        selected_elements, total_score, selected_count = await evaluation_executor.run(
+            self._select_elements, all_elements, element_rule_scores, top
+        )
+        if progress:
+            progress(len(rule_weights), len(rule_weights))
         
         # 返回评估结果
-        return {
+        result = {
             "scheme_id": scheme.id,
             "scheme_name": scheme.name,
             "scheme_description": scheme.description,
             "scheme_score": total_score,
             "selected_elements": selected_elements
         }
+        if top is not None:
+            result["selected_count"] = selected_count
+        return result
+
+    async def query_elements_async(self, expression: Any, parameters: Dict[str, Dict[str, Any]] = None,
+                                   offset: int = 0, limit: int = 100) -> Dict[str, Any]:
+        """按规则组合表达式筛选要素，返回满足条件的要素总数和按要素顺序分页的要素
+
+        表达式由规则ID或名称及 AND/OR/NOT 组成（格式见 parse_rule_query），每个规则项取规则在给定参数下
+        得分大于0的要素集合，集合运算在得分列的位集上完成。已缓存的得分列优先参与运算，
+        与运算结果为空后其余规则不再计算。表达式不合法时抛出 ValueError。
+        """
+        elements_version = await self._elements_version()
+        rules = await self.get_all_rules_async()
+        references = {rule["name"]: rule for rule in rules if rule.get("name")}
+        references.update({rule["id"]: rule for rule in rules})
+        node = parse_rule_query(expression, references, parameters)
+        
+        all_elements, element_positions = await self._evaluation_elements(elements_version)
+        size = len(all_elements)
+        
+        def cost(term: RuleTerm) -> tuple:
+            rule_data = term.rule
+            parameters_key = canonical_parameters(rule_data.get("parameters", {}), term.parameters)
+            column = evaluation_cache.peek(rule_data["id"], rule_code_version(rule_data), parameters_key, elements_version)
+            if column is not None:
+                return 0, popcount(column.bits(element_positions, size))
+            scanned = len(self._rule_partition(rule_data, all_elements))
+            return scanned, scanned
+        
+        async def bits(term: RuleTerm) -> int:
+            column = await self._rule_column(term.rule, all_elements, term.parameters, elements_version,
+                                             source="rule_query")
+            return column.bits(element_positions, size) if column is not None else 0
+        
+        evaluator = RuleQueryEvaluator(size, cost, bits)
+        with span("rule_query.evaluate", elements=size):
+            matched = await evaluator.evaluate(node)
+        positions = bit_indices(matched)
+        return {
+            "total": len(positions),
+            "offset": offset,
+            "limit": limit,
+            "elements": [all_elements[position].copy() for position in positions[offset:offset + limit]],
+            "plan": evaluator.steps,
+            "skipped_rules": evaluator.skipped
+        }
+
+    async def _evaluation_elements(self, elements_version: int) -> tuple:
+        """获取评估用的全部要素（只读）及 要素ID -> 下标 的映射，要素版本未变化时复用上次读取的结果
+
+        要素按类型连续存放，同时记录每个类型的下标范围，供 _rule_partition 只扫描规则影响的类型。
+        """
+        store = self._evaluation_elements_cache
+        if store is not None and store.version == elements_version:
+            record_cache_lookup("elements", True)
+            return store.elements, store.positions
+        record_cache_lookup("elements", False)
+        
+        if shared_element_store.enabled and not shared_element_store.is_leader:
+            # 共享模式下优先挂载发布者写入的要素，比发布版本更新的写入由本进程增量同步
+            shared = await self._attach_shared_elements(None if store is None else store.version)
+            if shared is not None:
+                store = shared
+        if store is None:
+            store = await self._load_element_snapshot()
+        if store is None:
+            store = ElementStore(elements_version, await self.get_all_elements_async())
+        elif store.version != elements_version:
+            store = await self._catch_up_elements(store, elements_version)
+        self._evaluation_elements_cache = store
+        self._schedule_element_snapshot(store)
+        return store.elements, store.positions
+
+    async def warm_up_elements_async(self) -> int:
+        """预先加载评估用的要素，返回要素数"""
+        if shared_element_store.enabled and not shared_element_store.is_leader:
+            # 等待发布者写入共享内存，避免每个工作进程都从数据库加载全部要素
+            await shared_element_store.wait_published(SHARED_STORE_WAIT)
+        elements, _ = await self._evaluation_elements(await self._elements_version())
+        return len(elements)
+
+    async def compile_rules_async(self) -> int:
+        """预先编译全部规则代码，返回编译成功的规则数"""
+        rules = await self.get_all_rules_async()
+        return len(self._compile_rules(rules))
+
+    async def _catch_up_elements(self, store: ElementStore, elements_version: int) -> ElementStore:
+        """按 updated_at 只读取上次同步之后写入的要素，合并到已有要素中
+
+        删除不会留下 updated_at，合并后数量与数据库不一致时再按ID核对一次。
+        updated_at 由写入进程的本地时钟生成，提交较慢或时钟偏差时修改可能落在同步窗口之前；
+        每次写入至少修改或删除一个要素，实际变化的要素数少于版本前进的次数时改为完整重新加载。
+        """
+        since = store.watermark - timedelta(seconds=SNAPSHOT_CATCHUP_MARGIN) if store.watermark else None
+        with span("elements.catch_up") as current:
+            changed = await DatabaseService.get_elements_updated_since(since)
+            total = await DatabaseService.count_elements()
+            deleted: List[str] = []
+            updated = store.apply_delta(elements_version, changed)
+            if len(updated) != total:
+                element_ids = set(await DatabaseService.get_element_ids())
+                deleted = [element_id for element_id in updated.positions if element_id not in element_ids]
+                missing = [element_id for element_id in element_ids if element_id not in updated.positions]
+                added = await DatabaseService.get_elements_by_ids(missing) if missing else []
+                changed = changed + added
+                updated = store.apply_delta(elements_version, changed, deleted)
+            # 同步窗口与上次同步有重叠，只统计与已有内容不同的要素
+            effective = 0
+            for element in changed:
+                position = store.positions.get(element["id"])
+                if position is None or store.elements[position] != element:
+                    effective += 1
+            if current is not None:
+                current.set_attribute("changed", effective)
+            if effective + len(deleted) < elements_version - store.version:
+                print(f"要素版本前进 {elements_version - store.version} 次，只同步到 {effective + len(deleted)} 个变化，重新加载全部要素")
+                updated = ElementStore(elements_version, await self.get_all_elements_async())
+                if current is not None:
+                    current.set_attribute("reloaded", True)
+        return updated
+
+    async def _load_element_snapshot(self) -> Optional[ElementStore]:
+        """从快照文件加载要素，规则版本一致时同时加载规则；没有可用快照时返回 None"""
+        if not SNAPSHOT_PATH or not os.path.exists(SNAPSHOT_PATH):
+            return None
+        try:
+            with span("elements.snapshot_load") as current:
+                snapshot = ElementSnapshot(SNAPSHOT_PATH)
+                try:
+                    store = await evaluation_executor.run(snapshot.load_store)
+                    rules, compiled = snapshot.load_rules()
+                    rules_version = snapshot.rules_version
+                finally:
+                    snapshot.close()
+                if current is not None:
+                    current.set_attribute("elements", len(store))
+        except (OSError, SnapshotError, ValueError, KeyError) as e:
+            print(f"加载要素快照失败，从数据库读取: {e}")
+            return None
+        
+        self._compiled_rules.update(compiled)
+        data_versions = await DatabaseService.get_data_versions()
+        if data_versions["rules"] == rules_version and self._rules_cache is None:
+            self._rules_cache = rules
+            self._rules_cache_version = rules_version
+        self._element_snapshot_version = store.version
+        return store
+
+    async def _attach_shared_elements(self, newer_than: Optional[int]) -> Optional[ElementStore]:
+        """挂载共享内存中比 newer_than 更新的要素，规则版本一致时同时使用其中的规则"""
+        try:
+            with span("elements.shared_attach") as current:
+                store = shared_element_store.attach(newer_than)
+                if store is None:
+                    return None
+                rules, compiled = store.load_rules()
+                if current is not None:
+                    current.set_attribute("elements", len(store))
+        except (OSError, SnapshotError, ValueError, KeyError) as e:
+            print(f"挂载共享要素失败: {e}")
+            return None
+        
+        self._compiled_rules.update(compiled)
+        data_versions = await DatabaseService.get_data_versions()
+        if data_versions["rules"] == store.rules_version and self._rules_cache is None:
+            self._rules_cache = rules
+            self._rules_cache_version = store.rules_version
+        return store
+
+    async def publish_shared_elements(self) -> None:
+        """作为共享要素的发布者，要素版本变化后把最新要素和规则写入共享内存"""
+        elements_version = await self._elements_version()
+        if shared_element_store.published_version() == elements_version:
+            return
+        await self._evaluation_elements(elements_version)
+        store = self._evaluation_elements_cache
+        rules_version = (await DatabaseService.get_data_versions())["rules"]
+        rules = await DatabaseService.get_all_rules()
+        compiled = self._compile_rules(rules)
+        storages = await self._element_storages(store)
+        with span("elements.shared_publish", elements=len(store)):
+            loop = asyncio.get_running_loop()
+            size = await loop.run_in_executor(None, shared_element_store.publish, store, rules_version, rules, compiled, storages)
+        print(f"已发布共享要素: 版本 {store.version}, {len(store)} 个要素, {size} 字节")
+
+    async def _element_storages(self, store: ElementStore) -> Optional[Dict[str, Dict[str, str]]]:
+        """按推断的要素结构选择快照中各属性列的存储类型，结构不是该要素版本时先重新推断"""
+        if not schema_registry.is_current(store.version):
+            with span("schema.infer", elements=len(store)):
+                await evaluation_executor.run(schema_registry.rebuild, store.version, store.elements)
+        return schema_registry.storages(store.version)
+
+    def _compile_rules(self, rules: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """编译规则代码，返回 规则代码 -> 代码对象"""
+        for rule in rules:
+            if rule.get("code"):
+                self.create_rule_function(rule["code"])
+        return {rule["code"]: self._compiled_rules[rule["code"]] for rule in rules
+                if rule.get("code") in self._compiled_rules}
+
+    def _schedule_element_snapshot(self, store: ElementStore) -> None:
+        """要素版本比上次写入的快照前进足够多时，在后台重写快照；共享模式下只由发布者写入"""
+        if not SNAPSHOT_PATH:
+            return
+        if shared_element_store.enabled and not shared_element_store.is_leader:
+            return
+        if self._element_snapshot_task is not None and not self._element_snapshot_task.done():
+            return
+        if (self._element_snapshot_version is not None
+                and store.version - self._element_snapshot_version < SNAPSHOT_REWRITE_VERSIONS):
+            return
+        self._element_snapshot_version = store.version
+        self._element_snapshot_task = asyncio.create_task(self._write_element_snapshot(store))
+
+    async def _write_element_snapshot(self, store: ElementStore) -> None:
+        try:
+            # 先读规则版本再读规则：读取期间的规则写入只会让快照中的规则被判定为过期
+            rules_version = (await DatabaseService.get_data_versions())["rules"]
+            rules = await DatabaseService.get_all_rules()
+            compiled = self._compile_rules(rules)
+            storages = await self._element_storages(store)
+            loop = asyncio.get_running_loop()
+            size = await loop.run_in_executor(None, write_snapshot, SNAPSHOT_PATH, store, rules_version, rules, compiled, storages)
+            print(f"已写入要素快照 {SNAPSHOT_PATH}: {len(store)} 个要素, {size} 字节")
+        except Exception as e:
+            print(f"写入要素快照失败: {e}")
+
+    def _rule_partition(self, rule_data: Dict[str, Any], elements: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """规则限定了影响的要素类型时，只取这些类型的分区，保持要素原有顺序
+
+        其他类型的要素在 Rule.apply 中必然得0分，不需要逐个应用规则。
+        """
+        affected_types = rule_data.get("affected_element_types")
+        store = self._evaluation_elements_cache
+        if not affected_types or store is None or store.elements is not elements:
+            return elements
+        ranges = sorted(store.type_ranges[element_type] for element_type in set(affected_types)
+                        if element_type in store.type_ranges)
+        partition = []
+        for start, end in ranges:
+            partition.extend(elements[start:end])
+        return partition
+
+    async def _elements_version(self) -> int:
+        """规则得分列依赖的要素版本；规则本身的变化由列缓存键中的代码版本和参数体现"""
+        data_versions = await DatabaseService.get_data_versions()
+        return data_versions["elements"]
+
+    async def _rule_column(self, rule_data: Dict[str, Any], elements: List[Dict[str, Any]],
+                           parameter_values: Dict[str, Any], elements_version: int,
+                           source: str = "") -> Optional[RuleColumn]:
+        """获取规则在给定参数下的未加权得分列，缓存未命中时扫描全部要素"""
+        rule_id = rule_data["id"]
+        code_version = rule_code_version(rule_data)
+        parameters_key = canonical_parameters(rule_data.get("parameters", {}), parameter_values)
+        column = evaluation_cache.get(rule_id, code_version, parameters_key, elements_version)
+        if column is not None:
+            return column
+        
+        rule = self._build_rule(rule_id, rule_data)
+        if rule is None:
+            return None
+        matches = await self._scan_rule(rule, self._rule_partition(rule_data, elements), parameter_values, source=source)
+        return evaluation_cache.put(
+            rule_id, code_version, parameters_key, elements_version,
+            [element["id"] for element, _ in matches],
+            [score for _, score in matches]
+        )
+
+    @staticmethod
+    def _select_elements(elements: List[Dict[str, Any]], element_rule_scores: Dict[int, Dict[str, float]],
+                         top: Optional[int] = None) -> tuple:
+        """汇总要素在各规则上的加权得分
+
+        返回 (得分大于0的要素副本列表, 总得分, 得分大于0的要素数)；指定 top 时只复制得分最高的 top 个要素。
+        """
+        scored = []
+        total_score = 0.0
+        
+        for index, rule_scores in element_rule_scores.items():
+            element_score = sum(rule_scores.values())
+            if element_score > 0:
+                scored.append((element_score, index))
+                total_score += element_score
+        
+        if top is not None:
+            scored_selected = heapq.nlargest(top, scored, key=lambda item: item[0])
+        else:
+            scored_selected = scored
+        
+        selected_elements = []
+        for element_score, index in scored_selected:
+            # 创建要素的副本，添加得分信息
+            element_copy = elements[index].copy()
+            element_copy["score"] = element_score
+            element_copy["rule_scores"] = element_rule_scores[index]
+            selected_elements.append(element_copy)
+        
+        return selected_elements, total_score, len(scored)
 
     async def get_all_schemes_async(self) -> List[Dict[str, Any]]:
         """异步获取所有方案"""
@@ -962,9 +1819,93 @@ def rule_function(attrs, params):
         return await DatabaseService.get_scheme_by_id(scheme_id)
 
     async def update_scheme_async(self, scheme_id: str, update_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-        """异步更新方案"""
-        return await DatabaseService.update_scheme(scheme_id, update_data)
+        """异步更新方案，并在后台重新计算结果快照"""
+        scheme_data = await DatabaseService.update_scheme(scheme_id, update_data)
+        if scheme_data:
+            self.schedule_scheme_snapshot(scheme_data)
+        return scheme_data
 
     async def delete_scheme_async(self, scheme_id: str) -> bool:
         """异步删除方案"""
-        return await DatabaseService.delete_scheme(scheme_id) 
\ No newline at end of file
+        self._scheme_snapshots.pop(scheme_id, None)
+        task = self._snapshot_tasks.pop(scheme_id, None)
+        if task is not None:
+            task.cancel()
+        return await DatabaseService.delete_scheme(scheme_id)
+
+    # 方案结果快照
+    # 快照记录计算时的方案版本、要素版本和规则版本，三者都未变化时直接返回快照中的结果
+
+    async def _current_versions(self, scheme_data: Dict[str, Any]) -> Dict[str, int]:
+        data_versions = await DatabaseService.get_data_versions()
+        return {"scheme": scheme_data.get("version", 0), **data_versions}
+
+    async def _refresh_scheme_snapshot(self, scheme_data: Dict[str, Any], progress: Callable[[int, int], None] = None) -> Dict[str, Any]:
+        """重新计算方案详情并保存快照
+
+        版本号在计算之前读取：计算期间发生的写入会使快照版本落后，下次读取时再重新计算。
+        """
+        versions = await self._current_versions(scheme_data)
+        result = await self.generate_scheme_details(self.scheme_from_data(scheme_data), progress)
+        snapshot = {
+            "scheme_id": scheme_data["id"],
+            "versions": versions,
+            "computed_at": datetime.now(),
+            "result": result
+        }
+        self._scheme_snapshots[scheme_data["id"]] = snapshot
+        await DatabaseService.save_scheme_snapshot(snapshot)
+        return snapshot
+
+    def schedule_scheme_snapshot(self, scheme_data: Dict[str, Any]) -> asyncio.Task:
+        """在后台刷新方案快照；同一方案已有刷新任务时取消旧任务"""
+        scheme_id = scheme_data["id"]
+        previous = self._snapshot_tasks.get(scheme_id)
+        if previous is not None and not previous.done():
+            previous.cancel()
+        
+        task = asyncio.create_task(self._refresh_scheme_snapshot(scheme_data))
+        self._snapshot_tasks[scheme_id] = task
+        
+        def done(finished: asyncio.Task) -> None:
+            if self._snapshot_tasks.get(scheme_id) is finished:
+                del self._snapshot_tasks[scheme_id]
+            if not finished.cancelled() and finished.exception() is not None:
+                print(f"刷新方案 {scheme_id} 的结果快照失败: {finished.exception()}")
+        
+        task.add_done_callback(done)
+        return task
+
+    async def get_scheme_snapshot_async(self, scheme_id: str) -> Optional[Dict[str, Any]]:
+        """获取方案的结果快照：快照未过期时直接返回，否则重新计算；方案详情在快照的 result 中"""
+        with span("scheme.fetch", scheme_id=scheme_id):
+            scheme_data = await self.get_scheme_by_id_async(scheme_id)
+            if not scheme_data:
+                return None
+            versions = await self._current_versions(scheme_data)
+            snapshot = self._scheme_snapshots.get(scheme_id)
+            if snapshot is None or snapshot["versions"] != versions:
+                # 其他进程可能已经保存了更新的快照
+                snapshot = await DatabaseService.get_scheme_snapshot(scheme_id) or snapshot
+        
+        if snapshot is not None and snapshot["versions"] == versions:
+            record_cache_lookup("scheme_snapshots", True)
+            self._scheme_snapshots[scheme_id] = snapshot
+            return snapshot
+        record_cache_lookup("scheme_snapshots", False)
+        
+        # 后台刷新仍在进行时等待其完成，避免重复计算
+        task = self._snapshot_tasks.get(scheme_id)
+        if task is not None and not task.done():
+            try:
+                snapshot = await asyncio.shield(task)
+                if snapshot["versions"] == versions:
+                    return snapshot
+            except asyncio.CancelledError:
+                # 刷新任务被更新的刷新取消时重新计算，否则是当前请求被取消
+                if not task.cancelled():
+                    raise
+            except Exception:
+                pass
+        
+        return await self._refresh_scheme_snapshot(scheme_data) 
\ No newline at end of file
@@ -0,0 +1,124 @@
+from typing import Dict, Any, Optional
+from contextvars import ContextVar
+from services.metrics import registry
+import asyncio
+import time
+
+# HTTP 请求指标
+HTTP_REQUESTS = registry.counter(
+    "hypergraph_http_requests_total",
+    "按路由统计的HTTP请求数",
+    ("method", "route", "status")
+)
+HTTP_REQUEST_DURATION = registry.histogram(
+    "hypergraph_http_request_duration_seconds",
+    "按路由统计的HTTP请求耗时",
+    ("method", "route")
+)
+
+# 规则评估指标
+RULE_EVALUATIONS = registry.counter(
+    "hypergraph_rule_evaluations_total",
+    "规则对要素的评估次数"
+)
+ELEMENTS_SCANNED = registry.histogram(
+    "hypergraph_elements_scanned",
+    "每个请求在规则评估中扫描的要素数",
+    ("route",),
+    buckets=(10, 100, 1000, 10000, 100000, 1000000, 10000000)
+)
+
+# 缓存指标
+CACHE_REQUESTS = registry.counter(
+    "hypergraph_cache_requests_total",
+    "缓存查询次数",
+    ("cache", "result")
+)
+CACHE_HIT_RATIO = registry.gauge(
+    "hypergraph_cache_hit_ratio",
+    "缓存累计命中率",
+    ("cache",)
+)
+
+# 事件循环指标
+EVENT_LOOP_LAG = registry.gauge(
+    "hypergraph_event_loop_lag_seconds",
+    "最近一次测得的事件循环延迟"
+)
+EVENT_LOOP_LAG_HISTOGRAM = registry.histogram(
+    "hypergraph_event_loop_lag_distribution_seconds",
+    "事件循环延迟分布"
+)
+
+# 当前请求的统计信息，由中间件为每个请求创建
+_request_stats: ContextVar[Optional[Dict[str, int]]] = ContextVar("request_stats", default=None)
+
+def record_rule_evaluations(count: int) -> None:
+    """记录规则评估次数"""
+    if count:
+        RULE_EVALUATIONS.inc(count)
+
+def record_elements_scanned(count: int) -> None:
+    """记录当前请求扫描的要素数"""
+    stats = _request_stats.get()
+    if stats is not None:
+        stats["elements_scanned"] += count
+
+def record_cache_lookup(cache: str, hit: bool) -> None:
+    """记录一次缓存查询并更新命中率"""
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
+    hits = CACHE_REQUESTS.labels(cache, "hit").value
+    misses = CACHE_REQUESTS.labels(cache, "miss").value
+    CACHE_HIT_RATIO.labels(cache).set(hits / (hits + misses))
+
+def _route_name(scope: Dict[str, Any]) -> str:
+    """取路由模板作为标签，避免路径参数导致标签数量膨胀"""
+    route = scope.get("route")
+    if route is not None:
+        return getattr(route, "path", "unmatched")
+    return "unmatched"
+
+class RequestMetricsMiddleware:
+    """记录每个路由的请求数、耗时和扫描的要素数
+
+    直接实现 ASGI 接口，不经过 BaseHTTPMiddleware，请求路径上的开销很小。
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = {"elements_scanned": 0}
+        token = _request_stats.set(stats)
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - started
+            _request_stats.reset(token)
+            route = _route_name(scope)
+            method = scope.get("method", "")
+            HTTP_REQUESTS.labels(method, route, status["code"]).inc()
+            HTTP_REQUEST_DURATION.labels(method, route).observe(duration)
+            if stats["elements_scanned"]:
+                ELEMENTS_SCANNED.labels(route).observe(stats["elements_scanned"])
+
+async def monitor_event_loop_lag(interval: float = 0.5) -> None:
+    """周期性测量事件循环延迟：实际唤醒时间与预期唤醒时间之差"""
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        lag = max(0.0, loop.time() - started - interval)
+        EVENT_LOOP_LAG.set(lag)
+        EVENT_LOOP_LAG_HISTOGRAM.observe(lag)
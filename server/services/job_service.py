@@ -0,0 +1,236 @@
+from typing import Dict, Any, List, Optional, Callable, Awaitable
+from database import get_database
+from datetime import datetime
+import asyncio
+import logging
+import os
+import time
+import uuid
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 任务配置
+JOB_WORKERS = int(os.getenv("HYPERGRAPH_JOB_WORKERS", "2"))
+JOB_RESULT_TTL = float(os.getenv("HYPERGRAPH_JOB_RESULT_TTL", "600"))  # 结果保留秒数
+JOB_MAX_PENDING = int(os.getenv("HYPERGRAPH_JOB_MAX_PENDING", "100"))
+JOB_PERSIST = os.getenv("HYPERGRAPH_JOB_PERSIST", "0") == "1"  # 是否把任务记录写入 jobs 集合
+
+# 任务状态
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_SUCCEEDED = "succeeded"
+STATUS_FAILED = "failed"
+STATUS_CANCELLED = "cancelled"
+FINISHED_STATUSES = (STATUS_SUCCEEDED, STATUS_FAILED, STATUS_CANCELLED)
+
+# 任务处理函数：接收任务参数和进度回调 progress(已完成, 总数)，返回任务结果
+JobHandler = Callable[[Dict[str, Any], Callable[[int, int], None]], Awaitable[Any]]
+
+class JobQueueFull(Exception):
+    """排队的任务数已达上限"""
+    pass
+
+class Job:
+    """一个后台任务"""
+    def __init__(self, job_type: str, params: Dict[str, Any]):
+        self.id = uuid.uuid4().hex
+        self.type = job_type
+        self.params = params
+        self.status = STATUS_QUEUED
+        self.done = 0
+        self.total = 0
+        self.error: Optional[str] = None
+        self.result: Any = None
+        self.created_at = datetime.now()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self.expires_at: Optional[float] = None  # 结果过期时间（time.time()）
+
+    def set_progress(self, done: int, total: int) -> None:
+        self.done = done
+        self.total = total
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATUSES
+
+    def to_dict(self) -> Dict[str, Any]:
+        """任务记录，不包含结果"""
+        return {
+            "id": self.id,
+            "type": self.type,
+            "params": self.params,
+            "status": self.status,
+            "progress": {
+                "done": self.done,
+                "total": self.total,
+                "ratio": self.done / self.total if self.total else (1.0 if self.status == STATUS_SUCCEEDED else 0.0)
+            },
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "expires_at": datetime.fromtimestamp(self.expires_at) if self.expires_at else None
+        }
+
+class JobManager:
+    """进程内的后台任务队列，由固定数量的 asyncio worker 执行
+
+    任务结果保存在内存中，完成后保留 result_ttl 秒；开启持久化时任务记录（不含结果）
+    同步写入 jobs 集合，进程重启后仍可查询任务最终状态。
+    """
+    def __init__(self, workers: int = JOB_WORKERS, result_ttl: float = JOB_RESULT_TTL,
+                 max_pending: int = JOB_MAX_PENDING, persist: bool = JOB_PERSIST):
+        self.workers = max(1, workers)
+        self.result_ttl = result_ttl
+        self.max_pending = max_pending
+        self.persist = persist
+        self._handlers: Dict[str, JobHandler] = {}
+        self._jobs: Dict[str, Job] = {}
+        self._running: Dict[str, asyncio.Task] = {}
+        self._cancel_requested: set = set()
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._ttl_index_created = False
+
+    def register(self, job_type: str, handler: JobHandler) -> None:
+        """注册任务类型的处理函数"""
+        self._handlers[job_type] = handler
+
+    @property
+    def job_types(self) -> List[str]:
+        return list(self._handlers)
+
+    def start(self) -> None:
+        """启动 worker；首次提交任务时也会自动启动"""
+        if self._workers:
+            return
+        self._queue = asyncio.Queue()
+        self._workers = [asyncio.create_task(self._worker(index)) for index in range(self.workers)]
+        logger.info(f"后台任务队列已启动，worker 数: {self.workers}")
+
+    async def stop(self) -> None:
+        """停止 worker 并取消正在执行的任务"""
+        for task in list(self._running.values()) + self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._queue = None
+
+    async def submit(self, job_type: str, params: Dict[str, Any] = None) -> Job:
+        """提交任务，返回任务对象"""
+        if job_type not in self._handlers:
+            raise ValueError(f"未知的任务类型 {job_type}，可选: {', '.join(self._handlers)}")
+        self.start()
+        self._purge_expired()
+        if self._queue.qsize() >= self.max_pending:
+            raise JobQueueFull(f"排队的任务已达上限 {self.max_pending}")
+
+        job = Job(job_type, params or {})
+        self._jobs[job.id] = job
+        await self._save(job)
+        self._queue.put_nowait(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """获取内存中的任务"""
+        self._purge_expired()
+        return self._jobs.get(job_id)
+
+    async def get_record(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """获取任务记录；内存中没有时从 jobs 集合读取"""
+        job = self.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        if not self.persist:
+            return None
+        record = await get_database().jobs.find_one({"id": job_id}, {"_id": 0})
+        return record
+
+    def list(self) -> List[Dict[str, Any]]:
+        """列出内存中的任务，按创建时间倒序"""
+        self._purge_expired()
+        jobs = sorted(self._jobs.values(), key=lambda job: job.created_at, reverse=True)
+        return [job.to_dict() for job in jobs]
+
+    async def cancel(self, job_id: str) -> Optional[Job]:
+        """取消排队中或执行中的任务；已完成的任务直接删除"""
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        if job.finished:
+            self._jobs.pop(job_id, None)
+            return job
+        if job.status == STATUS_RUNNING and job_id in self._running:
+            self._cancel_requested.add(job_id)
+            self._running[job_id].cancel()
+        else:
+            self._finish(job, STATUS_CANCELLED)
+            await self._save(job)
+        return job
+
+    async def _worker(self, index: int) -> None:
+        while True:
+            job = await self._queue.get()
+            try:
+                if job.status == STATUS_QUEUED:
+                    await self._run(job)
+            except Exception as e:
+                logger.error(f"后台任务 worker {index} 处理任务 {job.id} 出错: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: Job) -> None:
+        job.status = STATUS_RUNNING
+        job.started_at = datetime.now()
+        # 先登记再保存，保存期间到达的 cancel() 取消的是任务本身，不会被之后的结果覆盖
+        task = asyncio.create_task(self._handlers[job.type](job.params, job.set_progress))
+        self._running[job.id] = task
+        try:
+            await self._save(job)
+            job.result = await task
+            self._finish(job, STATUS_SUCCEEDED)
+        except asyncio.CancelledError:
+            self._finish(job, STATUS_CANCELLED)
+            # 通过 cancel() 取消的是任务本身，worker 继续运行；否则是 worker 被停止
+            if job.id not in self._cancel_requested:
+                task.cancel()
+                raise
+        except Exception as e:
+            job.error = f"{type(e).__name__}: {e}"
+            self._finish(job, STATUS_FAILED)
+            logger.warning(f"后台任务 {job.id} ({job.type}) 失败: {job.error}")
+        finally:
+            self._running.pop(job.id, None)
+            self._cancel_requested.discard(job.id)
+        await self._save(job)
+
+    def _finish(self, job: Job, status: str) -> None:
+        job.status = status
+        job.finished_at = datetime.now()
+        job.expires_at = time.time() + self.result_ttl
+
+    def _purge_expired(self) -> None:
+        """移除结果已过期的任务，限制内存占用"""
+        now = time.time()
+        expired = [job_id for job_id, job in self._jobs.items() if job.expires_at is not None and job.expires_at <= now]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    async def _save(self, job: Job) -> None:
+        if not self.persist:
+            return
+        try:
+            db = get_database()
+            if not self._ttl_index_created:
+                # 任务记录在结果过期后由 MongoDB 自动删除
+                await db.jobs.create_index("id", unique=True)
+                await db.jobs.create_index("expires_at", expireAfterSeconds=0)
+                self._ttl_index_created = True
+            await db.jobs.update_one({"id": job.id}, {"$set": job.to_dict()}, upsert=True)
+        except Exception as e:
+            logger.error(f"保存任务记录 {job.id} 失败: {e}")
+
+# 全局任务管理器
+job_manager = JobManager()
@@ -0,0 +1,151 @@
+from typing import Dict, Any, List
+from pymongo import monitoring
+from services.metrics import registry
+import threading
+import time
+
+# MongoDB 命令指标
+COMMAND_DURATION = registry.histogram(
+    "hypergraph_mongo_command_duration_seconds",
+    "MongoDB 命令在服务端往返的耗时",
+    ("collection", "command")
+)
+COMMAND_FAILURES = registry.counter(
+    "hypergraph_mongo_command_failures_total",
+    "执行失败的 MongoDB 命令数",
+    ("collection", "command")
+)
+
+# 连接池指标
+POOL_CHECKOUT_WAIT = registry.histogram(
+    "hypergraph_mongo_pool_checkout_wait_seconds",
+    "从连接池获取连接的等待时间",
+    ("address",)
+)
+POOL_CHECKOUT_FAILURES = registry.counter(
+    "hypergraph_mongo_pool_checkout_failures_total",
+    "从连接池获取连接失败的次数",
+    ("address", "reason")
+)
+POOL_CONNECTIONS_IN_USE = registry.gauge(
+    "hypergraph_mongo_pool_connections_in_use",
+    "当前被借出的连接数",
+    ("address",)
+)
+POOL_CONNECTIONS_OPEN = registry.gauge(
+    "hypergraph_mongo_pool_connections_open",
+    "当前打开的连接数",
+    ("address",)
+)
+POOL_CLEARED = registry.counter(
+    "hypergraph_mongo_pool_cleared_total",
+    "连接池被清空的次数",
+    ("address",)
+)
+
+def _address(address) -> str:
+    """将 (host, port) 转换为标签值"""
+    host, port = address
+    return f"{host}:{port}"
+
+def _collection_name(command: Dict[str, Any], command_name: str) -> str:
+    """从命令文档中取出集合名，管理命令返回空字符串"""
+    if command_name == "getMore":
+        return str(command.get("collection", ""))
+    target = command.get(command_name)
+    return target if isinstance(target, str) else ""
+
+class CommandMetricsListener(monitoring.CommandListener):
+    """记录每个集合、每种命令的耗时与失败次数"""
+    def __init__(self):
+        # (request_id, connection_id) -> 集合名，成功/失败事件中不带命令文档
+        self._collections: Dict[Any, str] = {}
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        key = (event.request_id, event.connection_id)
+        self._collections[key] = _collection_name(event.command, event.command_name)
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        collection = self._collections.pop((event.request_id, event.connection_id), "")
+        COMMAND_DURATION.labels(collection, event.command_name).observe(event.duration_micros / 1e6)
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        collection = self._collections.pop((event.request_id, event.connection_id), "")
+        COMMAND_DURATION.labels(collection, event.command_name).observe(event.duration_micros / 1e6)
+        COMMAND_FAILURES.labels(collection, event.command_name).inc()
+
+class PoolMetricsListener(monitoring.ConnectionPoolListener):
+    """记录连接池的等待时间与连接使用情况
+
+    借出连接的开始与完成事件在同一线程中发布，用线程局部变量关联两者。
+    """
+    def __init__(self):
+        self._local = threading.local()
+
+    def pool_created(self, event) -> None:
+        address = _address(event.address)
+        POOL_CONNECTIONS_IN_USE.labels(address).set(0)
+        POOL_CONNECTIONS_OPEN.labels(address).set(0)
+
+    def pool_ready(self, event) -> None:
+        pass
+
+    def pool_cleared(self, event) -> None:
+        POOL_CLEARED.labels(_address(event.address)).inc()
+
+    def pool_closed(self, event) -> None:
+        address = _address(event.address)
+        POOL_CONNECTIONS_IN_USE.remove(address)
+        POOL_CONNECTIONS_OPEN.remove(address)
+
+    def connection_created(self, event) -> None:
+        POOL_CONNECTIONS_OPEN.labels(_address(event.address)).inc()
+
+    def connection_ready(self, event) -> None:
+        pass
+
+    def connection_closed(self, event) -> None:
+        POOL_CONNECTIONS_OPEN.labels(_address(event.address)).dec()
+
+    def connection_check_out_started(self, event) -> None:
+        self._local.checkout_started = time.perf_counter()
+
+    def connection_check_out_failed(self, event) -> None:
+        self._local.checkout_started = None
+        POOL_CHECKOUT_FAILURES.labels(_address(event.address), event.reason).inc()
+
+    def connection_checked_out(self, event) -> None:
+        address = _address(event.address)
+        started = getattr(self._local, "checkout_started", None)
+        if started is not None:
+            POOL_CHECKOUT_WAIT.labels(address).observe(time.perf_counter() - started)
+            self._local.checkout_started = None
+        POOL_CONNECTIONS_IN_USE.labels(address).inc()
+
+    def connection_checked_in(self, event) -> None:
+        POOL_CONNECTIONS_IN_USE.labels(_address(event.address)).dec()
+
+def create_listeners() -> List[Any]:
+    """创建需要注册到 MongoDB 客户端的事件监听器"""
+    return [CommandMetricsListener(), PoolMetricsListener()]
+
+def snapshot() -> Dict[str, Any]:
+    """以 JSON 形式汇总 MongoDB 命令与连接池指标"""
+    commands = []
+    for labels, child in COMMAND_DURATION.samples():
+        failures = COMMAND_FAILURES.labels(labels["collection"], labels["command"]).value
+        commands.append({**labels, **child.summary(), "failures": int(failures)})
+    commands.sort(key=lambda item: item["sum"], reverse=True)
+
+    pools = {}
+    for labels, child in POOL_CONNECTIONS_OPEN.samples():
+        pools.setdefault(labels["address"], {})["connections_open"] = int(child.value)
+    for labels, child in POOL_CONNECTIONS_IN_USE.samples():
+        pools.setdefault(labels["address"], {})["connections_in_use"] = int(child.value)
+    for labels, child in POOL_CHECKOUT_WAIT.samples():
+        pools.setdefault(labels["address"], {})["checkout_wait"] = child.summary()
+    for labels, child in POOL_CHECKOUT_FAILURES.samples():
+        failures = pools.setdefault(labels["address"], {}).setdefault("checkout_failures", {})
+        failures[labels["reason"]] = int(child.value)
+
+    return {"commands": commands, "pools": pools}
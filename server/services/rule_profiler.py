@@ -0,0 +1,138 @@
+from typing import Dict, Any, List, Optional
+from collections import deque
+import math
+import threading
+import time
+
+# 每个规则保留的最近扫描样本数，用于计算分位数
+SAMPLE_SIZE = 256
+
+def percentile(sorted_values: List[float], q: float) -> Optional[float]:
+    """对已排序的样本取分位数（最近秩法）"""
+    if not sorted_values:
+        return None
+    # 先舍入去掉浮点误差，避免 0.07 * 100 之类的乘积向上取整多出一位
+    index = min(len(sorted_values) - 1, max(0, math.ceil(round(q * len(sorted_values), 9)) - 1))
+    return sorted_values[index]
+
+class RuleProfile:
+    """单个规则的累计开销统计
+
+    统计粒度为一次扫描（规则对一批要素的一次完整应用），扫描内部不逐个计时，
+    避免计时本身成为评估循环的主要开销。
+    """
+    def __init__(self, rule_id: str, rule_name: str):
+        self.rule_id = rule_id
+        self.rule_name = rule_name
+        self.scans = 0
+        self.evaluations = 0
+        self.matches = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.last_error: Optional[str] = None
+        self.last_scan_at: Optional[float] = None
+        self.sources: Dict[str, int] = {}
+        self._scan_seconds = deque(maxlen=SAMPLE_SIZE)
+        self._element_seconds = deque(maxlen=SAMPLE_SIZE)
+
+    def record(self, source: str, evaluations: int, matches: int, errors: int,
+               seconds: float, last_error: Optional[str] = None) -> None:
+        """记录一次扫描"""
+        self.scans += 1
+        self.evaluations += evaluations
+        self.matches += matches
+        self.errors += errors
+        self.total_seconds += seconds
+        self.last_scan_at = time.time()
+        if last_error is not None:
+            self.last_error = last_error
+        self.sources[source] = self.sources.get(source, 0) + 1
+        self._scan_seconds.append(seconds)
+        if evaluations:
+            self._element_seconds.append(seconds / evaluations)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为字典，时间单位为毫秒（单要素开销为微秒）"""
+        scan_seconds = sorted(self._scan_seconds)
+        element_seconds = sorted(self._element_seconds)
+
+        def ms(value):
+            return None if value is None else value * 1e3
+
+        def us(value):
+            return None if value is None else value * 1e6
+
+        return {
+            "rule_id": self.rule_id,
+            "rule_name": self.rule_name,
+            "scans": self.scans,
+            "evaluations": self.evaluations,
+            "matches": self.matches,
+            "match_ratio": self.matches / self.evaluations if self.evaluations else 0.0,
+            "errors": self.errors,
+            "error_ratio": self.errors / self.evaluations if self.evaluations else 0.0,
+            "last_error": self.last_error,
+            "total_ms": self.total_seconds * 1e3,
+            "scan_ms": {
+                "mean": ms(self.total_seconds / self.scans) if self.scans else None,
+                "p50": ms(percentile(scan_seconds, 0.5)),
+                "p95": ms(percentile(scan_seconds, 0.95)),
+                "p99": ms(percentile(scan_seconds, 0.99))
+            },
+            "per_element_us": {
+                "mean": us(self.total_seconds / self.evaluations) if self.evaluations else None,
+                "p50": us(percentile(element_seconds, 0.5)),
+                "p95": us(percentile(element_seconds, 0.95)),
+                "p99": us(percentile(element_seconds, 0.99))
+            },
+            "sources": dict(self.sources),
+            "last_scan_at": self.last_scan_at
+        }
+
+class RuleProfiler:
+    """按规则汇总评估开销、异常次数与匹配率"""
+    def __init__(self):
+        self._profiles: Dict[str, RuleProfile] = {}
+        self._lock = threading.Lock()
+
+    def record(self, rule_id: str, rule_name: str, source: str, evaluations: int, matches: int,
+               errors: int, seconds: float, last_error: Optional[str] = None) -> None:
+        """记录规则的一次扫描"""
+        with self._lock:
+            profile = self._profiles.get(rule_id)
+            if profile is None:
+                profile = self._profiles[rule_id] = RuleProfile(rule_id, rule_name)
+            profile.rule_name = rule_name
+            profile.record(source, evaluations, matches, errors, seconds, last_error)
+
+    def get(self, rule_id: str) -> Optional[Dict[str, Any]]:
+        """获取单个规则的统计"""
+        with self._lock:
+            profile = self._profiles.get(rule_id)
+            return profile.to_dict() if profile else None
+
+    def report(self, limit: int = 10) -> Dict[str, Any]:
+        """生成报告：总耗时最高的规则与异常最多的规则"""
+        with self._lock:
+            profiles = [profile.to_dict() for profile in self._profiles.values()]
+
+        slowest = sorted(profiles, key=lambda item: item["total_ms"], reverse=True)
+        most_errors = sorted(
+            (item for item in profiles if item["errors"]),
+            key=lambda item: (item["errors"], item["error_ratio"]),
+            reverse=True
+        )
+        return {
+            "rules_profiled": len(profiles),
+            "total_ms": sum(item["total_ms"] for item in profiles),
+            "slowest": slowest[:limit],
+            "most_errors": most_errors[:limit]
+        }
+
+    def reset(self) -> None:
+        """清空所有统计"""
+        with self._lock:
+            self._profiles.clear()
+
+# 全局规则性能分析器
+rule_profiler = RuleProfiler()
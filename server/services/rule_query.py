@@ -0,0 +1,237 @@
+from typing import Dict, Any, List, Optional, Tuple, Union, Callable, Awaitable
+from services.bitset import popcount
+from services.evaluation_cache import canonical_parameters
+import re
+
+# 布尔运算符
+OP_AND = "and"
+OP_OR = "or"
+OP_NOT = "not"
+
+# 字符串表达式的词法：括号、运算符、带引号的规则名、规则ID或名称
+_TOKEN_PATTERN = re.compile(r'\s*(?:(\()|(\))|(&&|&|\|\||\||!)|"([^"]*)"|([^\s()&|!"]+))')
+_SYMBOLS = {"&&": OP_AND, "&": OP_AND, "||": OP_OR, "|": OP_OR, "!": OP_NOT}
+
+class RuleTerm:
+    """表达式中的规则项：规则数据及覆盖的参数"""
+    __slots__ = ("rule", "parameters")
+
+    def __init__(self, rule: Dict[str, Any], parameters: Dict[str, Any]):
+        self.rule = rule
+        self.parameters = parameters
+
+class BoolNode:
+    """与、或、非节点；非节点只有一个子节点"""
+    __slots__ = ("op", "children")
+
+    def __init__(self, op: str, children: List[Any]):
+        self.op = op
+        self.children = children
+
+Expression = Union[RuleTerm, BoolNode]
+
+def parse_rule_query(expression: Union[str, Dict[str, Any]], rules: Dict[str, Dict[str, Any]],
+                     parameters: Dict[str, Dict[str, Any]] = None) -> Expression:
+    """解析规则组合表达式
+
+    expression 可以是字符串，如 `季节匹配 AND 高评分 AND NOT "经济型 住宿"`（AND/OR/NOT 不区分大小写，
+    也可写作 & | !，名称含空格时加引号），也可以是 JSON 树：{"and": [...]}、{"or": [...]}、{"not": 子表达式}、
+    {"rule": 规则ID或名称, "parameters": {...}}。rules 为 规则ID或名称 -> 规则数据，
+    parameters 为 规则ID -> 参数，用于字符串表达式中的规则项。表达式不合法时抛出 ValueError。
+    """
+    parameters = parameters or {}
+
+    def term(reference: Any, overrides: Optional[Dict[str, Any]] = None) -> RuleTerm:
+        rule = rules.get(reference) if isinstance(reference, str) else None
+        if rule is None:
+            raise ValueError(f"规则 {reference!r} 不存在")
+        if overrides is None:
+            overrides = parameters.get(rule["id"], {})
+        if not isinstance(overrides, dict):
+            raise ValueError(f"规则 {reference!r} 的参数必须是对象")
+        return RuleTerm(rule, overrides)
+
+    if isinstance(expression, str):
+        return _parse_text(expression, term)
+    return _parse_tree(expression, term)
+
+def _parse_tree(node: Any, term: Callable[..., RuleTerm]) -> Expression:
+    if not isinstance(node, dict) or (len(node) != 1 and "rule" not in node):
+        raise ValueError(f"表达式节点必须是只有一个运算符的对象: {node!r}")
+    if "rule" in node:
+        return term(node["rule"], node.get("parameters"))
+    op, value = next(iter(node.items()))
+    op = op.lower()
+    if op == OP_NOT:
+        return BoolNode(OP_NOT, [_parse_tree(value, term)])
+    if op not in (OP_AND, OP_OR):
+        raise ValueError(f"不支持的运算符 {op}，可选: {OP_AND}, {OP_OR}, {OP_NOT}")
+    if not isinstance(value, list) or not value:
+        raise ValueError(f"{op} 需要非空的子表达式列表")
+    return BoolNode(op, [_parse_tree(child, term) for child in value])
+
+def _parse_text(text: str, term: Callable[..., RuleTerm]) -> Expression:
+    """递归下降解析，优先级 NOT > AND > OR"""
+    tokens: List[Tuple[str, str]] = []
+    position = 0
+    text = text.rstrip()
+    while position < len(text):
+        match = _TOKEN_PATTERN.match(text, position)
+        if match is None:
+            raise ValueError(f"表达式在位置 {position} 处不合法: {text[position:position + 20]!r}")
+        position = match.end()
+        left, right, symbol, quoted, word = match.groups()
+        if left or right:
+            tokens.append((left or right, ""))
+        elif symbol:
+            tokens.append(("op", _SYMBOLS[symbol]))
+        elif quoted is not None:
+            tokens.append(("name", quoted))
+        elif word.lower() in (OP_AND, OP_OR, OP_NOT):
+            tokens.append(("op", word.lower()))
+        else:
+            tokens.append(("name", word))
+    if not tokens:
+        raise ValueError("表达式为空")
+
+    index = 0
+
+    def peek_op(op: str) -> bool:
+        return index < len(tokens) and tokens[index] == ("op", op)
+
+    def parse_or() -> Expression:
+        nonlocal index
+        children = [parse_and()]
+        while peek_op(OP_OR):
+            index += 1
+            children.append(parse_and())
+        return children[0] if len(children) == 1 else BoolNode(OP_OR, children)
+
+    def parse_and() -> Expression:
+        nonlocal index
+        children = [parse_not()]
+        while peek_op(OP_AND):
+            index += 1
+            children.append(parse_not())
+        return children[0] if len(children) == 1 else BoolNode(OP_AND, children)
+
+    def parse_not() -> Expression:
+        nonlocal index
+        if peek_op(OP_NOT):
+            index += 1
+            return BoolNode(OP_NOT, [parse_not()])
+        if index >= len(tokens):
+            raise ValueError("表达式不完整")
+        kind, value = tokens[index]
+        index += 1
+        if kind == "(":
+            node = parse_or()
+            if index >= len(tokens) or tokens[index][0] != ")":
+                raise ValueError("缺少右括号")
+            index += 1
+            return node
+        if kind != "name":
+            raise ValueError(f"表达式中出现多余的 {value or kind!r}")
+        return term(value)
+
+    node = parse_or()
+    if index != len(tokens):
+        raise ValueError(f"表达式中出现多余的 {tokens[index][1] or tokens[index][0]!r}")
+    return node
+
+class RuleQueryEvaluator:
+    """按代价顺序求值规则组合表达式，结果为要素下标位集
+
+    cost(规则项) 返回 (计算代价, 匹配数估计)：得分列已缓存时代价为 0、估计为实际匹配数，
+    否则为需要扫描的要素数。与运算先求值代价低、估计小的子表达式，结果为空后不再求值其余子表达式；
+    非子表达式在与运算中作为差集最后应用。或运算在结果覆盖全部要素后停止。
+    """
+    def __init__(self, size: int, cost: Callable[[RuleTerm], Tuple[int, int]],
+                 bits: Callable[[RuleTerm], Awaitable[int]]):
+        self.size = size
+        self.universe = (1 << size) - 1
+        self._cost = cost
+        self._bits = bits
+        self._terms: Dict[Tuple[str, str], int] = {}  # (规则ID, 参数) -> 位集，同一规则项只求值一次
+        self._estimates: Dict[int, Tuple[int, int]] = {}
+        self.steps: List[Dict[str, Any]] = []
+        self.skipped = 0
+
+    def estimate(self, node: Expression) -> Tuple[int, int]:
+        """子表达式的 (计算代价, 匹配数上界)"""
+        estimate = self._estimates.get(id(node))
+        if estimate is None:
+            estimate = self._estimates[id(node)] = self._estimate(node)
+        return estimate
+
+    def _estimate(self, node: Expression) -> Tuple[int, int]:
+        if isinstance(node, RuleTerm):
+            return self._cost(node)
+        estimates = [self.estimate(child) for child in node.children]
+        cost = sum(child_cost for child_cost, _ in estimates)
+        if node.op == OP_NOT:
+            return cost, self.size
+        if node.op == OP_OR:
+            return cost, min(self.size, sum(count for _, count in estimates))
+        positives = [count for child, (_, count) in zip(node.children, estimates)
+                     if not (isinstance(child, BoolNode) and child.op == OP_NOT)]
+        return cost, min(positives, default=self.size)
+
+    def _skip(self, nodes: List[Expression]) -> None:
+        """记录因短路而未求值的规则项数"""
+        for node in nodes:
+            if isinstance(node, RuleTerm):
+                self.skipped += 1
+            else:
+                self._skip(node.children)
+
+    async def evaluate(self, node: Expression) -> int:
+        if isinstance(node, RuleTerm):
+            return await self._evaluate_term(node)
+        if node.op == OP_NOT:
+            return self.universe & ~await self.evaluate(node.children[0])
+        if node.op == OP_OR:
+            children = sorted(node.children, key=lambda child: self._order(child, descending=True))
+            result = 0
+            for index, child in enumerate(children):
+                if result == self.universe:
+                    self._skip(children[index:])
+                    break
+                result |= await self.evaluate(child)
+            return result
+
+        positives, negatives = [], []
+        for child in node.children:
+            if isinstance(child, BoolNode) and child.op == OP_NOT:
+                negatives.append(child.children[0])
+            else:
+                positives.append(child)
+        positives.sort(key=lambda child: self._order(child, descending=False))
+        negatives.sort(key=lambda child: self._order(child, descending=True))
+        result = self.universe
+        pending = positives + negatives
+        for index, child in enumerate(pending):
+            if not result:
+                self._skip(pending[index:])
+                break
+            bits = await self.evaluate(child)
+            result = result & bits if index < len(positives) else result & ~bits
+        return result
+
+    def _order(self, node: Expression, descending: bool) -> Tuple[int, int]:
+        cost, count = self.estimate(node)
+        return cost, -count if descending else count
+
+    async def _evaluate_term(self, term: RuleTerm) -> int:
+        key = (term.rule["id"], canonical_parameters(term.rule.get("parameters", {}), term.parameters))
+        if key not in self._terms:
+            cost, _ = self._cost(term)
+            bits = await self._bits(term)
+            self._terms[key] = bits
+            self.steps.append({
+                "rule_id": term.rule["id"],
+                "parameters": term.parameters,
+                "cached": cost == 0,
+                "count": popcount(bits)
+            })
+        return self._terms[key]
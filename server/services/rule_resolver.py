@@ -0,0 +1,67 @@
+from typing import Dict, Any, List, Optional, Tuple
+
+# 别名优先级：数值越小越优先，与原先的查找顺序一致（ID > 名称 > 规范化名称）
+PRIORITY_ID = 0
+PRIORITY_NAME = 1
+PRIORITY_NORMALIZED_NAME = 2
+
+def normalize_rule_identifier(identifier: str) -> str:
+    """将规则名称转换为ID格式"""
+    return identifier.lower().replace(" ", "_")
+
+class RuleResolver:
+    """规则标识解析器
+
+    维护 ID、名称、规范化名称到规则ID的别名索引，任意标识都能在 O(1) 内解析为规则ID。
+    索引在读取全部规则时整体重建，在规则增删改时增量维护。
+    同一个别名可能对应多个规则（例如重名），解析时按优先级选择。
+    """
+    def __init__(self):
+        self._aliases: Dict[str, Dict[str, int]] = {}  # 别名 -> {规则ID: 优先级}
+        self._rule_aliases: Dict[str, Tuple[str, ...]] = {}  # 规则ID -> 该规则登记的别名
+
+    def __len__(self) -> int:
+        return len(self._rule_aliases)
+
+    def index(self, rule: Dict[str, Any]) -> None:
+        """登记（或重新登记）规则的所有别名"""
+        rule_id = rule["id"]
+        self.remove(rule_id)
+
+        aliases = {rule_id: PRIORITY_ID}
+        name = rule.get("name")
+        if name:
+            aliases.setdefault(name, PRIORITY_NAME)
+            aliases.setdefault(normalize_rule_identifier(name), PRIORITY_NORMALIZED_NAME)
+
+        for alias, priority in aliases.items():
+            self._aliases.setdefault(alias, {})[rule_id] = priority
+        self._rule_aliases[rule_id] = tuple(aliases)
+
+    def remove(self, rule_id: str) -> None:
+        """移除规则的所有别名"""
+        for alias in self._rule_aliases.pop(rule_id, ()):
+            candidates = self._aliases.get(alias)
+            if candidates is None:
+                continue
+            candidates.pop(rule_id, None)
+            if not candidates:
+                del self._aliases[alias]
+
+    def rebuild(self, rules: List[Dict[str, Any]]) -> None:
+        """根据完整的规则列表重建索引"""
+        self._aliases.clear()
+        self._rule_aliases.clear()
+        for rule in rules:
+            self.index(rule)
+
+    def resolve(self, identifier: str) -> Optional[str]:
+        """将规则ID、名称或规范化名称解析为规则ID，未登记时返回 None"""
+        for key in (identifier, normalize_rule_identifier(identifier)):
+            candidates = self._aliases.get(key)
+            if candidates:
+                return min(candidates.items(), key=lambda item: (item[1], item[0]))[0]
+        return None
+
+# 全局规则解析器
+rule_resolver = RuleResolver()
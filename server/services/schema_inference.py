@@ -0,0 +1,251 @@
+from typing import Dict, Any, List, Optional, Iterable
+from datetime import datetime
+import threading
+
+# 属性取值的类别
+KIND_NULL = "null"
+KIND_BOOLEAN = "boolean"
+KIND_NUMBER = "number"
+KIND_STRING = "string"
+KIND_LIST = "list"
+KIND_OBJECT = "object"
+KIND_DATETIME = "datetime"
+KIND_OTHER = "other"
+
+INT64_MIN = -2 ** 63
+INT64_MAX = 2 ** 63 - 1
+
+def value_kind(value: Any) -> str:
+    """属性值的类别；bool 是 int 的子类，需要先判断"""
+    if value is None:
+        return KIND_NULL
+    if isinstance(value, bool):
+        return KIND_BOOLEAN
+    if isinstance(value, (int, float)):
+        return KIND_NUMBER
+    if isinstance(value, str):
+        return KIND_STRING
+    if isinstance(value, (list, tuple)):
+        return KIND_LIST
+    if isinstance(value, dict):
+        return KIND_OBJECT
+    if isinstance(value, datetime):
+        return KIND_DATETIME
+    return KIND_OTHER
+
+class AttributeSchema:
+    """一个属性在某类要素中的取值情况"""
+    __slots__ = ("name", "count", "kinds", "item_kinds", "integer", "minimum", "maximum")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.count = 0  # 含该属性的要素数
+        self.kinds: Dict[str, int] = {}  # 取值类别 -> 次数
+        self.item_kinds: Dict[str, int] = {}  # 列表元素的类别 -> 次数
+        self.integer = True  # 数值是否全部为 int64 范围内的整数
+        self.minimum: Optional[float] = None
+        self.maximum: Optional[float] = None
+
+    def observe(self, value: Any, count: bool = True) -> None:
+        if count:
+            self.count += 1
+        kind = value_kind(value)
+        self.kinds[kind] = self.kinds.get(kind, 0) + 1
+        if kind == KIND_NUMBER:
+            if not isinstance(value, int) or not INT64_MIN <= value <= INT64_MAX:
+                self.integer = False
+            if self.minimum is None or value < self.minimum:
+                self.minimum = value
+            if self.maximum is None or value > self.maximum:
+                self.maximum = value
+        elif kind == KIND_LIST:
+            for item in value:
+                item_kind = value_kind(item)
+                self.item_kinds[item_kind] = self.item_kinds.get(item_kind, 0) + 1
+
+    def forget(self, value: Any) -> None:
+        """撤销一个被删除要素的取值；整数标记和取值范围无法恢复，保持原值"""
+        self.count -= 1
+        self._decrement(self.kinds, value_kind(value))
+        if isinstance(value, (list, tuple)):
+            for item in value:
+                self._decrement(self.item_kinds, value_kind(item))
+
+    @staticmethod
+    def _decrement(counts: Dict[str, int], kind: str) -> None:
+        # 更新只累加取值类别，计数不小于实际值，减到0时该类别确实已不存在
+        if counts.get(kind, 0) > 1:
+            counts[kind] -= 1
+        else:
+            counts.pop(kind, None)
+
+    @property
+    def kind(self) -> str:
+        """忽略 null 后唯一的取值类别；有多种类别时为 mixed"""
+        kinds = [kind for kind in self.kinds if kind != KIND_NULL]
+        if not kinds:
+            return KIND_NULL
+        return kinds[0] if len(kinds) == 1 else "mixed"
+
+    @property
+    def nullable(self) -> bool:
+        return KIND_NULL in self.kinds
+
+    @property
+    def storage(self) -> str:
+        """按类别选择的列存储类型
+
+        int64 / float64 / bool / datetime 为定长数组，str 为字符串列，list[str] 为字符串列表，
+        其余（mixed、object 等）按原值保存。
+        """
+        kind = self.kind
+        if kind == KIND_NUMBER:
+            return "int64" if self.integer else "float64"
+        if kind == KIND_BOOLEAN:
+            return "bool"
+        if kind == KIND_DATETIME:
+            return "datetime"
+        if kind == KIND_STRING:
+            return "str"
+        if kind == KIND_LIST and set(self.item_kinds) <= {KIND_STRING}:
+            return "list[str]"
+        return "object"
+
+    def to_dict(self, element_count: int) -> Dict[str, Any]:
+        result = {
+            "kind": self.kind,
+            "storage": self.storage,
+            "count": self.count,
+            "optional": self.count < element_count,
+            "nullable": self.nullable,
+            "kinds": dict(self.kinds)
+        }
+        if self.minimum is not None:
+            result["min"] = self.minimum
+            result["max"] = self.maximum
+        if self.item_kinds:
+            result["item_kinds"] = dict(self.item_kinds)
+        return result
+
+class TypeSchema:
+    """一类要素的属性键集合及各属性的取值类别"""
+    def __init__(self, element_type: str):
+        self.element_type = element_type
+        self.element_count = 0
+        self.attributes: Dict[str, AttributeSchema] = {}
+        self.exact = True  # 计数是否来自完整推断
+
+    def observe(self, attributes: Dict[str, Any], new: bool = True) -> None:
+        """记录一个要素的属性；new 为假表示已有要素被更新，只扩展取值类别"""
+        if new:
+            self.element_count += 1
+        else:
+            self.exact = False
+        for key, value in attributes.items():
+            attribute = self.attributes.get(key)
+            if attribute is None:
+                attribute = self.attributes[key] = AttributeSchema(key)
+            attribute.observe(value, count=new)
+
+    def forget(self, attributes: Dict[str, Any]) -> None:
+        """撤销一个被删除要素的属性"""
+        self.element_count -= 1
+        for key, value in attributes.items():
+            attribute = self.attributes.get(key)
+            if attribute is None:
+                continue
+            attribute.forget(value)
+            # 更新新增的属性不计数，计数不精确时保留属性
+            if attribute.count <= 0 and self.exact:
+                del self.attributes[key]
+
+    def storages(self) -> Dict[str, str]:
+        """属性名 -> 列存储类型"""
+        return {key: attribute.storage for key, attribute in self.attributes.items()}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "type": self.element_type,
+            "element_count": self.element_count,
+            "exact": self.exact,
+            "keys": sorted(self.attributes),
+            "attributes": {
+                key: attribute.to_dict(self.element_count)
+                for key, attribute in sorted(self.attributes.items())
+            }
+        }
+
+class SchemaRegistry:
+    """按要素类型维护推断出的属性结构
+
+    结构记录对应的要素版本。写入后如果版本恰好前进了1（即这次写入之间没有其他写入），
+    直接增量更新；否则在下次读取时按当前要素重新推断。更新只会扩大取值类别，
+    更新后计数不再精确（exact 为假），直到下一次完整推断；删除按被删要素扣除计数。
+    """
+    def __init__(self):
+        self.version: Optional[int] = None
+        self._schemas: Dict[str, TypeSchema] = {}
+        self._lock = threading.Lock()
+
+    def is_current(self, version: int) -> bool:
+        return self.version == version
+
+    def clear(self) -> None:
+        """丢弃推断结果，下次读取时重新推断"""
+        with self._lock:
+            self._schemas = {}
+            self.version = None
+
+    def rebuild(self, version: int, elements: Iterable[Dict[str, Any]]) -> None:
+        """由全部要素完整推断"""
+        schemas: Dict[str, TypeSchema] = {}
+        for element in elements:
+            schema = schemas.get(element["type"])
+            if schema is None:
+                schema = schemas[element["type"]] = TypeSchema(element["type"])
+            schema.observe(element.get("attributes") or {})
+        with self._lock:
+            self._schemas = schemas
+            self.version = version
+
+    def observe_write(self, version: int, elements: List[Dict[str, Any]] = (), new: bool = True) -> bool:
+        """写入后增量更新；version 为写入后读取的要素版本，返回是否已增量更新"""
+        with self._lock:
+            if self.version is None or version != self.version + 1:
+                return False
+            for element in elements:
+                schema = self._schemas.get(element["type"])
+                if schema is None:
+                    schema = self._schemas[element["type"]] = TypeSchema(element["type"])
+                schema.observe(element.get("attributes") or {}, new=new)
+            self.version = version
+            return True
+
+    def observe_delete(self, version: int, elements: List[Dict[str, Any]] = ()) -> bool:
+        """删除后增量更新：扣除被删要素的计数，取值类别只在计数归零时移除"""
+        with self._lock:
+            if self.version is None or version != self.version + 1:
+                return False
+            for element in elements:
+                schema = self._schemas.get(element["type"])
+                if schema is None:
+                    continue
+                schema.forget(element.get("attributes") or {})
+                if schema.element_count <= 0:
+                    del self._schemas[element["type"]]
+            self.version = version
+            return True
+
+    def storages(self, version: int) -> Optional[Dict[str, Dict[str, str]]]:
+        """要素类型 -> 属性名 -> 列存储类型；结构不是 version 版本的推断结果时返回 None"""
+        with self._lock:
+            if self.version != version:
+                return None
+            return {element_type: schema.storages() for element_type, schema in self._schemas.items()}
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {element_type: schema.to_dict() for element_type, schema in sorted(self._schemas.items())}
+
+# 全局要素结构
+schema_registry = SchemaRegistry()
@@ -0,0 +1,451 @@
+from typing import Dict, Any, List, Optional, Tuple, Callable, Awaitable
+from collections.abc import Mapping
+from multiprocessing import shared_memory, resource_tracker
+from services.element_store import ElementStore
+from services.element_snapshot import (
+    ElementSnapshot, SnapshotError, encode_snapshot,
+    _FLAG_MISSING, _FLAG_INT, _FLAG_NONE, _from_micros
+)
+import asyncio
+import fcntl
+import logging
+import os
+import pickle
+import struct
+import tempfile
+import time
+import zlib
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 共享内存段的名称前缀，为空时每个工作进程各自加载要素
+SHARED_STORE_NAME = os.getenv("HYPERGRAPH_SHARED_STORE", "")
+# 发布进程检查要素版本的间隔秒数
+SHARED_STORE_POLL = float(os.getenv("HYPERGRAPH_SHARED_STORE_POLL", "1"))
+# 启动预热时等待发布者首次发布的最长秒数，超时后自行从数据库加载
+SHARED_STORE_WAIT = float(os.getenv("HYPERGRAPH_SHARED_STORE_WAIT", "30"))
+
+# 数据段开头：标识、要素版本、快照长度、ID索引的偏移和长度
+_SEGMENT_MAGIC = b"HGSHM001"
+_SEGMENT_HEADER = struct.Struct("<8sqQQQ")
+# 控制段：序号（奇数表示正在更新）、要素版本、当前数据段名称
+_CONTROL_HEADER = struct.Struct("<Qq")
+_CONTROL_NAME_LENGTH = 64
+_CONTROL_SIZE = _CONTROL_HEADER.size + _CONTROL_NAME_LENGTH
+
+_ABSENT = object()
+
+def _untrack(segment: shared_memory.SharedMemory) -> shared_memory.SharedMemory:
+    """不交给 resource_tracker 管理，否则本进程退出时会删除仍被其他进程使用的共享内存段"""
+    try:
+        resource_tracker.unregister(segment._name, "shared_memory")
+    except Exception:
+        pass
+    return segment
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    return _untrack(shared_memory.SharedMemory(name=name))
+
+def _id_hash(data: bytes) -> int:
+    """跨进程稳定的ID哈希（内置 hash 对字符串按进程随机化）"""
+    return zlib.crc32(data)
+
+def _encode_id_index(ids: List[str]) -> bytes:
+    """开放寻址的 ID -> 下标 哈希表，槽位数为不小于2倍要素数的2的幂，空槽为 -1"""
+    size = 8
+    while size < len(ids) * 2:
+        size *= 2
+    mask = size - 1
+    slots = [-1] * size
+    for index, element_id in enumerate(ids):
+        slot = _id_hash(element_id.encode("utf-8")) & mask
+        while slots[slot] != -1:
+            slot = (slot + 1) & mask
+        slots[slot] = index
+    return struct.pack(f"<{size}q", *slots)
+
+class _Column:
+    """共享内存中的一列，按行解码，不复制整列数据"""
+    __slots__ = ("name", "storage", "flags", "data", "offsets", "rows")
+
+    def __init__(self, snapshot: ElementSnapshot, column: Dict[str, Any]):
+        self.name = column["name"]
+        self.storage = column["storage"]
+        self.flags = snapshot.view(column["flags"])
+        self.data = snapshot.view(column["data"])
+        if self.storage in ("int64", "datetime"):
+            self.data = self.data.cast("q")
+        elif self.storage == "float64":
+            self.data = self.data.cast("d")
+        self.offsets = snapshot.view(column["offsets"]).cast("q") if "offsets" in column else None
+        self.rows = snapshot.view(column["rows"]).cast("q") if "rows" in column else None
+
+    def _text(self, index: int) -> str:
+        return str(self.data[self.offsets[index]:self.offsets[index + 1]], "utf-8")
+
+    def get(self, row: int) -> Any:
+        """第 row 行的值，缺失时返回 _ABSENT"""
+        flag = self.flags[row]
+        if flag == _FLAG_MISSING:
+            return _ABSENT
+        if flag == _FLAG_NONE:
+            return None
+        storage = self.storage
+        if storage == "str":
+            return self._text(row)
+        if storage in ("int64", "float64"):
+            value = self.data[row]
+            return int(value) if flag == _FLAG_INT else value
+        if storage == "list[str]":
+            return [self._text(index) for index in range(self.rows[row], self.rows[row + 1])]
+        if storage == "bool":
+            return bool(self.data[row])
+        if storage == "datetime":
+            return _from_micros(self.data[row])
+        return pickle.loads(self.data[self.offsets[row]:self.offsets[row + 1]])
+
+    def id_bytes(self, row: int) -> memoryview:
+        return self.data[self.offsets[row]:self.offsets[row + 1]]
+
+class _TypeTable:
+    """一类要素的各列"""
+    __slots__ = ("type", "start", "count", "ids", "fields", "attributes")
+
+    def __init__(self, snapshot: ElementSnapshot, type_header: Dict[str, Any], start: int):
+        self.type = type_header["type"]
+        self.start = start
+        self.count = type_header["count"]
+        self.ids = _Column(snapshot, type_header["ids"])
+        self.fields = {column["name"]: _Column(snapshot, column) for column in type_header["fields"]}
+        self.attributes = {column["name"]: _Column(snapshot, column) for column in type_header["attributes"]}
+
+class SharedAttributes(Mapping):
+    """共享内存中一个要素的属性，只读，读取时才解码"""
+    __slots__ = ("_table", "_row")
+
+    def __init__(self, table: _TypeTable, row: int):
+        self._table = table
+        self._row = row
+
+    def get(self, key, default=None):
+        column = self._table.attributes.get(key)
+        if column is None:
+            return default
+        value = column.get(self._row)
+        return default if value is _ABSENT else value
+
+    def __getitem__(self, key):
+        value = self.get(key, _ABSENT)
+        if value is _ABSENT:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key) -> bool:
+        return self.get(key, _ABSENT) is not _ABSENT
+
+    def __iter__(self):
+        row = self._row
+        return (name for name, column in self._table.attributes.items() if column.flags[row] != _FLAG_MISSING)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def copy(self) -> Dict[str, Any]:
+        return dict(self.items())
+
+    def __repr__(self) -> str:
+        return repr(self.copy())
+
+class SharedElement(Mapping):
+    """共享内存中的一个要素，按字典方式只读访问；copy 返回普通字典"""
+    __slots__ = ("_table", "_row")
+
+    def __init__(self, table: _TypeTable, row: int):
+        self._table = table
+        self._row = row
+
+    def get(self, key, default=None):
+        if key == "id":
+            return self._table.ids.get(self._row)
+        if key == "type":
+            return self._table.type
+        if key == "attributes":
+            return SharedAttributes(self._table, self._row)
+        column = self._table.fields.get(key)
+        if column is None:
+            return default
+        value = column.get(self._row)
+        return default if value is _ABSENT else value
+
+    def __getitem__(self, key):
+        value = self.get(key, _ABSENT)
+        if value is _ABSENT:
+            raise KeyError(key)
+        return value
+
+    def __iter__(self):
+        row = self._row
+        yield "id"
+        yield "type"
+        yield "attributes"
+        for name, column in self._table.fields.items():
+            if column.flags[row] != _FLAG_MISSING:
+                yield name
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def copy(self) -> Dict[str, Any]:
+        element = dict(self.items())
+        element["attributes"] = element["attributes"].copy()
+        return element
+
+    def __repr__(self) -> str:
+        return repr(self.copy())
+
+class SharedPositions(Mapping):
+    """共享内存中的 要素ID -> 下标 索引"""
+    __slots__ = ("_slots", "_mask", "_elements")
+
+    def __init__(self, slots: memoryview, elements: List[SharedElement]):
+        self._slots = slots
+        self._mask = len(slots) - 1
+        self._elements = elements
+
+    def _id_bytes(self, index: int) -> memoryview:
+        element = self._elements[index]
+        return element._table.ids.id_bytes(element._row)
+
+    def get(self, key, default=None):
+        if not isinstance(key, str):
+            return default
+        data = key.encode("utf-8")
+        slot = _id_hash(data) & self._mask
+        while True:
+            index = self._slots[slot]
+            if index == -1:
+                return default
+            if self._id_bytes(index) == data:
+                return index
+            slot = (slot + 1) & self._mask
+
+    def __getitem__(self, key):
+        index = self.get(key)
+        if index is None:
+            raise KeyError(key)
+        return index
+
+    def __contains__(self, key) -> bool:
+        return self.get(key) is not None
+
+    def __iter__(self):
+        return (element["id"] for element in self._elements)
+
+    def __len__(self) -> int:
+        return len(self._elements)
+
+class SharedStore(ElementStore):
+    """挂载到共享内存数据段上的要素，与 ElementStore 接口一致
+
+    要素和ID索引都直接读取共享内存，每个进程只持有很小的行对象；
+    增量同步得到的新 ElementStore 复用这些行对象，只有变化的要素是普通字典。
+    """
+    __slots__ = ("segment", "snapshot")
+
+    def __init__(self, segment: shared_memory.SharedMemory):
+        buffer = segment.buf.toreadonly()
+        magic, version, snapshot_length, index_offset, index_length = _SEGMENT_HEADER.unpack_from(buffer)
+        if magic != _SEGMENT_MAGIC:
+            raise SnapshotError(f"共享内存段 {segment.name} 不是要素数据段")
+        start = _SEGMENT_HEADER.size
+        self.segment = segment
+        self.snapshot = ElementSnapshot(buffer=buffer[start:start + snapshot_length])
+        self.version = version
+        self.watermark = self.snapshot.watermark
+        self.elements = []
+        self.type_ranges = {}
+        for type_header in self.snapshot.header["types"]:
+            table = _TypeTable(self.snapshot, type_header, len(self.elements))
+            self.type_ranges[table.type] = (table.start, table.start + table.count)
+            self.elements.extend(SharedElement(table, row) for row in range(table.count))
+        slots = buffer[index_offset:index_offset + index_length].cast("q")
+        self.positions = SharedPositions(slots, self.elements)
+
+    def load_rules(self) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        return self.snapshot.load_rules()
+
+    @property
+    def rules_version(self) -> int:
+        return self.snapshot.rules_version
+
+class SharedElementStore:
+    """通过共享内存在多个工作进程之间共享要素
+
+    持有文件锁的进程作为发布者：每个要素版本写入一个新的数据段，再更新控制段指向它，
+    然后删除上一个数据段。其他进程只读挂载当前数据段；已挂载的旧数据段在不再被引用后关闭。
+    控制段按顺序锁（seqlock）读写：写入前后各把序号加1，读取前后序号一致且为偶数时结果有效。
+    """
+    def __init__(self, name: str):
+        self.name = name
+        self.is_leader = False
+        self._lock_file = None
+        self._control: Optional[shared_memory.SharedMemory] = None
+        self._published: Optional[shared_memory.SharedMemory] = None
+        self._attached: Optional[SharedStore] = None
+        self._retired: List[shared_memory.SharedMemory] = []
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.name)
+
+    def try_lead(self) -> bool:
+        """尝试成为发布者；持锁进程退出后由其他进程接替"""
+        if self.is_leader:
+            return True
+        if self._lock_file is None:
+            self._lock_file = open(os.path.join(tempfile.gettempdir(), f"{self.name}.lock"), "a+b")
+        try:
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            return False
+        try:
+            # 控制段在发布者退出后保留，由接替的发布者继续使用
+            self._control = _untrack(shared_memory.SharedMemory(name=self.name, create=True, size=_CONTROL_SIZE))
+        except FileExistsError:
+            # 上一个发布者留下的控制段，继续沿用
+            self._control = _attach(self.name)
+        self.is_leader = True
+        logger.info(f"共享要素发布者: 进程 {os.getpid()}")
+        return True
+
+    def _read_control(self) -> Optional[Tuple[int, str]]:
+        """返回 (要素版本, 数据段名称)，尚未发布时返回 None"""
+        if self._control is None:
+            try:
+                self._control = _attach(self.name)
+            except FileNotFoundError:
+                return None
+        buffer = self._control.buf
+        for _ in range(100):
+            sequence, version = _CONTROL_HEADER.unpack_from(buffer)
+            name = bytes(buffer[_CONTROL_HEADER.size:_CONTROL_SIZE]).rstrip(b"\0").decode("ascii")
+            if sequence % 2 == 0 and _CONTROL_HEADER.unpack_from(buffer)[0] == sequence:
+                return (version, name) if name else None
+        return None
+
+    def _write_control(self, version: int, name: str) -> None:
+        buffer = self._control.buf
+        sequence = _CONTROL_HEADER.unpack_from(buffer)[0]
+        struct.pack_into("<Q", buffer, 0, sequence + 1)
+        struct.pack_into("<q", buffer, 8, version)
+        buffer[_CONTROL_HEADER.size:_CONTROL_SIZE] = name.encode("ascii").ljust(_CONTROL_NAME_LENGTH, b"\0")
+        struct.pack_into("<Q", buffer, 0, sequence + 2)
+
+    def published_version(self) -> Optional[int]:
+        control = self._read_control()
+        return control[0] if control is not None else None
+
+    async def wait_published(self, timeout: float) -> bool:
+        """等待发布者发布要素，返回是否已发布"""
+        deadline = time.monotonic() + timeout
+        while self.published_version() is None:
+            if time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(0.1)
+        return True
+
+    def publish(self, store: ElementStore, rules_version: int, rules: List[Dict[str, Any]],
+                compiled_rules: Dict[str, Any] = None, storages: Dict[str, Dict[str, str]] = None) -> int:
+        """把要素、ID索引和规则写入新的数据段并切换控制段，返回数据段字节数"""
+        chunks = encode_snapshot(store, rules_version, rules, compiled_rules, storages)
+        snapshot_length = sum(len(chunk) for chunk in chunks)
+        snapshot_length += -snapshot_length % 8
+        index = _encode_id_index([element["id"] for element in store.elements])
+        index_offset = _SEGMENT_HEADER.size + snapshot_length
+        size = index_offset + len(index)
+
+        name = f"{self.name}_{store.version}_{os.getpid()}"
+        segment = shared_memory.SharedMemory(name=name, create=True, size=size)
+        try:
+            _SEGMENT_HEADER.pack_into(segment.buf, 0, _SEGMENT_MAGIC, store.version,
+                                      snapshot_length, index_offset, len(index))
+            position = _SEGMENT_HEADER.size
+            for chunk in chunks:
+                segment.buf[position:position + len(chunk)] = chunk
+                position += len(chunk)
+            segment.buf[index_offset:size] = index
+        except BaseException:
+            segment.close()
+            segment.unlink()
+            raise
+
+        self._write_control(store.version, name)
+        previous, self._published = self._published, segment
+        if previous is not None:
+            # 已挂载的进程仍可继续读取，直到各自关闭
+            previous.close()
+            previous.unlink()
+        return size
+
+    def attach(self, newer_than: Optional[int] = None) -> Optional[SharedStore]:
+        """挂载当前发布的数据段；没有发布或版本不比 newer_than 新时返回 None"""
+        control = self._read_control()
+        if control is None or (newer_than is not None and control[0] <= newer_than):
+            return None
+        version, name = control
+        if self._attached is not None and self._attached.version == version:
+            return self._attached
+        try:
+            segment = _attach(name)
+        except FileNotFoundError:
+            # 读取控制段之后发布者已切换到新的数据段，下次再挂载
+            return None
+        store = SharedStore(segment)
+        if self._attached is not None:
+            self._retired.append(self._attached.segment)
+        self._attached = store
+        self._close_retired()
+        return store
+
+    def _close_retired(self) -> None:
+        """关闭不再被任何要素引用的旧数据段"""
+        retired = []
+        for segment in self._retired:
+            try:
+                segment.close()
+            except BufferError:
+                retired.append(segment)
+        self._retired = retired
+
+    def close(self) -> None:
+        self._attached = None
+        self._close_retired()
+        if self._published is not None:
+            self._published.close()
+            self._published.unlink()
+            self._published = None
+        if self._control is not None:
+            if self.is_leader:
+                self._write_control(-1, "")
+            self._control.close()
+            self._control = None
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+        self.is_leader = False
+
+async def run_shared_store(publish: Callable[[], Awaitable[None]], ready: Callable[[], bool] = None) -> None:
+    """后台任务：竞争发布者，成为发布者且 ready() 为真后定期发布新的要素版本"""
+    while True:
+        try:
+            if shared_element_store.try_lead() and (ready is None or ready()):
+                await publish()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"发布共享要素失败: {e}")
+        await asyncio.sleep(SHARED_STORE_POLL)
+
+# 全局共享要素
+shared_element_store = SharedElementStore(SHARED_STORE_NAME)
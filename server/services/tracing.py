@@ -0,0 +1,209 @@
+from typing import Dict, Any, List, Optional
+from contextlib import contextmanager
+from contextvars import ContextVar
+import json
+import logging
+import os
+import queue
+import secrets
+import threading
+import time
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 追踪配置
+TRACING_ENABLED = os.getenv("HYPERGRAPH_TRACING", "1") == "1"
+TRACE_EXPORT = os.getenv("HYPERGRAPH_TRACE_EXPORT", "none")  # none | log | file
+TRACE_FILE = os.getenv("HYPERGRAPH_TRACE_FILE", "traces.jsonl")
+SERVICE_NAME = os.getenv("HYPERGRAPH_SERVICE_NAME", "hypergraph-api")
+
+# OpenTelemetry 的 span 类型
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+
+class Span:
+    """一个计时区间"""
+    __slots__ = ("name", "span_id", "parent_id", "kind", "start_ns", "end_ns", "attributes")
+
+    def __init__(self, name: str, parent_id: Optional[str], attributes: Dict[str, Any], kind: int = SPAN_KIND_INTERNAL):
+        self.name = name
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    @property
+    def duration_ms(self) -> float:
+        end_ns = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end_ns - self.start_ns) / 1e6
+
+class Trace:
+    """一个请求内的所有 span"""
+    def __init__(self, root: Span):
+        self.trace_id = secrets.token_hex(16)
+        self.root = root
+        self.spans: List[Span] = []
+
+    def breakdown(self) -> List[tuple]:
+        """按名称汇总各阶段耗时，顺序为各阶段第一次出现的顺序"""
+        totals: Dict[str, float] = {}
+        for span in sorted(self.spans, key=lambda item: item.start_ns):
+            totals[span.name] = totals.get(span.name, 0.0) + span.duration_ms
+        return list(totals.items())
+
+    def server_timing(self) -> str:
+        """生成 Server-Timing 响应头"""
+        entries = [f"{name};dur={duration:.3f}" for name, duration in self.breakdown()]
+        entries.append(f"total;dur={self.root.duration_ms:.3f}")
+        return ", ".join(entries)
+
+    def to_otlp(self) -> Dict[str, Any]:
+        """转换为 OTLP/JSON 格式（resourceSpans）"""
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [_otlp_attribute("service.name", SERVICE_NAME)]},
+                "scopeSpans": [{
+                    "scope": {"name": "hypergraph.tracing"},
+                    "spans": [self._otlp_span(span) for span in [self.root] + self.spans]
+                }]
+            }]
+        }
+
+    def _otlp_span(self, span: Span) -> Dict[str, Any]:
+        data = {
+            "traceId": self.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            "kind": span.kind,
+            "startTimeUnixNano": str(span.start_ns),
+            "endTimeUnixNano": str(span.end_ns if span.end_ns is not None else time.time_ns()),
+            "attributes": [_otlp_attribute(key, value) for key, value in span.attributes.items()]
+        }
+        if span.parent_id:
+            data["parentSpanId"] = span.parent_id
+        return data
+
+    def to_log_record(self) -> Dict[str, Any]:
+        """转换为结构化日志记录"""
+        return {
+            "trace_id": self.trace_id,
+            "name": self.root.name,
+            "attributes": self.root.attributes,
+            "duration_ms": round(self.root.duration_ms, 3),
+            "stages": {name: round(duration, 3) for name, duration in self.breakdown()}
+        }
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    """转换为 OTLP 属性"""
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    else:
+        typed = {"stringValue": str(value)}
+    return {"key": key, "value": typed}
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+@contextmanager
+def span(name: str, **attributes: Any):
+    """在当前请求的追踪中记录一个阶段；不在请求上下文中时不做任何事"""
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+
+    parent = _current_span.get()
+    current = Span(name, parent.span_id if parent else trace.root.span_id, attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    finally:
+        current.end_ns = time.time_ns()
+        _current_span.reset(token)
+        trace.spans.append(current)
+
+def current_trace() -> Optional[Trace]:
+    """获取当前请求的追踪"""
+    return _current_trace.get()
+
+class _FileExporter:
+    """在后台线程中把追踪以 JSON Lines 追加到文件，避免在请求路径上写文件"""
+    def __init__(self, path: str):
+        self.path = path
+        self._queue: "queue.SimpleQueue[str]" = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, trace: Trace) -> None:
+        self._queue.put(json.dumps(trace.to_otlp(), ensure_ascii=False, default=str))
+
+    def _run(self) -> None:
+        while True:
+            lines = [self._queue.get()]
+            while not self._queue.empty():
+                lines.append(self._queue.get_nowait())
+            try:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write("\n".join(lines) + "\n")
+            except OSError as e:
+                logger.error(f"写入追踪文件 {self.path} 失败: {e}")
+
+class _LogExporter:
+    """以结构化日志输出追踪"""
+    def export(self, trace: Trace) -> None:
+        logger.info(json.dumps(trace.to_log_record(), ensure_ascii=False, default=str))
+
+def _create_exporter():
+    if TRACE_EXPORT == "file":
+        return _FileExporter(TRACE_FILE)
+    if TRACE_EXPORT == "log":
+        return _LogExporter()
+    return None
+
+class TracingMiddleware:
+    """为每个请求创建追踪，在响应头中附加 Server-Timing 与 X-Trace-Id，并导出追踪"""
+    def __init__(self, app):
+        self.app = app
+        self.exporter = _create_exporter()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not TRACING_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        root = Span("http.request", None, {"http.method": scope.get("method", ""), "http.target": scope.get("path", "")},
+                    kind=SPAN_KIND_SERVER)
+        trace = Trace(root)
+        trace_token = _current_trace.set(trace)
+        span_token = _current_span.set(root)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                root.attributes["http.status_code"] = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", trace.server_timing().encode("latin-1")))
+                headers.append((b"x-trace-id", trace.trace_id.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            root.end_ns = time.time_ns()
+            route = scope.get("route")
+            if route is not None:
+                root.attributes["http.route"] = getattr(route, "path", "")
+            _current_span.reset(span_token)
+            _current_trace.reset(trace_token)
+            if self.exporter is not None:
+                self.exporter.export(trace)
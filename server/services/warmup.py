@@ -0,0 +1,119 @@
+from typing import Dict, Any, List, Optional, Callable, Awaitable
+from datetime import datetime
+from database import connect_to_mongodb, create_indexes
+from services.db_service import DatabaseService
+import asyncio
+import logging
+import os
+import time
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 是否在就绪前预热缓存（加载要素、编译规则、计算规则得分列）；为 0 时连接数据库后即就绪
+WARMUP_CACHES = os.getenv("HYPERGRAPH_WARMUP", "1") == "1"
+# 预热失败后重试的间隔秒数
+WARMUP_RETRY_INTERVAL = float(os.getenv("HYPERGRAPH_WARMUP_RETRY_INTERVAL", "5"))
+
+# 预热状态
+STATUS_PENDING = "pending"
+STATUS_RUNNING = "running"
+STATUS_READY = "ready"
+STATUS_FAILED = "failed"
+
+class WarmupState:
+    """启动后台预热的进度，供就绪检查使用"""
+    def __init__(self):
+        self.status = STATUS_PENDING
+        self.attempts = 0
+        self.steps: List[Dict[str, Any]] = []
+        self.error: Optional[str] = None
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.status == STATUS_READY
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "status": self.status,
+            "ready": self.ready,
+            "attempts": self.attempts,
+            "steps": list(self.steps),
+            "error": self.error,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None
+        }
+
+async def _run_step(name: str, step: Callable[[], Awaitable[Any]]) -> None:
+    started = time.perf_counter()
+    result = await step()
+    record = {"name": name, "duration_ms": (time.perf_counter() - started) * 1e3}
+    if isinstance(result, int):
+        record["count"] = result
+    warmup_state.steps.append(record)
+    logger.info(f"预热步骤 {name} 完成，耗时 {record['duration_ms']:.1f} ms")
+
+async def _migrate_demo_data(service: Any) -> None:
+    """数据库为空时写入服务内置的演示要素和规则"""
+    elements = {
+        element_type: [element.to_dict() for element in element_list]
+        for element_type, element_list in service.shared_elements_by_type.items()
+    }
+    await DatabaseService.migrate_elements(elements)
+    await DatabaseService.migrate_rules(service.get_all_rules())
+
+async def _create_demo_hypergraph(service: Any) -> None:
+    await service.create_demo_hypergraph_async()
+
+async def _warm_up_rule_columns(service: Any) -> int:
+    """按默认参数计算所有规则的得分列，返回规则-要素超边数"""
+    return len(await service.calculate_rule_element_hyperedges())
+
+async def warm_up(service: Any) -> None:
+    """后台预热：连接数据库并创建索引、迁移演示数据，再加载要素、编译规则、推断属性结构和计算规则得分列
+
+    任一步骤失败时记录错误并在稍后重试，完成全部步骤后才标记为就绪。
+    """
+    steps = [
+        ("database", connect_to_mongodb),
+        ("indexes", create_indexes),
+        ("migrate", lambda: _migrate_demo_data(service)),
+        ("demo_hypergraph", lambda: _create_demo_hypergraph(service)),
+    ]
+    if WARMUP_CACHES:
+        steps += [
+            ("elements", service.warm_up_elements_async),
+            ("rules", service.compile_rules_async),
+            ("element_schemas", service.get_element_schemas_async),
+            ("rule_columns", lambda: _warm_up_rule_columns(service)),
+        ]
+
+    warmup_state.started_at = datetime.now()
+    completed = set()
+    while True:
+        warmup_state.status = STATUS_RUNNING
+        warmup_state.attempts += 1
+        try:
+            for name, step in steps:
+                if name not in completed:
+                    await _run_step(name, step)
+                    completed.add(name)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            warmup_state.status = STATUS_FAILED
+            warmup_state.error = f"{type(e).__name__}: {e}"
+            logger.warning(f"预热失败，{WARMUP_RETRY_INTERVAL} 秒后重试: {warmup_state.error}")
+            await asyncio.sleep(WARMUP_RETRY_INTERVAL)
+            continue
+        warmup_state.status = STATUS_READY
+        warmup_state.error = None
+        warmup_state.finished_at = datetime.now()
+        elapsed = (warmup_state.finished_at - warmup_state.started_at).total_seconds()
+        logger.info(f"预热完成，耗时 {elapsed:.2f} 秒")
+        return
+
+# 全局预热状态
+warmup_state = WarmupState()
@@ -0,0 +1,146 @@
+from datetime import datetime
+from services.element_snapshot import ElementSnapshot, SnapshotError, encode_snapshot, write_snapshot
+from services.element_store import ElementStore
+import os
+import tempfile
+import unittest
+
+NOW = datetime(2026, 1, 2, 3, 4, 5, 678901)
+
+def _element(element_id: str, element_type: str, attributes: dict) -> dict:
+    return {
+        "id": element_id,
+        "type": element_type,
+        "attributes": attributes,
+        "created_at": NOW,
+        "updated_at": NOW
+    }
+
+def _decode(store: ElementStore, storages: dict = None) -> ElementStore:
+    """编码后从内存缓冲区解码"""
+    buffer = b"".join(encode_snapshot(store, 1, [], None, storages))
+    snapshot = ElementSnapshot(buffer=buffer)
+    try:
+        return snapshot.load_store()
+    finally:
+        snapshot.close()
+
+def _columns(store: ElementStore, storages: dict = None) -> dict:
+    """编码后各属性列的存储类型：要素类型 -> 属性名 -> 存储类型"""
+    buffer = b"".join(encode_snapshot(store, 1, [], None, storages))
+    snapshot = ElementSnapshot(buffer=buffer)
+    try:
+        return {
+            type_header["type"]: {column["name"]: column["storage"] for column in type_header["attributes"]}
+            for type_header in snapshot.header["types"]
+        }
+    finally:
+        snapshot.close()
+
+class ElementSnapshotRoundTripTest(unittest.TestCase):
+    def assertRoundTrip(self, elements: list, storages: dict = None) -> ElementStore:
+        by_type = {}
+        for element in elements:
+            by_type.setdefault(element["type"], []).append(element)
+        store = ElementStore(7, by_type)
+        decoded = _decode(store, storages)
+        self.assertEqual(decoded.version, 7)
+        self.assertEqual(decoded.elements, store.elements)
+        # 值相等还不够：1 与 1.0、True 与 1 相等，需要逐个比较类型
+        for original, restored in zip(store.elements, decoded.elements):
+            for key, value in original["attributes"].items():
+                self.assertIs(type(restored["attributes"][key]), type(value), key)
+        return decoded
+
+    def test_typed_columns(self):
+        elements = [
+            _element(f"e{index}", "住宿", {
+                "价格": index * 10,
+                "评分": index / 4,
+                "可预订": index % 2 == 0,
+                "名称": f"酒店{index}",
+                "季节": ["春", "夏"][:index % 3],
+                "开业": datetime(2020, 1, 1, index)
+            })
+            for index in range(10)
+        ]
+        self.assertEqual(_columns(ElementStore(1, {"住宿": elements}))["住宿"], {
+            "价格": "int64", "评分": "float64", "可预订": "bool",
+            "名称": "str", "季节": "list[str]", "开业": "datetime"
+        })
+        self.assertRoundTrip(elements)
+
+    def test_sparse_columns_keep_keys_absent(self):
+        elements = [
+            _element(f"e{index}", "景点", {"名称": str(index), **({"评分": 4.5} if index % 3 == 0 else {})})
+            for index in range(9)
+        ]
+        decoded = self.assertRoundTrip(elements)
+        self.assertNotIn("评分", decoded.elements[1]["attributes"])
+        self.assertEqual(decoded.elements[3]["attributes"]["评分"], 4.5)
+
+    def test_none_values_in_typed_columns(self):
+        elements = [
+            _element("e0", "美食", {"价格": None, "名称": None, "季节": None, "可预订": None}),
+            _element("e1", "美食", {"价格": 35, "名称": "面馆", "季节": ["冬"], "可预订": False}),
+            _element("e2", "美食", {"价格": 48.5}),
+        ]
+        decoded = self.assertRoundTrip(elements)
+        self.assertIsNone(decoded.elements[0]["attributes"]["价格"])
+        self.assertNotIn("名称", decoded.elements[2]["attributes"])
+
+    def test_ints_in_float_column_stay_ints(self):
+        elements = [_element(f"e{index}", "交通", {"时长": index if index % 2 else index + 0.5}) for index in range(6)]
+        self.assertEqual(_columns(ElementStore(1, {"交通": elements}))["交通"]["时长"], "float64")
+        decoded = self.assertRoundTrip(elements)
+        self.assertIs(type(decoded.elements[1]["attributes"]["时长"]), int)
+
+    def test_object_fallback(self):
+        elements = [
+            _element("e0", "住宿", {"设施": {"wifi": True}, "混合": 1, "大数": 2 ** 70, "列表": [1, "a"]}),
+            _element("e1", "住宿", {"设施": None, "混合": "一", "大数": 3, "列表": ["b"]}),
+            _element("e2", "住宿", {"混合": None}),
+        ]
+        columns = _columns(ElementStore(1, {"住宿": elements}))["住宿"]
+        self.assertEqual(columns, {"设施": "object", "混合": "object", "大数": "object", "列表": "object"})
+        decoded = self.assertRoundTrip(elements)
+        self.assertIsNone(decoded.elements[1]["attributes"]["设施"])
+        self.assertNotIn("设施", decoded.elements[2]["attributes"])
+
+    def test_inferred_storages(self):
+        elements = [_element(f"e{index}", "住宿", {"价格": index, "名称": str(index)}) for index in range(4)]
+        store = ElementStore(1, {"住宿": elements})
+        storages = {"住宿": {"价格": "float64", "名称": "int64"}}
+        # 推断的存储类型优先；取值不符时退回 object，不会写出错误的列
+        self.assertEqual(_columns(store, storages)["住宿"], {"价格": "float64", "名称": "object"})
+        self.assertRoundTrip(elements, storages)
+
+    def test_file_round_trip_with_rules(self):
+        elements = [_element("e0", "住宿", {"价格": 1}), _element("e1", "景点", {"名称": "塔"})]
+        store = ElementStore(3, {"住宿": elements[:1], "景点": elements[1:]})
+        rules = [{"id": "r1", "code": "return 1.0", "created_at": NOW}]
+        compiled = {"return 1.0": compile("x = 1", "<rule>", "exec")}
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "elements.snap")
+            write_snapshot(path, store, 5, rules, compiled)
+            snapshot = ElementSnapshot(path)
+            try:
+                self.assertEqual(snapshot.elements_version, 3)
+                self.assertEqual(snapshot.rules_version, 5)
+                self.assertEqual(snapshot.element_count, 2)
+                self.assertEqual(snapshot.watermark, NOW)
+                decoded = snapshot.load_store()
+                loaded_rules, loaded_compiled = snapshot.load_rules()
+            finally:
+                snapshot.close()
+        self.assertEqual(decoded.elements, store.elements)
+        self.assertEqual(decoded.type_ranges, store.type_ranges)
+        self.assertEqual(loaded_rules, rules)
+        self.assertEqual(list(loaded_compiled), ["return 1.0"])
+
+    def test_rejects_other_files(self):
+        with self.assertRaises(SnapshotError):
+            ElementSnapshot(buffer=b"not a snapshot at all")
+
+if __name__ == "__main__":
+    unittest.main()